@@ -1,5 +1,4 @@
 import os, sys
-from time import sleep
 import numpy as np
 
 from tomlkit.toml_file import TOMLFile
@@ -8,8 +7,14 @@ from tomlkit.toml_document import TOMLDocument
 FILE_DIR = os.path.dirname(os.path.realpath(__file__))
 sys.path.insert(0, FILE_DIR)
 
-from helper_functions.uhd_interface import SDR
+from helper_functions.radio import open_radio
 from helper_functions.hdf5_handler import HDF5Handler
+from attack.burst_cache import BurstCache
+from attack.playlist import load_playlist
+from attack.tx_engine import PlaylistEngine, TxEngine
+
+# Seconds between heartbeats while the attack runs
+HEARTBEAT_SECONDS = 5.0
 
 
 class Attack:
@@ -20,11 +25,19 @@ class Attack:
         """Controls the replay attack.
 
         Parameters:
-            interval (float): The time to wait between each TX
+            interval (float): The time from the start of one TX to the start of
+                the next.
+
+            lead_time (float): How long before each TX is due it is handed to
+                the radio.
+
+            playlist (str): If set, the playlist in playlists/ that is
+                replayed instead of `file` and `dataset`.
 
             packet (np.ndarray): The packet to be replayed.
 
-            sdr (SDR): The interface with the SDR.
+            sdr (SDR): The interface with the SDR or the backend picked in
+                config.toml.
         """
         self.toml_radio: dict = self.settings.get("RADIO")
         self.toml_attack: dict = self.settings.get("ATTACK")
@@ -39,22 +52,71 @@ class Attack:
         self.dataset: str = self.toml_attack["dataset"]
         self.repeat: int = self.toml_attack["repeat"]
         self.interval: float = self.toml_attack["interval"]
+        self.lead_time: float = self.toml_attack["lead_time"]
+        self.playlist: str = self.toml_attack["playlist"]
+        self.cache_max_bytes: int = self.toml_attack["cache_max_bytes"]
+        self.gapless_max_bytes: int = self.toml_attack["gapless_max_bytes"]
 
     def replay(self):
-        """Replays a captured packet."""
-        count = 0
-        heartbeat = 0
-        self.sdr = SDR(self.sample_rate, self.center_freq, self.tx_gain, self.rx_gain)
-        self.packet = self.hdf5.get_signal(self.file, self.dataset)
+        """Replays a captured packet.
+
+        Each TX is timed by the radio's clock so the packets go out exactly
+        `interval` apart, see TxEngine. The packets are converted to the
+        radio's tx_format before the first is sent. With a playlist, every
+        packet in it is read into memory first and they are sent back to back
+        with the gaps it sets, `repeat` times over, see PlaylistEngine.
+        """
+        self.sdr = open_radio(self.settings)
+        if self.playlist:
+            cache = BurstCache(
+                self.hdf5, int(self.cache_max_bytes), self.sdr.tx_format
+            )
+            engine = PlaylistEngine(
+                self.sdr,
+                load_playlist(self.playlist, self.hdf5, float(self.interval)),
+                cache,
+                float(self.sample_rate),
+                int(self.repeat),
+                float(self.lead_time),
+                center_freq=float(self.center_freq),
+                tx_gain=float(self.tx_gain),
+            )
+            print(
+                f"loaded {engine.preloaded} packets, {cache.nbytes / 1e6:.1f} MB, "
+                f"from {self.playlist}"
+            )
+            if cache.clipped:
+                print(f"{cache.clipped} packets go past full scale and are clipped")
+        else:
+            self.packet = self.hdf5.get_signal(self.file, self.dataset)
+            engine = TxEngine(
+                self.sdr,
+                self.packet,
+                float(self.sample_rate),
+                float(self.interval),
+                int(self.repeat),
+                float(self.lead_time),
+                gapless_max_bytes=int(self.gapless_max_bytes),
+            )
         print("STARTING REPLAY ATTACK")
-        while True:
-            self.sdr.tx_data(self.packet)
-            heartbeat += 1
-            if heartbeat > 5:
-                print("ATTACK MODE STILL ALIVE")
-            if self.repeat > 0:
-                count += 1
-                if count > self.repeat:
-                    break
-            sleep(self.interval)
+        engine.start()
+        try:
+            while engine.is_alive():
+                engine.join(HEARTBEAT_SECONDS)
+                if engine.is_alive():
+                    print(f"ATTACK MODE STILL ALIVE, {engine.bursts_sent} sent")
+        except KeyboardInterrupt:
+            engine.stop()
+            engine.join()
+        stats: dict = engine.stats()
+        print(
+            f"sent {stats['bursts_sent']} packets, {stats['late']} late, "
+            f"{stats['underflows']} underflows, smallest lead "
+            f"{stats['min_lead'] * 1e3:.3f} ms"
+        )
+        if self.playlist and stats["cache_misses"]:
+            print(
+                f"{stats['cache_misses']} packets were read from disk while "
+                f"sending, raise cache_max_bytes to hold them all"
+            )
         print("EXITING REPLAY ATTACK")
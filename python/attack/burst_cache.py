@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from bisect import bisect_left, insort
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.hdf5_handler import HDF5Handler
+from helper_functions.burst_prep import clips, prepare_burst, tx_dtype
+
+
+class BurstCache:
+    def __init__(
+        self, hdf5: HDF5Handler, max_bytes: int = 1 << 30, tx_format: str = "fc32"
+    ):
+        """Keeps packets from signal files in memory, back to back in one
+        block, so they can be transmitted without reading the disk. They are
+        held already converted to the radio's TX format, which for sc16 also
+        halves the memory they take.
+
+        Packets are named by a (file, dataset) key. When a packet does not fit,
+        the least recently used packets are dropped until there is a gap big
+        enough for it.
+
+        Arguments:
+            hdf5 (HDF5Handler): Reads packets that are not held.
+
+            max_bytes (int): The most memory the packets may take up.
+
+            tx_format (str): fc32 or sc16, see prepare_burst.
+        """
+        self.hdf5: HDF5Handler = hdf5
+        self.tx_format: str = tx_format
+        self.dtype: np.dtype = tx_dtype(tx_format)
+        self.capacity: int = max(int(max_bytes) // self.dtype.itemsize, 1)
+        self._block: np.ndarray = None
+        # The (offset, length) of each packet in the block, least recently used
+        # first, and the offsets of every packet in order
+        self._bursts: OrderedDict = OrderedDict()
+        self._offsets: list = list()
+        self._lengths: dict = dict()
+        # Counters
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        # Packets that went past full scale and were saturated
+        self.clipped: int = 0
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._bursts
+
+    def __len__(self) -> int:
+        return len(self._bursts)
+
+    @property
+    def nbytes(self) -> int:
+        """The memory the held packets take up."""
+        held: int = sum(length for _, length in self._bursts.values())
+        return held * self.dtype.itemsize
+
+    def __gap(self, length: int) -> int:
+        """Returns the first offset with `length` free samples after it, or -1."""
+        start: int = 0
+        for offset in self._offsets:
+            if offset - start >= length:
+                return start
+            start = offset + self._lengths[offset]
+        return start if self._block.size - start >= length else -1
+
+    def __evict(self) -> None:
+        _, (offset, _) = self._bursts.popitem(last=False)
+        self._offsets.pop(bisect_left(self._offsets, offset))
+        del self._lengths[offset]
+        self.evictions += 1
+
+    def __evict_key(self, key: tuple) -> None:
+        self._bursts.move_to_end(key, last=False)
+        self.__evict()
+        self.evictions -= 1
+
+    def put(self, key: tuple, samples: np.ndarray) -> np.ndarray:
+        """Converts a packet into the block.
+
+        Arguments:
+            key (tuple): The (file, dataset) of the packet.
+
+            samples (np.ndarray): The packet.
+
+        Returns:
+            np.ndarray: The (1, N) copy held in the block.
+        """
+        length: int = samples.size
+        itemsize: int = self.dtype.itemsize
+        if length > self.capacity:
+            raise ValueError(
+                f"{key[1]} of {key[0]} takes {length * itemsize} bytes, more "
+                f"than the cache's {self.capacity * itemsize}"
+            )
+        if self._block is None:
+            self._block = np.empty(self.capacity, dtype=self.dtype)
+        if key in self._bursts:
+            self.__evict_key(key)
+        offset: int = self.__gap(length)
+        while offset < 0 and self._bursts:
+            self.__evict()
+            offset = self.__gap(length)
+        if offset < 0:
+            # The block was made for what preload needed, which this is not
+            self._block = np.empty(self.capacity, dtype=self.dtype)
+            offset = 0
+        burst: np.ndarray = prepare_burst(
+            samples, self.tx_format, self._block[offset : offset + length]
+        )
+        if clips(samples):
+            self.clipped += 1
+        self._bursts[key] = (offset, length)
+        insort(self._offsets, offset)
+        self._lengths[offset] = length
+        return burst
+
+    def get(self, key: tuple) -> np.ndarray:
+        """Returns a packet, reading it from its file if it is not held.
+
+        Arguments:
+            key (tuple): The (file, dataset) of the packet.
+
+        Returns:
+            np.ndarray: The packet as a (1, N) view into the block, which is
+            only valid until the packet is dropped to make room for another.
+        """
+        held: tuple = self._bursts.get(key)
+        if held is not None:
+            self.hits += 1
+            self._bursts.move_to_end(key)
+            offset, length = held
+            return self._block[offset : offset + length].reshape(1, -1)
+        self.misses += 1
+        return self.put(key, self.hdf5.get_signal(*key))
+
+    def preload(self, keys: list) -> int:
+        """Reads packets into the block in the order given until it is full,
+        opening each file once. The block is only made as large as these
+        packets need.
+
+        Arguments:
+            keys (list[tuple]): The (file, dataset) of each packet.
+
+        Returns:
+            int: The number of packets that were read.
+        """
+        keys = [key for key in dict.fromkeys(keys) if key not in self._bursts]
+        lengths: dict = dict()
+        for file_name in dict.fromkeys(key[0] for key in keys):
+            index: np.ndarray = self.hdf5.read_index(file_name)
+            for key in keys:
+                if key[0] == file_name:
+                    lengths[key] = int(index[int(key[1][len("signal") :])]["length"])
+        # Only the packets that fit in the block before it fills
+        fitting: list = list()
+        total: int = sum(length for _, length in self._bursts.values())
+        for key in keys:
+            if total + lengths[key] > self.capacity:
+                break
+            fitting.append(key)
+            total += lengths[key]
+        if self._block is None:
+            self._block = np.empty(max(total, 1), dtype=self.dtype)
+        for file_name in dict.fromkeys(key[0] for key in fitting):
+            in_file: list = [key for key in fitting if key[0] == file_name]
+            packets: list = self.hdf5.get_signals(
+                file_name, [dataset for _, dataset in in_file]
+            )
+            for key, packet in zip(in_file, packets):
+                self.put(key, packet)
+        return len(fitting)
+
+    def stats(self) -> dict:
+        return {
+            "packets": len(self._bursts),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "clipped": self.clipped,
+        }
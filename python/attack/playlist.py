@@ -0,0 +1,78 @@
+from tomlkit.toml_file import TOMLFile
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+PLAYLISTS_DIR = f"{FILE_DIR}/../playlists/"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.hdf5_handler import HDF5Handler
+
+ENTRY_KEYS = ("file", "dataset", "repeat", "gap", "center_freq", "tx_gain")
+
+
+def playlist_path(name: str) -> str:
+    """Returns the path of a playlist in playlists/, with or without the
+    extension. A path that exists is used as it is."""
+    if os.path.isfile(name):
+        return name
+    if not name.endswith(".toml"):
+        name = f"{name}.toml"
+    return f"{PLAYLISTS_DIR}{name}"
+
+
+def load_playlist(name: str, hdf5: HDF5Handler, gap: float = 0.0) -> list:
+    """Reads a playlist of packets to replay.
+
+    A playlist is a TOML file with an [[entry]] table for each group of
+    packets, sent in order:
+    - file: The signal file the packets are in.
+    - dataset: A packet name such as "signal3", a list of them, or "all" for
+        every packet in the file.
+    - repeat: How many times the entry's packets are sent, 1 by default.
+    - gap: The seconds from the end of each packet to the start of the next.
+        Defaults to the `gap` at the top of the file, then to `gap` here.
+    - center_freq, tx_gain: Retunes the radio before the entry. Entries
+        without them go back to the settings under [RADIO].
+
+    Arguments:
+        name (str): The name of a playlist in playlists/ or its path.
+
+        hdf5 (HDF5Handler): Finds the packets of "all" entries.
+
+        gap (float): The gap used when the playlist does not set one.
+
+    Returns:
+        list[dict]: An entry with each key filled in and `datasets` holding
+        the list of packet names.
+    """
+    path: str = playlist_path(name)
+    document = TOMLFile(path).read().unwrap()
+    gap = float(document.get("gap", gap))
+    entries: list = list()
+    for number, table in enumerate(document.get("entry", []), start=1):
+        unknown: set = set(table) - set(ENTRY_KEYS)
+        if unknown:
+            raise ValueError(f"Entry {number} of {path} has unknown keys {unknown}")
+        if "file" not in table or "dataset" not in table:
+            raise ValueError(f"Entry {number} of {path} needs a file and dataset")
+        datasets = table["dataset"]
+        if datasets == "all":
+            packets: int = hdf5.read_index(table["file"]).shape[0]
+            datasets = [f"signal{i}" for i in range(packets)]
+        elif isinstance(datasets, str):
+            datasets = [datasets]
+        entry: dict = {
+            "file": table["file"],
+            "datasets": list(datasets),
+            "repeat": int(table.get("repeat", 1)),
+            "gap": float(table.get("gap", gap)),
+            "center_freq": table.get("center_freq"),
+            "tx_gain": table.get("tx_gain"),
+        }
+        if entry["gap"] < 0:
+            raise ValueError(f"Entry {number} of {path} has a negative gap")
+        entries.append(entry)
+    if not entries:
+        raise ValueError(f"{path} has no [[entry]] tables")
+    return entries
@@ -0,0 +1,293 @@
+import threading as th
+from time import perf_counter
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from attack.burst_cache import BurstCache
+from helper_functions.burst_prep import clips, prepare_burst, repeat_burst
+
+# How often the host clock is lined up with the radio's again
+RESYNC_SECONDS = 1.0
+
+
+class TxEngine:
+    def __init__(
+        self,
+        sdr,
+        burst: np.ndarray,
+        sample_rate: float,
+        interval: float,
+        repeat: int = 0,
+        lead_time: float = 0.05,
+        start_delay: float = 0.1,
+        gapless_max_bytes: int = 0,
+    ):
+        """Transmits a burst over and over at a fixed interval by telling the
+        radio when each one should go out.
+
+        Burst N is due at the first burst's time plus N intervals on the
+        radio's clock, so the time a send takes and the host's scheduling
+        never add up to drift. A background thread hands each burst to the
+        radio `lead_time` seconds before it is due and the radio holds it until
+        then, so the host only has to be early rather than exact. The burst is
+        converted to the radio's tx_format once up front, see prepare_burst.
+
+        With `gapless_max_bytes` the bursts are instead sent several at a time
+        as one buffer, built once, with zeros for the time between them. This
+        makes one large send rather than many small ones, and the interval is
+        rounded to a whole number of samples.
+
+        Arguments:
+            sdr (SDR, SyntheticSDR or FileSDR): The radio, which needs
+                get_time_now, tx_burst and tx_events.
+
+            burst (np.ndarray): The samples to transmit.
+
+            sample_rate (float): The rate the radio transmits at.
+
+            interval (float): The seconds from the start of one burst to the
+                start of the next. It must be longer than the burst.
+
+            repeat (int): The number of bursts to send, 0 or less to send until
+                stop is called.
+
+            lead_time (float): How many seconds before a burst is due it is
+                handed to the radio.
+
+            start_delay (float): How many seconds after start the first burst
+                is due.
+
+            gapless_max_bytes (int): If above 0, the most memory a buffer of
+                bursts sent in one go may take up.
+        """
+        if clips(burst):
+            print("The packet goes past full scale of 1.0 and will be clipped")
+        self.burst: np.ndarray = prepare_burst(burst, sdr.tx_format)
+        self.interval: float = interval
+        self.repeat: int = repeat
+        burst_seconds: float = self.burst.size / sample_rate
+        if interval <= burst_seconds:
+            raise ValueError(
+                f"The interval of {interval} s is not longer than the burst of "
+                f"{burst_seconds:.6f} s"
+            )
+        # The bursts sent in each buffer and the buffer holding that many
+        self.per_buffer: int = 1
+        self._buffer: np.ndarray = self.burst
+        self._period: int = round(interval * sample_rate)
+        if gapless_max_bytes > 0:
+            fits: int = gapless_max_bytes // self.burst.itemsize - self.burst.size
+            self.per_buffer = max(fits // self._period + 1, 1)
+            if repeat > 0:
+                self.per_buffer = min(self.per_buffer, repeat)
+            if self.per_buffer > 1:
+                self._buffer = repeat_burst(self.burst, self.per_buffer, self._period)
+        self._setup(sdr, sample_rate, lead_time, start_delay)
+
+    def _setup(
+        self, sdr, sample_rate: float, lead_time: float, start_delay: float
+    ) -> None:
+        self.sdr = sdr
+        self.sample_rate: float = sample_rate
+        self.lead_time: float = lead_time
+        self.start_delay: float = start_delay
+        # Counters
+        self.bursts_sent: int = 0
+        self.late: int = 0
+        self.underflows: int = 0
+        # The smallest time between handing a burst to the radio and it being due
+        self.min_lead: float = float("inf")
+        self._stopped: th.Event = th.Event()
+        self._thread: th.Thread = None
+
+    def __sync(self) -> tuple:
+        """Returns the radio's time and the host's time at the same moment."""
+        host_before: float = perf_counter()
+        radio: float = self.sdr.get_time_now()
+        host_after: float = perf_counter()
+        return (radio, (host_before + host_after) / 2)
+
+    def __count_events(self) -> None:
+        events: dict = self.sdr.tx_events()
+        self.late += events["late"]
+        self.underflows += events["underflows"]
+
+    def _bursts(self):
+        """Yields each send as a (1, N) array in tx_format, the seconds after
+        the first send it is due, a (center_freq, tx_gain, seconds) retune to
+        make before it or None, the number of bursts in it and the seconds
+        between their starts."""
+        if self.per_buffer == 1:
+            burst: int = 0
+            while self.repeat <= 0 or burst < self.repeat:
+                yield (self.burst, burst * self.interval, None, 1, 0.0)
+                burst += 1
+            return
+        burst = 0
+        period: float = self._period / self.sample_rate
+        while self.repeat <= 0 or burst < self.repeat:
+            count: int = self.per_buffer
+            if self.repeat > 0:
+                count = min(count, self.repeat - burst)
+            # The first `count` bursts of the buffer
+            length: int = (count - 1) * self._period + self.burst.size
+            offset: float = burst * self._period / self.sample_rate
+            yield (self._buffer[:, :length], offset, None, count, period)
+            burst += count
+
+    def __feed(self) -> None:
+        radio_time, host_time = self.__sync()
+        first: float = radio_time + self.start_delay
+        for burst, offset, retune, packets, period in self._bursts():
+            if self._stopped.is_set():
+                break
+            due: float = first + offset
+            if perf_counter() - host_time > RESYNC_SECONDS:
+                radio_time, host_time = self.__sync()
+                self.__count_events()
+            # When the burst is due by the host's clock, less the lead time
+            send_at: float = host_time + (due - radio_time) - self.lead_time
+            wait: float = send_at - perf_counter()
+            if wait > 0 and self._stopped.wait(wait):
+                break
+            self.min_lead = min(
+                self.min_lead, host_time + (due - radio_time) - perf_counter()
+            )
+            if retune is not None:
+                center_freq, tx_gain, retune_offset = retune
+                self.sdr.tune_tx(center_freq, tx_gain, first + retune_offset)
+            self.sdr.tx_burst(burst, due, packets, period)
+            self.bursts_sent += packets
+        self.__count_events()
+
+    def start(self) -> None:
+        """Starts sending bursts from a background thread."""
+        self._thread = th.Thread(target=self.__feed, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sending once the burst being sent is done."""
+        self._stopped.set()
+
+    def join(self, timeout: float = None) -> None:
+        self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self) -> dict:
+        return {
+            "bursts_sent": self.bursts_sent,
+            "late": self.late,
+            "underflows": self.underflows,
+            "min_lead": self.min_lead,
+        }
+
+
+class PlaylistEngine(TxEngine):
+    def __init__(
+        self,
+        sdr,
+        playlist: list,
+        cache: BurstCache,
+        sample_rate: float,
+        repeat: int = 1,
+        lead_time: float = 0.05,
+        start_delay: float = 0.1,
+        center_freq: float = None,
+        tx_gain: float = None,
+    ):
+        """Transmits the packets of a playlist one after the other, each timed
+        by the radio's clock as in TxEngine.
+
+        Each packet starts its entry's `gap` seconds after the one before it
+        ends. An entry with a center_freq or tx_gain retunes the radio when
+        the packet before it ends, so its gap must cover the time the radio
+        takes to settle. An entry without them retunes back to `center_freq`
+        and `tx_gain`, the settings the radio was opened with. The packets are
+        read into `cache` before the first is sent. If they do not all fit,
+        the rest are read as they come up and the least recently used are
+        dropped to make room.
+
+        Arguments:
+            sdr (SDR, SyntheticSDR or FileSDR): The radio, which also needs
+                tune_tx.
+
+            playlist (list[dict]): The entries from load_playlist.
+
+            cache (BurstCache): Holds the packets.
+
+            sample_rate (float): The rate the radio transmits at.
+
+            repeat (int): The number of times the playlist is played, 0 or
+                less to play it until stop is called.
+
+            lead_time, start_delay: See TxEngine.
+
+            center_freq (float): The frequency the radio was opened at. If
+                None, an entry without a center_freq keeps the one before.
+
+            tx_gain (float): The gain the radio was opened with. If None, an
+                entry without a tx_gain keeps the one before.
+        """
+        if cache.tx_format != sdr.tx_format:
+            raise ValueError(
+                f"The cache holds {cache.tx_format} packets but the radio sends "
+                f"{sdr.tx_format}"
+            )
+        self.playlist: list = playlist
+        self.cache: BurstCache = cache
+        self.repeat: int = repeat
+        self.center_freq: float = center_freq
+        self.tx_gain: float = tx_gain
+        self._setup(sdr, sample_rate, lead_time, start_delay)
+        keys: list = [
+            (entry["file"], dataset)
+            for entry in playlist
+            for dataset in entry["datasets"]
+        ]
+        self.preloaded: int = cache.preload(keys)
+
+    def _bursts(self):
+        offset: float = 0.0
+        center_freq: float = self.center_freq
+        tx_gain: float = self.tx_gain
+        play: int = 0
+        while self.repeat <= 0 or play < self.repeat:
+            for entry in self.playlist:
+                retune = None
+                new_freq: float = entry["center_freq"]
+                if new_freq is None:
+                    new_freq = self.center_freq
+                if new_freq == center_freq:
+                    new_freq = None
+                new_gain: float = entry["tx_gain"]
+                if new_gain is None:
+                    new_gain = self.tx_gain
+                if new_gain == tx_gain:
+                    new_gain = None
+                if new_freq is not None or new_gain is not None:
+                    # When the last packet ends, before this entry's gap
+                    retune = (new_freq, new_gain, offset)
+                    if new_freq is not None:
+                        center_freq = new_freq
+                    if new_gain is not None:
+                        tx_gain = new_gain
+                for _ in range(entry["repeat"]):
+                    for dataset in entry["datasets"]:
+                        burst: np.ndarray = self.cache.get((entry["file"], dataset))
+                        offset += entry["gap"]
+                        yield (burst, offset, retune, 1, 0.0)
+                        retune = None
+                        offset += burst.size / self.sample_rate
+            play += 1
+
+    def stats(self) -> dict:
+        stats: dict = super().stats()
+        for key, value in self.cache.stats().items():
+            stats[f"cache_{key}"] = value
+        return stats
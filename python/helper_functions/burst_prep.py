@@ -0,0 +1,107 @@
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+# The host sample formats the TX streamer can be set up with
+TX_FORMATS = ("fc32", "sc16")
+# One sc16 sample. The streamer counts samples along the last axis, so I and Q
+# have to share one element rather than being two int16s
+SC16 = np.dtype([("i", np.int16), ("q", np.int16)])
+# What UHD multiplies fc32 samples by when it converts them to sc16
+SC16_SCALE = 32767.0
+
+
+def tx_dtype(tx_format: str) -> np.dtype:
+    """Returns the numpy dtype of one sample in `tx_format`."""
+    if tx_format == "fc32":
+        return np.dtype(np.complex64)
+    if tx_format == "sc16":
+        return SC16
+    raise ValueError(f"Unknown TX format '{tx_format}', expected one of {TX_FORMATS}")
+
+
+def prepare_burst(
+    samples: np.ndarray, tx_format: str = "fc32", out: np.ndarray = None
+) -> np.ndarray:
+    """Converts a packet to the format the TX streamer sends, so it is not
+    converted again on every send.
+
+    Real packets, such as the ones tools/dummy_signal.py writes, are sent with
+    no Q. sc16 samples are scaled the way UHD scales fc32 ones, so both formats
+    put the same signal on the air. Anything past full scale saturates.
+
+    Arguments:
+        samples (np.ndarray): The packet, 1D or (1, N).
+
+        tx_format (str): fc32 or sc16, the host format of the TX streamer.
+
+        out (np.ndarray): A 1D array of N samples in `tx_format` to write the
+            packet into. A new one is made if None.
+
+    Returns:
+        np.ndarray: A contiguous (1, N) array in `tx_format`.
+    """
+    samples = np.asarray(samples)
+    if samples.ndim > 2 or (samples.ndim == 2 and samples.shape[0] != 1):
+        raise ValueError(f"A packet must be 1D or (1, N), not {samples.shape}")
+    samples = samples.reshape(-1)
+    if samples.size == 0:
+        raise ValueError("A packet must have at least one sample")
+    if not np.issubdtype(samples.dtype, np.number):
+        raise ValueError(f"A packet must be numeric, not {samples.dtype}")
+    if not np.isfinite(samples).all():
+        raise ValueError("A packet must not have NaN or infinite samples")
+    dtype: np.dtype = tx_dtype(tx_format)
+    if out is None:
+        out = np.empty(samples.size, dtype=dtype)
+    elif out.dtype != dtype or out.shape != samples.shape:
+        raise ValueError(
+            f"out is {out.shape} {out.dtype}, the packet needs {samples.shape} {dtype}"
+        )
+    if tx_format == "fc32":
+        out[:] = samples
+    else:
+        out["i"] = np.clip(np.rint(samples.real * SC16_SCALE), -32768, 32767)
+        if np.iscomplexobj(samples):
+            out["q"] = np.clip(np.rint(samples.imag * SC16_SCALE), -32768, 32767)
+        else:
+            out["q"] = 0
+    return out.reshape(1, -1)
+
+
+def clips(samples: np.ndarray) -> bool:
+    """Returns True if any part of a packet is past the full scale of 1.0."""
+    samples = np.asarray(samples)
+    if np.iscomplexobj(samples):
+        return bool(max(np.abs(samples.real).max(), np.abs(samples.imag).max()) > 1.0)
+    return bool(np.abs(samples).max() > 1.0)
+
+
+def repeat_burst(burst: np.ndarray, repetitions: int, period: int) -> np.ndarray:
+    """Builds one buffer holding a burst `repetitions` times, each starting
+    `period` samples after the last with zeros in between.
+
+    The first k * period - (period - N) samples are the first k repetitions, so
+    a slice of the buffer sends fewer without building another.
+
+    Arguments:
+        burst (np.ndarray): A (1, N) burst from prepare_burst.
+
+        repetitions (int): How many times the burst is in the buffer.
+
+        period (int): The samples from the start of one repetition to the
+            start of the next, at least N.
+
+    Returns:
+        np.ndarray: A (1, (repetitions - 1) * period + N) array in the burst's
+        format.
+    """
+    length: int = burst.shape[-1]
+    if period < length:
+        raise ValueError(f"The period of {period} samples is shorter than the burst")
+    buffer: np.ndarray = np.zeros(repetitions * period, dtype=burst.dtype)
+    buffer.reshape(repetitions, period)[:, :length] = burst.reshape(-1)
+    return buffer[: (repetitions - 1) * period + length].reshape(1, -1)
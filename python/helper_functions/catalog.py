@@ -0,0 +1,292 @@
+import numpy as np
+import sqlite3
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+SIGNALS_DIR = f"{FILE_DIR}/../captured_signals/"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.packet_layout import PACKET_INDEX_DTYPE
+
+CATALOG_NAME = "catalog.sqlite"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    packets INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    name TEXT NOT NULL,
+    first_packet INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    rows BLOB NOT NULL,
+    PRIMARY KEY (name, first_packet)
+);
+CREATE TABLE IF NOT EXISTS fingerprint_indexes (
+    name TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    radius REAL NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+
+def file_key(file_name: str) -> str:
+    """Returns the name a file is stored under in the catalog."""
+    file_name = os.path.basename(file_name)
+    if not file_name.endswith(".hdf5"):
+        file_name = f"{file_name}.hdf5"
+    return file_name
+
+
+class Catalog:
+    def __init__(self, signals_dir: str = SIGNALS_DIR):
+        """A SQLite file next to the captures that remembers what is in them.
+
+        Each capture has a row in `files` with the mtime and size it had when
+        it was catalogued, and its packet index stored as blobs of
+        PACKET_INDEX_DTYPE rows in `batches`. HDF5Writer adds one blob per
+        flush, so the catalog follows a capture as it grows. A file whose
+        mtime or size no longer match is stale and is read again.
+
+        The last FingerprintIndex built for a capture is kept in
+        `fingerprint_indexes` with the mtime and size the capture had, and is
+        built again once they change.
+
+        Arguments:
+            signals_dir (str): The folder holding the captures and the catalog.
+        """
+        self.signals_dir: str = signals_dir
+        self.path: str = f"{signals_dir}{CATALOG_NAME}"
+        self._db = None
+
+    def __connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.signals_dir, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=10.0)
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __stat(self, name: str) -> tuple:
+        """Returns the (mtime_ns, size) of a capture, or None if it is gone."""
+        try:
+            stat = os.stat(f"{self.signals_dir}{name}")
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def is_fresh(self, file_name: str) -> bool:
+        """Returns True if the catalog matches the file on disk."""
+        name: str = file_key(file_name)
+        row = (
+            self.__connect()
+            .execute("SELECT mtime_ns, size FROM files WHERE name = ?", (name,))
+            .fetchone()
+        )
+        return row is not None and tuple(row) == self.__stat(name)
+
+    def read_index(self, file_name: str) -> np.ndarray:
+        """Returns the catalogued index of a file.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+        Returns:
+            np.ndarray: The PACKET_INDEX_DTYPE rows, or None if the file is not
+            catalogued or the catalog is stale.
+        """
+        if not self.is_fresh(file_name):
+            return None
+        blobs: list = (
+            self.__connect()
+            .execute(
+                "SELECT count, rows FROM batches WHERE name = ? ORDER BY first_packet",
+                (file_key(file_name),),
+            )
+            .fetchall()
+        )
+        if not blobs:
+            return np.empty(0, dtype=PACKET_INDEX_DTYPE)
+        data: bytes = b"".join(blob for (_, blob) in blobs)
+        # Rows catalogued before a field was added to the index are read again
+        rows: int = sum(count for (count, _) in blobs)
+        if len(data) != rows * PACKET_INDEX_DTYPE.itemsize:
+            return None
+        return np.frombuffer(data, PACKET_INDEX_DTYPE)
+
+    def store(self, file_name: str, index: np.ndarray) -> None:
+        """Replaces everything the catalog knows about a file.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            index (np.ndarray): Every index row of the file.
+        """
+        name: str = file_key(file_name)
+        stat: tuple = self.__stat(name)
+        db = self.__connect()
+        with db:
+            db.execute("DELETE FROM batches WHERE name = ?", (name,))
+            db.execute("DELETE FROM files WHERE name = ?", (name,))
+            if stat is None:
+                return
+            db.execute(
+                "INSERT INTO files VALUES (?, ?, ?, ?)", (name, *stat, index.shape[0])
+            )
+            if index.shape[0]:
+                db.execute(
+                    "INSERT INTO batches VALUES (?, 0, ?, ?)",
+                    (name, index.shape[0], np.ascontiguousarray(index).tobytes()),
+                )
+
+    def append(self, file_name: str, first_packet: int, rows: np.ndarray) -> bool:
+        """Adds the rows a writer just flushed to a file.
+
+        The rows are only added if the catalog was up to date with the file
+        before the flush, otherwise the file is left stale to be read again.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            first_packet (int): The packet number of the first row.
+
+            rows (np.ndarray): The index rows that were written.
+
+        Returns:
+            bool: True if the rows were added.
+        """
+        name: str = file_key(file_name)
+        db = self.__connect()
+        with db:
+            row = db.execute(
+                "SELECT packets FROM files WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None and first_packet == 0:
+                row = (0,)
+            if row is None or row[0] != first_packet:
+                return False
+            stat: tuple = self.__stat(name)
+            db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (name, *stat, first_packet + rows.shape[0]),
+            )
+            if rows.shape[0]:
+                db.execute(
+                    "INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?)",
+                    (name, first_packet, rows.shape[0], rows.tobytes()),
+                )
+        return True
+
+    def touch(self, file_name: str, packets: int) -> None:
+        """Records the current mtime and size of a file whose packets are known.
+
+        Writers call this after closing a file, since closing can change the
+        file without adding packets.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            packets (int): The number of packets the file holds.
+        """
+        name: str = file_key(file_name)
+        stat: tuple = self.__stat(name)
+        db = self.__connect()
+        with db:
+            db.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE name = ? AND packets = ?",
+                (*stat, name, packets),
+            )
+
+    def read_fingerprint_index(self, file_name: str, radius: float) -> bytes:
+        """Returns the kept fingerprint index of a file.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            radius (float): The radius the index has to be built for.
+
+        Returns:
+            bytes: The index from FingerprintIndex.to_bytes, or None if there
+            is none for this radius or the file changed since it was built.
+        """
+        name: str = file_key(file_name)
+        row = (
+            self.__connect()
+            .execute(
+                "SELECT mtime_ns, size, radius, data FROM fingerprint_indexes "
+                "WHERE name = ?",
+                (name,),
+            )
+            .fetchone()
+        )
+        if row is None or tuple(row[:2]) != self.__stat(name) or row[2] != radius:
+            return None
+        return row[3]
+
+    def store_fingerprint_index(
+        self, file_name: str, radius: float, data: bytes
+    ) -> None:
+        """Keeps the fingerprint index of a file as it is now, replacing any
+        kept before.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            radius (float): The radius the index was built for.
+
+            data (bytes): The index from FingerprintIndex.to_bytes.
+        """
+        name: str = file_key(file_name)
+        stat: tuple = self.__stat(name)
+        if stat is None:
+            return
+        db = self.__connect()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO fingerprint_indexes VALUES (?, ?, ?, ?, ?)",
+                (name, *stat, radius, data),
+            )
+
+    def forget(self, file_name: str) -> None:
+        """Removes a file from the catalog."""
+        name: str = file_key(file_name)
+        db = self.__connect()
+        with db:
+            db.execute("DELETE FROM batches WHERE name = ?", (name,))
+            db.execute("DELETE FROM files WHERE name = ?", (name,))
+            db.execute("DELETE FROM fingerprint_indexes WHERE name = ?", (name,))
+
+    def files(self) -> list:
+        """Returns the catalogued captures.
+
+        Captures that no longer exist are removed first. The list is read
+        from the catalog, so it may include stale entries.
+
+        Returns:
+            list: (name, packets, size) tuples sorted by name.
+        """
+        db = self.__connect()
+        rows: list = db.execute(
+            "SELECT name, packets, size FROM files ORDER BY name"
+        ).fetchall()
+        gone: list = [name for name, _, _ in rows if self.__stat(name) is None]
+        for name in gone:
+            self.forget(name)
+        return [row for row in rows if row[0] not in gone]
+
+    def clear(self) -> None:
+        """Removes every file from the catalog."""
+        db = self.__connect()
+        with db:
+            db.execute("DELETE FROM batches")
+            db.execute("DELETE FROM files")
+            db.execute("DELETE FROM fingerprint_indexes")
+
@@ -0,0 +1,156 @@
+import h5py
+import numpy as np
+from time import perf_counter, sleep
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+SIGNALS_DIR = f"{FILE_DIR}/../captured_signals/"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.sample_ring import SampleRing
+from helper_functions.tx_sink import TxSink, SinkTransmitter
+from helper_functions.packet_layout import is_packed
+
+
+class FileSDR(SinkTransmitter):
+    """Stands in for the SDR by playing back a capture saved in an HDF5 file.
+
+    Provides the same rx_data, rx_slot and tx_data methods as SDR so the rest of
+    the pipeline can run without a USRP.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float,
+        center_freq: float,
+        tx_gain: int,
+        rx_gain: int,
+        file: str = "default",
+        dataset: str = "signal0",
+        loop: bool = True,
+        chunk_size: int = 24960,
+        realtime: bool = True,
+        tx_format: str = "fc32",
+    ):
+        """
+        Arguments:
+            sample_rate (float): The rate the capture is played back at.
+
+            center_freq (float): Kept for parity with SDR.
+
+            file (str): The name of the HDF5 file in captured_signals. (There is
+                no need to include the file extension)
+
+            dataset (str): The packet to play back, as signalN. "samples" plays
+                every packet of a packed file back to back. It must not be
+                empty.
+
+            loop (bool): If True playback starts over at the end of the dataset,
+                otherwise rx calls return no samples once it has been played.
+
+            chunk_size (int): The number of samples returned by each rx call.
+
+            realtime (bool): If True rx calls are paced to `sample_rate`, and
+                untimed sends take as long as the samples take to transmit.
+
+            tx_format (str): The format packets are converted to before they
+                are sent, as SDR's TX streamer takes.
+        """
+        self._sample_rate: float = sample_rate
+        self._center_freq: float = center_freq
+        self._tx_gain: int = tx_gain
+        self._rx_gain: int = rx_gain
+        self.loop: bool = loop
+        self.realtime: bool = realtime
+        self.rx_chunk_size: int = chunk_size
+        self.overflows: int = 0
+        self.tx_format: str = tx_format
+        self.tx_sink: TxSink = TxSink(sample_rate, realtime)
+        self.finished: bool = False
+        self._file = h5py.File(f"{SIGNALS_DIR}{file}.hdf5", "r")
+        if is_packed(self._file) and dataset != "samples":
+            # A single packet of a packed file is read into memory, "samples"
+            # plays every packet back to back
+            index = self._file["index"][int(dataset[len("signal") :])]
+            self._dataset = self._file["samples"][
+                index["offset"] : index["offset"] + index["length"]
+            ]
+        else:
+            self._dataset = self._file[dataset]
+        self._size: int = self._dataset.shape[-1]
+        if self._size == 0:
+            # Looping over it would never fill a chunk
+            self._file.close()
+            raise ValueError(f"{dataset} in {file} has no samples to play back")
+        self._recv_buffer = np.empty(chunk_size, dtype=np.complex64)
+        self._position: int = 0
+        self._played: int = 0
+        self._start_time: float = None
+
+    def __pace(self) -> None:
+        """Waits until the next chunk would have been received by a real radio."""
+        if self._start_time is None:
+            self._start_time = perf_counter()
+        late: float = perf_counter() - self._start_time - self._played / self._sample_rate
+        if late > self.rx_chunk_size / self._sample_rate:
+            self.overflows += 1
+        elif late < 0:
+            sleep(-late)
+
+    def __fill(self, buffer: np.ndarray) -> int:
+        """Copies the next chunk of the capture into `buffer`."""
+        if self.realtime:
+            self.__pace()
+        filled: int = 0
+        while filled < buffer.size:
+            if self._position == self._size:
+                if not self.loop:
+                    self.finished = True
+                    break
+                self._position = 0
+            count: int = min(buffer.size - filled, self._size - self._position)
+            buffer[filled : filled + count] = self._dataset[
+                ..., self._position : self._position + count
+            ].ravel()
+            filled += count
+            self._position += count
+        self._played += filled
+        return filled
+
+    def rx_into(self, buffer: np.ndarray) -> int:
+        """Reads the next chunk of samples into a buffer.
+
+        Arguments:
+            buffer (np.ndarray): A 1D complex64 array with room for at least
+                rx_chunk_size samples.
+
+        Returns:
+            int: The number of samples written to the start of `buffer`.
+        """
+        return self.__fill(buffer[: self.rx_chunk_size])
+
+    def rx_data(self) -> np.ndarray:
+        """Reads the next chunk of the capture.
+
+        Returns:
+            np.ndarray: A 1D copy of the samples. It is empty once a capture that
+            does not loop has been played.
+        """
+        num_rx: int = self.__fill(self._recv_buffer)
+        return self._recv_buffer[:num_rx].copy()
+
+    def rx_slot(self, ring: SampleRing) -> tuple:
+        """Reads the next chunk of the capture straight into a free slot of a ring.
+
+        Arguments:
+            ring (SampleRing): The pool of buffers to write into.
+
+        Returns:
+            tuple (int, int): The slot that was written to, or -1 if no slot was
+            free, and the number of valid samples in the slot.
+        """
+        slot: int = ring.acquire()
+        if slot < 0:
+            return (slot, 0)
+        return (slot, self.__fill(ring.slot(slot)[: self.rx_chunk_size]))
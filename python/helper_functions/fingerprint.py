@@ -0,0 +1,253 @@
+import numpy as np
+import io, os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.spectral import SpectralAnalyzer
+
+# A fingerprint is the packet's envelope averaged down to ENVELOPE_POINTS,
+# then its length and its dominant frequency
+ENVELOPE_POINTS = 32
+FINGERPRINT_SIZE = ENVELOPE_POINTS + 2
+# Packets twice as long are this far apart
+LENGTH_SCALE = 1.0
+# Packets whose dominant frequencies are FREQ_SCALE Hz apart are 1 apart
+FREQ_SCALE = 1e6
+# The default distance within which two packets count as copies
+RADIUS = 0.25
+
+
+def envelope(packet: np.ndarray) -> np.ndarray:
+    """Returns the mean magnitude of ENVELOPE_POINTS equal parts of a packet,
+    divided by the mean of the whole packet so the gain it was received with
+    does not matter. The parts are interpolated when the packet is shorter."""
+    magnitude: np.ndarray = np.abs(packet)
+    mean: float = magnitude.mean() if magnitude.size else 0.0
+    if mean == 0:
+        return np.zeros(ENVELOPE_POINTS, dtype=np.float32)
+    if magnitude.size >= ENVELOPE_POINTS:
+        edges: np.ndarray = np.linspace(0, magnitude.size, ENVELOPE_POINTS + 1)
+        edges = edges.astype(np.int64)
+        parts: np.ndarray = np.add.reduceat(magnitude, edges[:-1]) / np.diff(edges)
+    else:
+        parts = np.interp(
+            (np.arange(ENVELOPE_POINTS) + 0.5) * magnitude.size / ENVELOPE_POINTS - 0.5,
+            np.arange(magnitude.size),
+            magnitude,
+        )
+    return (parts / mean).astype(np.float32)
+
+
+def fingerprints(
+    packets: list, rows: np.ndarray, analyzer: SpectralAnalyzer = None
+) -> np.ndarray:
+    """Makes the fingerprint of each packet.
+
+    The envelope is scaled so the Euclidean distance between two envelopes is
+    the RMS of their difference, which is about the same size as the length
+    and frequency terms for packets that differ.
+
+    Arguments:
+        packets (list[np.ndarray]): The samples of each packet.
+
+        rows (np.ndarray): The index row of each packet. Its dominant_freq is
+            used, or its center_freq when that is NaN.
+
+        analyzer (SpectralAnalyzer): If set, measures the dominant frequency
+            of packets whose row does not have it.
+
+    Returns:
+        np.ndarray: A (packets, FINGERPRINT_SIZE) float32 array.
+    """
+    vectors: np.ndarray = np.empty((len(packets), FINGERPRINT_SIZE), np.float32)
+    for row, packet in enumerate(packets):
+        vectors[row, :ENVELOPE_POINTS] = envelope(packet) / np.sqrt(ENVELOPE_POINTS)
+    vectors[:, ENVELOPE_POINTS] = LENGTH_SCALE * np.log2(np.maximum(rows["length"], 1))
+    freqs: np.ndarray = rows["dominant_freq"].copy()
+    missing: np.ndarray = np.flatnonzero(np.isnan(freqs))
+    if analyzer is not None and missing.size:
+        measured: np.ndarray = analyzer.analyze(
+            [packets[row] for row in missing],
+            rows["sample_rate"][missing],
+            rows["center_freq"][missing],
+        )
+        freqs[missing] = measured["dominant_freq"]
+    freqs = np.where(np.isnan(freqs), rows["center_freq"], freqs)
+    vectors[:, ENVELOPE_POINTS + 1] = freqs / FREQ_SCALE
+    return vectors
+
+
+class FingerprintIndex:
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        radius: float = RADIUS,
+        tables: int = 10,
+        projections: int = 4,
+        seed: int = 0,
+    ):
+        """Finds the packets whose fingerprints are within `radius` of another
+        without comparing it with every packet.
+
+        This is locality sensitive hashing for Euclidean distance (E2LSH).
+        Each of `tables` hashes projects a fingerprint onto `projections`
+        random directions and cuts each into buckets 4 * radius wide, so
+        fingerprints within `radius` of each other most likely share a
+        bucket in at least one table. The fingerprints of every bucket are
+        kept together by sorting on the hash, so a query is a binary search
+        per table followed by an exact check of the few candidates it finds.
+
+        Arguments:
+            vectors (np.ndarray): A (packets, FINGERPRINT_SIZE) array. Rows
+                with NaN are never found.
+
+            radius (float): The distance the buckets are sized for.
+
+            tables (int): More tables miss fewer neighbours but cost more.
+
+            projections (int): More projections give smaller buckets, so fewer
+                candidates but more misses.
+
+            seed (int): Seeds the random projections.
+        """
+        self.vectors: np.ndarray = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.radius: float = radius
+        self.tables: int = tables
+        rng = np.random.default_rng(seed)
+        dims: int = self.vectors.shape[1]
+        self._width: float = 4 * radius
+        self._directions: np.ndarray = rng.normal(
+            size=(dims, tables * projections)
+        ).astype(np.float32)
+        self._shifts: np.ndarray = rng.uniform(
+            0, self._width, tables * projections
+        ).astype(np.float32)
+        # Combines the buckets of one table into a single key. A collision only
+        # adds candidates, which the exact check removes
+        self._mix: np.ndarray = rng.integers(
+            1, 1 << 62, projections, dtype=np.int64
+        ) | 1
+        self._projections: int = projections
+        # The packets that have a fingerprint
+        valid: np.ndarray = np.flatnonzero(~np.isnan(self.vectors).any(axis=1))
+        self.valid: np.ndarray = valid
+        keys: np.ndarray = self.__keys(self.vectors[valid])
+        order: np.ndarray = np.argsort(keys, axis=0, kind="stable")
+        # Per table, the packets in the order of their key and the keys
+        self._order: np.ndarray = valid[order].T.copy()
+        self._keys: np.ndarray = np.take_along_axis(keys, order, axis=0).T.copy()
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def to_bytes(self) -> bytes:
+        """Returns the index in the form `from_bytes` reads, so it can be kept
+        instead of being built again."""
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            vectors=self.vectors,
+            valid=self.valid,
+            order=self._order,
+            keys=self._keys,
+            directions=self._directions,
+            shifts=self._shifts,
+            mix=self._mix,
+            settings=np.array([self.radius, self.tables, self._projections]),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FingerprintIndex":
+        """Loads an index saved with `to_bytes`."""
+        arrays = np.load(io.BytesIO(data))
+        index: FingerprintIndex = cls.__new__(cls)
+        radius, tables, projections = arrays["settings"]
+        index.vectors = arrays["vectors"]
+        index.radius = float(radius)
+        index.tables = int(tables)
+        index._projections = int(projections)
+        index._width = 4 * index.radius
+        index._directions = arrays["directions"]
+        index._shifts = arrays["shifts"]
+        index._mix = arrays["mix"]
+        index.valid = arrays["valid"]
+        index._order = arrays["order"]
+        index._keys = arrays["keys"]
+        return index
+
+    def __keys(self, vectors: np.ndarray) -> np.ndarray:
+        """Returns the (vectors, tables) bucket key of each vector."""
+        buckets: np.ndarray = np.floor(
+            (vectors @ self._directions + self._shifts) / self._width
+        ).astype(np.int64)
+        buckets = buckets.reshape(-1, self.tables, self._projections)
+        return (buckets * self._mix).sum(axis=2)
+
+    def candidates(self, vector: np.ndarray) -> np.ndarray:
+        """Returns the packets that share a bucket with `vector` in any table."""
+        keys: np.ndarray = self.__keys(vector.reshape(1, -1).astype(np.float32))[0]
+        found: list = list()
+        for table in range(self.tables):
+            low: int = np.searchsorted(self._keys[table], keys[table], "left")
+            high: int = np.searchsorted(self._keys[table], keys[table], "right")
+            found.append(self._order[table, low:high])
+        return np.unique(np.concatenate(found))
+
+    def near(self, vector: np.ndarray, radius: float = None) -> tuple:
+        """Finds the packets within `radius` of a fingerprint.
+
+        Arguments:
+            vector (np.ndarray): The fingerprint.
+
+            radius (float): Defaults to the radius the index was built for.
+                Larger ones find fewer of the packets in reach.
+
+        Returns:
+            tuple (np.ndarray, np.ndarray): The packets, nearest first, and
+            their distances.
+        """
+        radius = self.radius if radius is None else radius
+        found: np.ndarray = self.candidates(vector)
+        distances: np.ndarray = np.linalg.norm(self.vectors[found] - vector, axis=1)
+        keep: np.ndarray = distances <= radius
+        found, distances = found[keep], distances[keep]
+        order: np.ndarray = np.argsort(distances, kind="stable")
+        return (found[order], distances[order])
+
+    def clusters(self) -> tuple:
+        """Groups packets that are copies of one another.
+
+        Packets are taken in order. One that is not in a cluster yet starts a
+        new one, and every packet within `radius` of it that is not in a
+        cluster yet joins it. The representative of a cluster is the member
+        nearest the mean of its fingerprints.
+
+        Returns:
+            tuple (np.ndarray, np.ndarray): The cluster of each packet, -1 for
+            packets without a fingerprint, and the representative of each
+            cluster.
+        """
+        labels: np.ndarray = np.full(len(self), -1, dtype=np.int64)
+        count: int = 0
+        for packet in self.valid:
+            if labels[packet] >= 0:
+                continue
+            members, _ = self.near(self.vectors[packet])
+            labels[members[labels[members] < 0]] = count
+            labels[packet] = count
+            count += 1
+        members = self.valid
+        sums: np.ndarray = np.zeros((count, self.vectors.shape[1]))
+        np.add.at(sums, labels[members], self.vectors[members])
+        sizes: np.ndarray = np.bincount(labels[members], minlength=count)
+        means: np.ndarray = sums / sizes[:, None]
+        distances: np.ndarray = np.linalg.norm(
+            self.vectors[members] - means[labels[members]], axis=1
+        )
+        # The nearest member of each cluster comes first when sorted this way
+        order: np.ndarray = np.lexsort((distances, labels[members]))
+        first: np.ndarray = np.flatnonzero(np.diff(labels[members][order], prepend=-1))
+        return (labels, members[order][first])
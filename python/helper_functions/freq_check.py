@@ -6,6 +6,7 @@ PYTHON_DIR = os.path.dirname(os.path.realpath(__file__))
 sys.path.insert(0, PYTHON_DIR)
 
 from helper_functions.hdf5_handler import HDF5Handler
+from helper_functions.spectral import SpectralAnalyzer
 
 """ 
 view the real part of an imaginary number with `.real`
@@ -16,7 +17,7 @@ view the complex part of an imaginary number with `.imag`
 class AnalyzeFrequency:
     def __init__(self):
         """ """
-        pass
+        self.analyzer: SpectralAnalyzer = SpectralAnalyzer()
 
     def remove_zeros(self, signal_data: np.ndarray) -> np.ndarray:
         """Removes zeros that follow the main signal_dat
@@ -38,19 +39,15 @@ class AnalyzeFrequency:
         Returns:
             (int) The frequency of the captured signal.
         """
+        signal_data = np.asarray(signal_data, dtype=np.complex64).ravel()
         # Remove the zeros at the end of the array
-        last_nonzero: int = np.max(np.where(signal_data != 0j))
-        signal_data = signal_data[: last_nonzero + 1]
-        # Remove the DC component from the signal_data
-        signal_data: np.ndarray = signal_data - np.mean(signal_data)
-        # Gets the magnitude and phase angle of the signal
-        fft_result: np.ndarray = np.fft.fft(signal_data)
-        # Creates an array of frequencies that corresponds to each value in fft_result.
-        freqs: np.ndarray = np.fft.fftfreq(len(signal_data), 1 / sample_rate)
-        # returns the frequency with the highest magnitude.
-        dom_freq: float = freqs[np.argmax(np.abs(fft_result))]
-        # Add the center frequency to the offset frequency to get the absolute frequency
-        return center_freq + dom_freq
+        nonzero: np.ndarray = np.flatnonzero(signal_data)
+        signal_data = signal_data[: nonzero[-1] + 1 if nonzero.size else 0]
+        # The strongest bin of the averaged spectrum, see SpectralAnalyzer
+        features: np.ndarray = self.analyzer.analyze(
+            [signal_data], [sample_rate], [center_freq]
+        )
+        return float(features["dominant_freq"][0])
 
 
 if __name__ == "__main__":
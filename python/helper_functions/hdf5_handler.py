@@ -1,9 +1,8 @@
-import h5py  # python3 -m pip install pytest pytest-mpi h5py
-from h5py import Group, Dataset
 import numpy as np
-import os, sys, traceback
+import os, re, sys, traceback
 from random import randint
 from datetime import date, datetime
+from time import perf_counter
 
 FILE_DIR = os.path.dirname(os.path.realpath(__file__))
 SIGNALS_DIR = f"{FILE_DIR}/../captured_signals/"
@@ -11,6 +10,43 @@ PYTHON_DIR = f"{FILE_DIR}/../"
 sys.path.insert(0, PYTHON_DIR)
 
 from helper_functions.plot_signal import plot_signal
+from helper_functions.packet_layout import (
+    PACKET_INDEX_DTYPE,
+    FINGERPRINTS,
+    convert_index,
+    is_packed,
+)
+from helper_functions.packet_query import PacketTable
+from helper_functions.catalog import Catalog
+from helper_functions.fingerprint import (
+    FINGERPRINT_SIZE,
+    RADIUS,
+    FingerprintIndex,
+    fingerprints,
+)
+
+SAMPLE_BYTES = np.dtype(np.complex64).itemsize
+# The packets fingerprinted per read when a file is missing fingerprints
+FINGERPRINT_BATCH = 4096
+
+
+def signal_path(file_name: str) -> str:
+    """Returns the path of a file in captured_signals, with or without the extension."""
+    if not file_name.endswith(".hdf5"):
+        file_name = f"{file_name}.hdf5"
+    return f"{SIGNALS_DIR}{file_name}"
+
+
+def open_signal_file(file_name: str, mode: str = "r"):
+    """Opens a file in captured_signals.
+
+    h5py is only imported here, so commands answered from the catalog never
+    load it.
+    """
+    import h5py
+
+    return h5py.File(signal_path(file_name), mode)
+
 
 """
 TODO: Add name and size metadata to datasets
@@ -25,60 +61,113 @@ TODO: Add method that allows you to see all the hdf5 files
 class HDF5Handler:
     def __init__(self):
         """Handles the saving and retrieving of captured signals"""
-        pass
+        self.catalog: Catalog = Catalog()
+        # File -> ((mtime_ns, size, radius), FingerprintIndex) of the indexes
+        # this handler has loaded
+        self._fingerprint_indexes: dict = dict()
 
     def save_signal(
         self,
         signal: np.ndarray,
-        signal_size: float,
         frequency: float,
-        packet_length_of_time: float,
         threshold: float,
         sample_rate: float,
         file_name: str = "default",
     ) -> None:
         """Saves captured signals into a hdf5 file.
 
-        IMPORTANT: make sure to open file first with open_file method.
+        Opens and closes the file for a single signal. Use HDF5Writer to save
+        many signals. The size and length of the signal are not passed in,
+        since the index holds its length in samples.
 
         Arguments:
             signal (np.ndarray): The captured signal.
 
+            frequency (float): The center frequency the signal was captured at.
+
+            threshold (float): The threshold used to detect the signal.
+
+            sample_rate (float): The sample rate the signal was captured at.
+
             file_name (str): The name of the file. (There is no need to include the file extension)
+        """
+        from helper_functions.hdf5_writer import HDF5Writer
 
-            signal_size (float):
+        with HDF5Writer(file_name) as writer:
+            writer.write(signal, frequency, threshold, sample_rate)
 
-            frequency (float):
+    def read_index(self, file_name: str) -> np.ndarray:
+        """Reads the index of every packet in a file.
+
+        The index comes from the catalog when it is up to date with the file.
+        Otherwise it is read from the file and the catalog is updated.
+
+        Arguments:
+            file_name (str): The name of the hdf5 file.
+
+        Returns:
+            np.ndarray: One PACKET_INDEX_DTYPE row per packet. Row N is the
+            packet named signalN.
         """
-        try:
-            create_counter: bool = False
-            if not os.path.isfile(f"{SIGNALS_DIR}{file_name}.hdf5"):
-                create_counter = True
-                h5py.File(f"{SIGNALS_DIR}{file_name}.hdf5", "w")
-            f: Group = h5py.File(f"{SIGNALS_DIR}{file_name}.hdf5", "r+")
-            # Add a counter to the file
-            if create_counter:
-                temp = f.create_dataset("counter", (1,), dtype="i")
-                temp[0] = 0
-            # Create a dataset and add it to the HDF5 file
-            counter = f["counter"]
-            dataset: Dataset = f.create_dataset(f"signal{counter[0]}", data=signal)
-            counter[0] = counter[0] + 1
-            # Add metadata to the dataset
-            dataset.attrs.create("date_captured", date.today().strftime("%d-%b-%Y"))
-            dataset.attrs.create(
-                "time_captured", datetime.now().time().strftime("%H:%M:%S")
-            )
-            dataset.attrs.create("signal_size_bytes", signal_size)
-            dataset.attrs.create("signal_length_seconds", packet_length_of_time)
-            dataset.attrs.create("threshold", threshold)
-            dataset.attrs.create("center_frequency", frequency),
-            dataset.attrs.create("sample_rate", sample_rate)
-            f.close()
-        except Exception as e:
-            print(e)
-            print(traceback.format_exc())
-            raise
+        index: np.ndarray = self.catalog.read_index(file_name)
+        if index is None:
+            index = self.__read_file_index(file_name)
+            self.catalog.store(file_name, index)
+        return index
+
+    def __read_file_index(self, file_name: str) -> np.ndarray:
+        """Reads the index of every packet from the file itself.
+
+        Files in the packed layout store the index as a table, so this is one
+        read. Files in the signal{N} layout have it rebuilt from the attributes
+        of every dataset, with an offset of -1 and no power or features.
+
+        Arguments:
+            file_name (str): The name of the hdf5 file.
+
+        Returns:
+            np.ndarray: One PACKET_INDEX_DTYPE row per packet. Row N is the
+            packet named signalN.
+        """
+        with open_signal_file(file_name) as f:
+            if is_packed(f):
+                return convert_index(f["index"][:])
+            names: list = self.__legacy_names(f)
+            index = np.empty(len(names), dtype=PACKET_INDEX_DTYPE)
+            for row, name in enumerate(names):
+                dataset = f[name]
+                attrs = dataset.attrs
+                captured: datetime = datetime.strptime(
+                    f"{attrs['date_captured']} {attrs['time_captured']}",
+                    "%d-%b-%Y %H:%M:%S",
+                )
+                index[row] = (
+                    -1,
+                    dataset.shape[-1] if dataset.shape else 0,
+                    captured.timestamp(),
+                    attrs["center_frequency"],
+                    attrs["sample_rate"],
+                    attrs["threshold"],
+                    *(np.nan,) * (len(PACKET_INDEX_DTYPE) - 6),
+                )
+            return index
+
+    def __legacy_names(self, f: "h5py.Group") -> list:
+        """Returns the signal{N} dataset names of a file in the order of N."""
+        names: list = [key for key in f.keys() if re.fullmatch(r"signal\d+", key)]
+        return sorted(names, key=lambda name: int(name[6:]))
+
+    def __read_packet(self, f: "h5py.Group", dataset: str) -> tuple:
+        """Reads one packet and its index row from an open file."""
+        if not is_packed(f):
+            data = f[dataset]
+            return (data[:], data.attrs["threshold"], data.attrs["sample_rate"])
+        match = re.fullmatch(r"signal(\d+)", dataset)
+        if match is None or int(match.group(1)) >= f["index"].shape[0]:
+            raise KeyError(f"{dataset} is not in {f.filename}")
+        row = f["index"][int(match.group(1))]
+        signal: np.ndarray = f["samples"][row["offset"] : row["offset"] + row["length"]]
+        return (signal, row["threshold"], row["sample_rate"])
 
     def get_signal(self, file_name: str, dataset: str) -> np.ndarray:
         """Gets the contents of the given hdf5 file and returns it.
@@ -92,45 +181,58 @@ class HDF5Handler:
             A numpy array containing the data for a signal.
         """
         try:
-            f: Group = h5py.File(f"{SIGNALS_DIR}{file_name}.hdf5", "r")
-            signal = f[dataset][:]
-            f.close()
-            return signal
+            with open_signal_file(file_name) as f:
+                return self.__read_packet(f, dataset)[0]
         except Exception as e:
             print(e)
             print(traceback.format_exc())
             raise
 
+    def get_signals(self, file_name: str, datasets: list) -> list:
+        """Gets several packets from a file, opening it once.
+
+        Arguments:
+            file_name (str): The name of the hdf5 file.
+
+            datasets (list[str]): The names of the packets, as signalN.
+
+        Returns:
+            list[np.ndarray]: The packets in the order they were named.
+        """
+        with open_signal_file(file_name) as f:
+            return [self.__read_packet(f, dataset)[0] for dataset in datasets]
+
     def plot_signal(self, file_name: str, dataset: str) -> None:
-        f: Group = h5py.File(f"{SIGNALS_DIR}{file_name}", "r")
-        file_data = f[dataset]
-        signal = file_data[:]
-        threshold = file_data.attrs["threshold"]
-        sample_rate = file_data.attrs["sample_rate"]
-        f.close()
+        with open_signal_file(file_name) as f:
+            signal, threshold, sample_rate = self.__read_packet(f, dataset)
         plot_signal(signal, sample_rate, threshold)
 
-    def __filter_signals(
-        self,
-        dataset: dict,
-        byte_size: int,
-        seconds: float,
-        center_freq: float,
-        sample_rate: float,
-    ):
-        if byte_size:
-            if dataset["signal_size_bytes"] >= byte_size:
-                return True
-        if seconds:
-            if dataset["signal_length_seconds"] >= seconds:
-                return True
-        if center_freq:
-            if dataset["center_frequency"] >= center_freq:
-                return True
-        if sample_rate:
-            if dataset["sample_rate"] >= sample_rate:
-                return True
-        return False
+    def load_table(self, file_name: str) -> PacketTable:
+        """Loads the metadata of every packet in a file for querying.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+        Returns:
+            PacketTable: The packet metadata as columns.
+        """
+        return PacketTable(self.read_index(file_name), SAMPLE_BYTES)
+
+    def query(self, file_name: str, query: str) -> np.ndarray:
+        """Finds the packets in a file that match a query.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            query (str): The query, e.g. `duration between 1ms and 5ms and
+                center_freq == 915MHz`. See PacketTable.mask.
+
+        Returns:
+            np.ndarray: A record array of the index rows that matched. The
+            packet numbers are `load_table(file_name).where(query)`.
+        """
+        table: PacketTable = self.load_table(file_name)
+        return table.records(table.mask(query))
 
     def display_metadata(
         self,
@@ -139,49 +241,298 @@ class HDF5Handler:
         seconds: float = None,
         center_freq: float = None,
         sample_rate: float = None,
+        query: str = None,
     ) -> None:
         """Gets the metadata of a file.
 
         Arguments:
             file_name (str): The name of the HDF5 file.
+
+            byte_size, seconds, center_freq, sample_rate: Minimums from the
+                [FILTER] settings. A packet is shown if it reaches any of them.
+                byte_size is compared with the number of samples, which is
+                what signal_size_bytes held when the setting was added.
+
+            query (str): Only packets that also match this query are shown.
+        """
+        table: PacketTable = self.load_table(file_name)
+        keep: np.ndarray = table.any_at_least(
+            length=byte_size,
+            duration=seconds,
+            center_freq=center_freq,
+            sample_rate=sample_rate,
+        )
+        if query:
+            keep &= table.mask(query)
+        for row in np.flatnonzero(keep):
+            packet = table.index[row]
+            captured: datetime = datetime.fromtimestamp(packet["timestamp"])
+            print(f"\tsignal{row}")
+            print(f"\t\tdate_captured: {captured.strftime('%d-%b-%Y')}")
+            print(f"\t\ttime_captured: {captured.strftime('%H:%M:%S')}")
+            print(f"\t\tsignal_size_bytes: {table.columns['byte_size'][row]}")
+            print(f"\t\tsignal_length_seconds: {table.columns['duration'][row]}")
+            print(f"\t\tthreshold: {packet['threshold']}")
+            print(f"\t\tcenter_frequency: {packet['center_freq']}")
+            print(f"\t\tsample_rate: {packet['sample_rate']}")
+            print(f"\t\tpeak_power: {packet['peak_power']}")
+            print(f"\t\tmean_power: {packet['mean_power']}")
+            print(f"\t\tdominant_frequency: {packet['dominant_freq']}")
+            print(f"\t\toccupied_bandwidth: {packet['bandwidth']}")
+            print(f"\t\tsnr_db: {packet['snr_db']}")
+            print()
+
+    def convert_file(self, file_name: str) -> int:
+        """Converts a file from the signal{N} layout to the packed layout.
+
+        The packets are written to a new file in the order of N, which then
+        replaces the original. The original is kept next to it with a .bak
+        extension.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+        Returns:
+            int: The number of packets converted.
+        """
+        path: str = signal_path(file_name)
+        name: str = os.path.basename(path)[: -len(".hdf5")]
+        temp_name: str = f"{name}.converting"
+        temp_path: str = signal_path(temp_name)
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        try:
+            with open_signal_file(file_name) as f:
+                if is_packed(f):
+                    print(f"{name}.hdf5 already uses the packed layout")
+                    return 0
+                index: np.ndarray = self.read_index(file_name)
+                names: list = self.__legacy_names(f)
+                from helper_functions.hdf5_writer import HDF5Writer
+                from helper_functions.spectral import SpectralAnalyzer
+
+                with HDF5Writer(
+                    temp_name, catalog=False, analyzer=SpectralAnalyzer()
+                ) as writer:
+                    for row, dataset in zip(index, names):
+                        writer.write(
+                            f[dataset][:],
+                            row["center_freq"],
+                            row["threshold"],
+                            row["sample_rate"],
+                            row["timestamp"],
+                        )
+            os.replace(path, f"{path}.bak")
+            os.replace(temp_path, path)
+        except Exception as e:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+            print(e)
+            print(traceback.format_exc())
+            raise
+        print(f"converted {len(names)} packets, the original is at {name}.hdf5.bak")
+        return len(names)
+
+    def read_fingerprints(self, file_name: str) -> np.ndarray:
+        """Reads the fingerprint of every packet in a file.
+
+        Packets without a stored fingerprint, such as those of files written
+        before fingerprints were kept, have one made from their samples. They
+        are not written back, the file is only read.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+        Returns:
+            np.ndarray: A (packets, FINGERPRINT_SIZE) array. Row N is the
+            packet named signalN.
+        """
+        with open_signal_file(file_name) as f:
+            if not is_packed(f):
+                raise ValueError(
+                    f"{file_name} uses the signal{{N}} layout, convert it with "
+                    f"`python3 replay.py n -c {file_name}` first"
+                )
+            count: int = f["index"].shape[0]
+            vectors: np.ndarray = np.full((count, FINGERPRINT_SIZE), np.nan, np.float32)
+            if FINGERPRINTS in f:
+                stored: int = min(f[FINGERPRINTS].shape[0], count)
+                vectors[:stored] = f[FINGERPRINTS][:stored]
+            missing: np.ndarray = np.flatnonzero(np.isnan(vectors).any(axis=1))
+            if not missing.size:
+                return vectors
+            from helper_functions.spectral import SpectralAnalyzer
+
+            index: np.ndarray = self.read_index(file_name)
+            analyzer: SpectralAnalyzer = SpectralAnalyzer()
+            samples = f["samples"]
+            for start in range(0, missing.size, FINGERPRINT_BATCH):
+                batch: np.ndarray = missing[start : start + FINGERPRINT_BATCH]
+                rows: np.ndarray = index[batch]
+                # Packets are stored in order, so the batch is one read
+                first: int = int(rows["offset"].min())
+                end: int = int((rows["offset"] + rows["length"]).max())
+                block: np.ndarray = samples[first:end]
+                packets: list = [
+                    block[row["offset"] - first : row["offset"] - first + row["length"]]
+                    for row in rows
+                ]
+                vectors[batch] = fingerprints(packets, rows, analyzer)
+        print(f"fingerprinted {missing.size} packets of {file_name}")
+        return vectors
+
+    def fingerprint_index(
+        self, file_name: str, radius: float = RADIUS
+    ) -> FingerprintIndex:
+        """Returns the index that finds similar packets in a file.
+
+        The index is built once and kept in the catalog until the file changes,
+        so queries after the first only load it. The handler also keeps the
+        indexes it loaded, so later queries in the same process use them as
+        they are.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            radius (float): How far apart two packets can be and still count
+                as copies.
+
+        Returns:
+            FingerprintIndex: The index. Packet N is signalN.
         """
-        # Get all the dataset data from the file
-        f: Group = h5py.File(f"{SIGNALS_DIR}{file_name}", "r")
-        dict_dataset = dict()
-        for key in f.keys():
-            dataset: Dataset = f[key]
-            if key == "counter":
-                continue
-            dict_dataset[key] = dict()
-            for name, value in dataset.attrs.items():
-                dict_dataset[key][name] = value
-        f.close()
-        # Filter and print the dataset data
-        if byte_size or seconds or center_freq or sample_rate:
-            for key in dict_dataset.keys():
-                if self.__filter_signals(
-                    dict_dataset[key], byte_size, seconds, center_freq, sample_rate
-                ):
-                    print(f"\t{key}")
-                    for attribute in dict_dataset[key].keys():
-                        print(f"\t\t{attribute}: {dict_dataset[key][attribute]}")
-                    print()
+        stat = os.stat(signal_path(file_name))
+        version: tuple = (stat.st_mtime_ns, stat.st_size, radius)
+        kept: tuple = self._fingerprint_indexes.get(signal_path(file_name))
+        if kept is not None and kept[0] == version:
+            return kept[1]
+        data: bytes = self.catalog.read_fingerprint_index(file_name, radius)
+        if data is not None:
+            index: FingerprintIndex = FingerprintIndex.from_bytes(data)
         else:
-            for key in dict_dataset.keys():
-                print(f"\t{key}")
-                for attribute in dict_dataset[key].keys():
-                    print(f"\t\t{attribute}: {dict_dataset[key][attribute]}")
-                print()
+            index = FingerprintIndex(self.read_fingerprints(file_name), radius)
+            self.catalog.store_fingerprint_index(file_name, radius, index.to_bytes())
+        self._fingerprint_indexes[signal_path(file_name)] = (version, index)
+        return index
+
+    def __near(self, index: FingerprintIndex, file_name: str, dataset: str) -> tuple:
+        match = re.fullmatch(r"signal(\d+)", dataset)
+        if match is None or int(match.group(1)) >= len(index):
+            raise KeyError(f"{dataset} is not in {file_name}")
+        return index.near(index.vectors[int(match.group(1))])
+
+    def similar(self, file_name: str, dataset: str, radius: float = RADIUS) -> tuple:
+        """Finds the packets in a file similar to one of them.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            dataset (str): The packet to compare with, as signalN.
+
+            radius (float): How far apart two packets can be and still count
+                as copies.
+
+        Returns:
+            tuple (np.ndarray, np.ndarray): The packet numbers, nearest first
+            and including the packet itself, and their distances.
+        """
+        index: FingerprintIndex = self.fingerprint_index(file_name, radius)
+        return self.__near(index, file_name, dataset)
+
+    def display_similar(
+        self, file_name: str, dataset: str, radius: float = RADIUS
+    ) -> None:
+        """Prints the packets in a file similar to one of them, how far each is
+        from it, and how long loading the index and the query took."""
+        start_time: float = perf_counter()
+        index: FingerprintIndex = self.fingerprint_index(file_name, radius)
+        loaded: float = perf_counter()
+        packets, distances = self.__near(index, file_name, dataset)
+        done: float = perf_counter()
+        for packet, distance in zip(packets, distances):
+            print(f"\tsignal{packet}\t{distance:.3f}")
+        print(
+            f"{packets.size} packets within {radius} of {dataset}, index ready in "
+            f"{(loaded - start_time) * 1e3:.1f} ms, "
+            f"query {(done - loaded) * 1e3:.2f} ms"
+        )
+
+    def display_clusters(self, file_name: str, radius: float = RADIUS) -> None:
+        """Groups the packets of a file into clusters of copies and prints
+        each, largest first, with the packet that represents it."""
+        index: FingerprintIndex = self.fingerprint_index(file_name, radius)
+        labels, representatives = index.clusters()
+        sizes: np.ndarray = np.bincount(
+            labels[labels >= 0], minlength=representatives.size
+        )
+        rows: np.ndarray = self.read_index(file_name)
+        for cluster in np.argsort(-sizes, kind="stable"):
+            packet: np.ndarray = rows[representatives[cluster]]
+            print(
+                f"\tsignal{representatives[cluster]}\t{sizes[cluster]} packets"
+                f"\t{packet['length']} samples"
+                f"\tdominant_frequency: {packet['dominant_freq']}"
+            )
+        print(f"{len(index)} packets in {representatives.size} clusters")
+
+    def dedup_file(self, file_name: str, radius: float = RADIUS) -> int:
+        """Writes a copy of a file with only one packet of each cluster of
+        copies, the one that represents it. The original is not changed.
+
+        Arguments:
+            file_name (str): The name of the HDF5 file.
+
+            radius (float): How far apart two packets can be and still count
+                as copies.
+
+        Returns:
+            int: The number of packets in the copy, which is <name>-dedup.hdf5.
+        """
+        _, representatives = self.fingerprint_index(file_name, radius).clusters()
+        representatives.sort()
+        index: np.ndarray = self.read_index(file_name)
+        name: str = os.path.basename(signal_path(file_name))[: -len(".hdf5")]
+        output: str = f"{name}-dedup"
+        if os.path.isfile(signal_path(output)):
+            raise FileExistsError(f"{output}.hdf5 already exists")
+        from helper_functions.hdf5_writer import HDF5Writer
+        from helper_functions.spectral import SpectralAnalyzer
+
+        with open_signal_file(file_name) as f, HDF5Writer(
+            output, analyzer=SpectralAnalyzer()
+        ) as writer:
+            samples = f["samples"]
+            for row in index[representatives]:
+                writer.write(
+                    samples[row["offset"] : row["offset"] + row["length"]],
+                    row["center_freq"],
+                    row["threshold"],
+                    row["sample_rate"],
+                    row["timestamp"],
+                )
+        saved: int = int(index["length"].sum() - index[representatives]["length"].sum())
+        print(
+            f"kept {representatives.size} of {index.shape[0]} packets in "
+            f"{output}.hdf5, {saved * SAMPLE_BYTES / 1e6:.1f} MB smaller"
+        )
+        return representatives.size
 
     def display_all_files(self) -> None:
-        """Displays all HDF5 files and their metadata"""
-        path = f"{PYTHON_DIR}/captured_signals/"
-        file_list = os.listdir(path)
-        for file in file_list:
-            if not (".hdf5" in file):
-                continue
-            else:
-                print(file)
+        """Displays all HDF5 files and how many packets they hold"""
+        self.update_catalog()
+        for name, packets, size in self.catalog.files():
+            print(f"{name}\t{packets} packets\t{size / 1e6:.1f} MB")
+
+    def update_catalog(self) -> None:
+        """Reads the index of every file the catalog is missing or stale for."""
+        for file_name in self.get_all_files():
+            if not self.catalog.is_fresh(file_name):
+                self.read_index(file_name)
+
+    def rebuild_catalog(self) -> None:
+        """Throws the catalog away and reads every file again."""
+        self.catalog.clear()
+        self.update_catalog()
+        print(f"catalogued {len(self.catalog.files())} files")
 
     def view_datasets(self, file_name: str) -> None:
         """View all the datasets from a single file.
@@ -189,9 +540,13 @@ class HDF5Handler:
         Arguments:
             file_name (str): The name of the file to be examined.
         """
-        f = h5py.File(f"{SIGNALS_DIR}{file_name}.hdf5", "r")
-        print(f"{file_name}.hdf5")
-        for key in f.keys():
+        with open_signal_file(file_name) as f:
+            print(os.path.basename(signal_path(file_name)))
+            if is_packed(f):
+                keys: list = [f"signal{row}" for row in range(f["index"].shape[0])]
+            else:
+                keys: list = list(f.keys())
+        for key in keys:
             print(f"\t{key}")
 
     def get_all_files(self):
@@ -199,9 +554,9 @@ class HDF5Handler:
         all_files = os.listdir(f"{SIGNALS_DIR}")
         file_names = list()
         for file in all_files:
-            if ".hdf5" in file:
+            if file.endswith(".hdf5"):
                 file_names.append(file)
-        return all_files
+        return sorted(file_names)
 
 
 if __name__ == "__main__":
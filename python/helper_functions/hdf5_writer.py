@@ -0,0 +1,266 @@
+import h5py
+import numpy as np
+import os, sys, traceback
+from time import time
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+SIGNALS_DIR = f"{FILE_DIR}/../captured_signals/"
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.packet_layout import (
+    LAYOUT,
+    PACKET_INDEX_DTYPE,
+    SAMPLE_CHUNK,
+    INDEX_CHUNK,
+    FEATURE_DTYPE,
+    FINGERPRINTS,
+    convert_index,
+    is_packed,
+)
+from helper_functions.catalog import Catalog
+from helper_functions.spectral import SpectralAnalyzer
+from helper_functions.fingerprint import FINGERPRINT_SIZE, fingerprints
+
+
+class HDF5Writer:
+    def __init__(
+        self,
+        file_name: str = "default",
+        batch_size: int = 256,
+        flush_seconds: float = 1.0,
+        catalog: bool = True,
+        analyzer: SpectralAnalyzer = None,
+    ):
+        """Keeps an HDF5 file open and writes captured signals to it in batches.
+
+        Signals are held in memory until `batch_size` of them are waiting or
+        `flush_seconds` have passed, then they are appended to the file with one
+        write to the samples, one to their fingerprints and one to the index
+        and the file is flushed to disk. A crash between flushes loses the
+        signals of the batch that had not been flushed yet, and any samples it
+        wrote past the index are ignored when the file is opened again. HDF5
+        does not update a file atomically though, so a crash in the middle of
+        a flush can leave the whole file unreadable. Keep a copy of captures
+        that matter.
+
+        Arguments:
+            file_name (str): The name of the file. (There is no need to include
+                the file extension)
+
+            batch_size (int): The number of signals to hold before writing them.
+
+            flush_seconds (float): The longest time a signal is held before it
+                is written.
+
+            catalog (bool): If True every flush is also added to the catalog in
+                captured_signals.
+
+            analyzer (SpectralAnalyzer): If set, the spectral features of each
+                batch are measured when it is written and stored in the index.
+                Otherwise they are NaN.
+        """
+        self.path: str = f"{SIGNALS_DIR}{file_name}.hdf5"
+        self.batch_size: int = batch_size
+        self.flush_seconds: float = flush_seconds
+        self.analyzer: SpectralAnalyzer = analyzer
+        self.saved: int = 0
+        self._pending: list = list()
+        self._rows: list = list()
+        self._oldest: float = 0.0
+        self._file = None
+        self._catalog = None
+        try:
+            self._file = h5py.File(self.path, "a", libver="latest")
+            if not is_packed(self._file):
+                if len(self._file.keys()):
+                    raise ValueError(
+                        f"{self.path} uses the signal{{N}} layout, convert it with "
+                        f"`python3 replay.py n -c {file_name}.hdf5` first"
+                    )
+                self._file.attrs["layout"] = LAYOUT
+                self._file.create_dataset(
+                    "samples",
+                    (0,),
+                    maxshape=(None,),
+                    chunks=(SAMPLE_CHUNK,),
+                    dtype=np.complex64,
+                )
+                self._file.create_dataset(
+                    "index",
+                    (0,),
+                    maxshape=(None,),
+                    chunks=(INDEX_CHUNK,),
+                    dtype=PACKET_INDEX_DTYPE,
+                )
+            self._samples = self._file["samples"]
+            self._index = self._file["index"]
+            # The index is written after the samples, so anything past the end
+            # of the last indexed packet is left over from a crash
+            self._count: int = self._index.shape[0]
+            if self._count:
+                last = self._index[self._count - 1]
+                self._sample_end: int = int(last["offset"] + last["length"])
+            else:
+                self._sample_end: int = 0
+            self._fingerprints = self.__fingerprints_dataset()
+            if catalog:
+                self._catalog = Catalog()
+        except Exception as e:
+            if self._file:
+                self._file.close()
+                self._file = None
+            print(e)
+            print(traceback.format_exc())
+            raise
+
+    def __fingerprints_dataset(self):
+        """Returns the fingerprints dataset with a row for every indexed
+        packet, adding it to files from before it existed."""
+        if FINGERPRINTS not in self._file:
+            self._file.create_dataset(
+                FINGERPRINTS,
+                (0, FINGERPRINT_SIZE),
+                maxshape=(None, FINGERPRINT_SIZE),
+                chunks=(INDEX_CHUNK, FINGERPRINT_SIZE),
+                dtype=np.float32,
+                fillvalue=np.nan,
+            )
+        dataset = self._file[FINGERPRINTS]
+        if dataset.shape[0] != self._count:
+            # Rows of packets left over from a crash are dropped, and missing
+            # ones are NaN. HDF5Handler.read_fingerprints makes those as it
+            # reads them
+            dataset.resize((self._count, FINGERPRINT_SIZE))
+        return dataset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(
+        self,
+        signal: np.ndarray,
+        frequency: float,
+        threshold: float,
+        sample_rate: float,
+        timestamp: float = None,
+    ) -> int:
+        """Queues a captured signal to be saved.
+
+        Arguments:
+            signal (np.ndarray): The captured signal. It is copied, so the
+                caller may reuse the buffer once this returns.
+
+            frequency (float): The center frequency the signal was captured at.
+
+            threshold (float): The threshold used to detect the signal.
+
+            sample_rate (float): The sample rate the signal was captured at.
+
+            timestamp (float): The unix time the signal was captured. Defaults to
+                now.
+
+        Returns:
+            int: The number of signals written to the file by this call.
+        """
+        if not self._pending:
+            self._oldest = time()
+        signal = np.array(signal, dtype=np.complex64).ravel()
+        power: np.ndarray = signal.real * signal.real + signal.imag * signal.imag
+        self._pending.append(signal)
+        self._rows.append(
+            (
+                0,
+                signal.size,
+                time() if timestamp is None else timestamp,
+                frequency,
+                sample_rate,
+                threshold,
+                power.max() if signal.size else 0.0,
+                power.mean() if signal.size else 0.0,
+                *(np.nan,) * len(FEATURE_DTYPE),
+            )
+        )
+        if len(self._pending) >= self.batch_size:
+            return self.flush()
+        return self.flush_if_due()
+
+    def flush_if_due(self) -> int:
+        """Writes the held signals if the oldest has waited `flush_seconds`.
+
+        Returns:
+            int: The number of signals that were written.
+        """
+        if self._pending and time() - self._oldest >= self.flush_seconds:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        """Writes every held signal and flushes the file to disk.
+
+        Returns:
+            int: The number of signals that were written.
+        """
+        written: int = len(self._pending)
+        if not written:
+            return 0
+        try:
+            rows: np.ndarray = np.array(self._rows, dtype=PACKET_INDEX_DTYPE)
+            lengths: np.ndarray = rows["length"]
+            rows["offset"] = self._sample_end + np.cumsum(lengths) - lengths
+            if self.analyzer is not None:
+                features: np.ndarray = self.analyzer.analyze(
+                    self._pending, rows["sample_rate"], rows["center_freq"]
+                )
+                for name in FEATURE_DTYPE.names:
+                    rows[name] = features[name]
+            total: int = int(lengths.sum())
+            if self._samples.shape[0] < self._sample_end + total:
+                self._samples.resize((self._sample_end + total,))
+            if total:
+                self._samples[self._sample_end : self._sample_end + total] = (
+                    np.concatenate(self._pending)
+                )
+            self._fingerprints.resize((self._count + written, FINGERPRINT_SIZE))
+            self._fingerprints[self._count :] = fingerprints(self._pending, rows)
+            self._index.resize((self._count + written,))
+            # Files from before the index had every field keep their own
+            self._index[self._count :] = convert_index(rows, self._index.dtype)
+            self._file.flush()
+        except Exception as e:
+            print(e)
+            print(traceback.format_exc())
+            raise
+        self.__catalog(self._count, rows)
+        self._sample_end += total
+        self._count += written
+        self._pending = list()
+        self._rows = list()
+        self.saved += written
+        return written
+
+    def __catalog(self, first_packet: int, rows: np.ndarray) -> None:
+        """Adds flushed rows to the catalog. A failure here does not stop a save."""
+        if self._catalog is None:
+            return
+        try:
+            self._catalog.append(self.path, first_packet, rows)
+        except Exception as e:
+            print(f"Could not update the catalog: {e}")
+            print(traceback.format_exc())
+
+    def close(self) -> None:
+        """Writes every held signal and closes the file."""
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+            if self._catalog is not None:
+                try:
+                    self._catalog.touch(self.path, self._count)
+                except Exception as e:
+                    print(f"Could not update the catalog: {e}")
+                self._catalog.close()
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Files written by HDF5Writer keep every packet back to back in one "samples"
+# dataset and describe each packet with a row of the "index" table. Packet N
+# is still addressed as "signalN".
+LAYOUT = "packed"
+# The spectral features SpectralAnalyzer measures, NaN when they were not
+FEATURE_DTYPE = np.dtype(
+    [
+        ("dominant_freq", np.float64),  # Absolute frequency of the strongest bin
+        ("bandwidth", np.float64),  # Width holding OCCUPIED_POWER of the signal
+        ("snr_db", np.float64),  # Signal to noise in the occupied bandwidth
+    ]
+)
+PACKET_INDEX_DTYPE = np.dtype(
+    [
+        ("offset", np.int64),  # Position of the first sample in "samples"
+        ("length", np.int64),  # Number of samples in the packet
+        ("timestamp", np.float64),  # Unix time the packet was saved
+        ("center_freq", np.float64),
+        ("sample_rate", np.float64),
+        ("threshold", np.float64),
+        ("peak_power", np.float64),  # Largest |x|^2 in the packet
+        ("mean_power", np.float64),  # Mean |x|^2 in the packet
+    ]
+    + FEATURE_DTYPE.descr
+)
+SAMPLE_CHUNK = 1 << 16
+INDEX_CHUNK = 1 << 12
+# Row N of the "fingerprints" dataset is the fingerprint of packet N, NaN until
+# it is made
+FINGERPRINTS = "fingerprints"
+
+
+def is_packed(f: "h5py.File") -> bool:
+    """Returns True if the open file uses the packed layout."""
+    return "index" in f and "samples" in f
+
+
+def convert_index(rows: np.ndarray, dtype: np.dtype = PACKET_INDEX_DTYPE) -> np.ndarray:
+    """Copies index rows to another version of the index by field name.
+
+    Files written before a field was added have older rows, which get NaN for
+    the fields they do not have. Rows written to such a file lose them.
+
+    Arguments:
+        rows (np.ndarray): The index rows.
+
+        dtype (np.dtype): The dtype to convert them to.
+
+    Returns:
+        np.ndarray: The rows in `dtype`, or `rows` itself if it already is.
+    """
+    if rows.dtype == dtype:
+        return rows
+    converted: np.ndarray = np.empty(rows.shape, dtype=dtype)
+    for name in dtype.names:
+        converted[name] = rows[name] if name in rows.dtype.names else np.nan
+    return converted
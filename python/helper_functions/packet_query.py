@@ -0,0 +1,256 @@
+import numpy as np
+import operator, re
+
+# Suffixes that can follow a number in a query, e.g. 1ms, 915MHz or 2kB
+UNITS = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "ms": 1e-3,
+    "s": 1.0,
+    "hz": 1.0,
+    "khz": 1e3,
+    "mhz": 1e6,
+    "ghz": 1e9,
+    "b": 1,
+    "kb": 1e3,
+    "mb": 1e6,
+    "gb": 1e9,
+}
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+KEYWORDS = ("and", "or", "not", "between")
+TOKEN = re.compile(
+    r"\s*(?:(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?)(?P<unit>[a-z]+)?"
+    r"|(?P<op>==|!=|>=|<=|>|<)"
+    r"|(?P<paren>[()])"
+    r"|(?P<word>[a-z_][a-z0-9_]*))",
+    re.IGNORECASE,
+)
+
+
+class QueryError(ValueError):
+    """Raised when a query can not be parsed."""
+
+
+def tokenize(query: str) -> list:
+    """Splits a query into (kind, value) tokens.
+
+    Arguments:
+        query (str): The query text.
+
+    Returns:
+        list: The tokens. Numbers are converted to floats with any unit applied.
+    """
+    tokens: list = list()
+    position: int = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN.match(query, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Unexpected '{query[position:]}' in query")
+        position = match.end()
+        if match.group("number") is not None:
+            value: float = float(match.group("number"))
+            unit: str = match.group("unit")
+            if unit:
+                if unit.lower() not in UNITS:
+                    raise QueryError(f"Unknown unit '{unit}' in query")
+                value *= UNITS[unit.lower()]
+            tokens.append(("number", value))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        elif match.group("paren") is not None:
+            tokens.append((match.group("paren"), match.group("paren")))
+        else:
+            word: str = match.group("word").lower()
+            tokens.append(("keyword" if word in KEYWORDS else "name", word))
+    return tokens
+
+
+class PacketTable:
+    # Columns computed from the index rather than stored in it
+    DERIVED = ("packet", "duration", "byte_size")
+    ALIASES = {
+        "seconds": "duration",
+        "size": "byte_size",
+        "frequency": "center_freq",
+        "center_frequency": "center_freq",
+        "power": "peak_power",
+        "dominant_frequency": "dominant_freq",
+        "occupied_bandwidth": "bandwidth",
+        "snr": "snr_db",
+    }
+
+    def __init__(self, index: np.ndarray, sample_bytes: int = 8):
+        """Holds the metadata of every packet in a file as NumPy columns.
+
+        Queries are answered with boolean masks over whole columns, so the cost
+        does not depend on how many packets there are in Python terms.
+
+        Arguments:
+            index (np.ndarray): The index rows of a file, as returned by
+                HDF5Handler.read_index.
+
+            sample_bytes (int): The size of one sample on disk.
+        """
+        self.index: np.ndarray = index
+        self.columns: dict = {name: index[name] for name in index.dtype.names}
+        self.columns["packet"] = np.arange(index.shape[0])
+        self.columns["duration"] = index["length"] / index["sample_rate"]
+        self.columns["byte_size"] = index["length"] * sample_bytes
+
+    def __len__(self) -> int:
+        return self.index.shape[0]
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a column by name or alias.
+
+        Arguments:
+            name (str): The name of the column.
+
+        Returns:
+            np.ndarray: The value of the column for every packet.
+        """
+        name = self.ALIASES.get(name, name)
+        if name not in self.columns:
+            raise QueryError(
+                f"Unknown column '{name}', expected one of {sorted(self.columns)}"
+            )
+        return self.columns[name]
+
+    def compare(self, name: str, op: str, value: float) -> np.ndarray:
+        """Returns a mask of the packets where `name op value` holds."""
+        return COMPARISONS[op](self.column(name), value)
+
+    def between(self, name: str, low: float, high: float) -> np.ndarray:
+        """Returns a mask of the packets where `low <= name <= high`."""
+        column: np.ndarray = self.column(name)
+        return (column >= low) & (column <= high)
+
+    def any_at_least(self, **minimums) -> np.ndarray:
+        """Returns a mask of the packets where any column reaches its minimum.
+
+        This is how the [FILTER] settings have always been applied. Columns
+        whose minimum is None or False are ignored, and if every minimum is
+        ignored all packets pass.
+
+        Arguments:
+            minimums: Column names mapped to their minimum values.
+
+        Returns:
+            np.ndarray: The mask.
+        """
+        keep = np.zeros(len(self), dtype=bool)
+        used: bool = False
+        for name, minimum in minimums.items():
+            if minimum:
+                keep |= self.column(name) >= minimum
+                used = True
+        return keep if used else np.ones(len(self), dtype=bool)
+
+    def mask(self, query: str) -> np.ndarray:
+        """Evaluates a query into a mask.
+
+        Queries compare columns to numbers with ==, !=, <, <=, > and >=, or
+        test a range with `between low and high`. They are combined with and,
+        or, not and parentheses. Numbers may carry a unit such as us, ms, MHz
+        or kB. For example
+        `duration between 1ms and 5ms and center_freq == 915MHz`.
+
+        Arguments:
+            query (str): The query text. An empty query matches every packet.
+
+        Returns:
+            np.ndarray: A boolean mask with one entry per packet.
+        """
+        tokens: list = tokenize(query)
+        if not tokens:
+            return np.ones(len(self), dtype=bool)
+        parser = _Parser(self, tokens)
+        mask: np.ndarray = parser.expression()
+        if parser.position != len(tokens):
+            raise QueryError(f"Unexpected '{tokens[parser.position][1]}' in query")
+        return mask
+
+    def where(self, query: str) -> np.ndarray:
+        """Returns the packet numbers that match a query, see `mask`."""
+        return np.flatnonzero(self.mask(query))
+
+    def records(self, rows: np.ndarray = None) -> np.ndarray:
+        """Returns the index rows of some packets.
+
+        Arguments:
+            rows (np.ndarray): Packet numbers or a mask. Defaults to every packet.
+
+        Returns:
+            np.ndarray: A record array of the index rows.
+        """
+        if rows is None:
+            return self.index.view(np.recarray)
+        return self.index[rows].view(np.recarray)
+
+
+class _Parser:
+    def __init__(self, table: PacketTable, tokens: list):
+        """Recursive descent parser that evaluates a query as it reads it.
+
+        expression := term ("or" term)*
+        term := factor ("and" factor)*
+        factor := "not" factor | "(" expression ")" | comparison
+        comparison := name op number | name "between" number "and" number
+        """
+        self.table: PacketTable = table
+        self.tokens: list = tokens
+        self.position: int = 0
+
+    def __peek(self) -> tuple:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def __take(self, kind: str, value: str = None):
+        token_kind, token_value = self.__peek()
+        if token_kind != kind or (value is not None and token_value != value):
+            found: str = "the end" if token_kind is None else f"'{token_value}'"
+            raise QueryError(f"Expected {value or kind} but found {found} in query")
+        self.position += 1
+        return token_value
+
+    def expression(self) -> np.ndarray:
+        mask: np.ndarray = self.term()
+        while self.__peek() == ("keyword", "or"):
+            self.position += 1
+            mask = mask | self.term()
+        return mask
+
+    def term(self) -> np.ndarray:
+        mask: np.ndarray = self.factor()
+        while self.__peek() == ("keyword", "and"):
+            self.position += 1
+            mask = mask & self.factor()
+        return mask
+
+    def factor(self) -> np.ndarray:
+        if self.__peek() == ("keyword", "not"):
+            self.position += 1
+            return ~self.factor()
+        if self.__peek()[0] == "(":
+            self.position += 1
+            mask: np.ndarray = self.expression()
+            self.__take(")")
+            return mask
+        name: str = self.__take("name")
+        if self.__peek() == ("keyword", "between"):
+            self.position += 1
+            low: float = self.__take("number")
+            self.__take("keyword", "and")
+            high: float = self.__take("number")
+            return self.table.between(name, low, high)
+        op: str = self.__take("op")
+        return self.table.compare(name, op, self.__take("number"))
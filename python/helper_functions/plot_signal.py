@@ -1,11 +1,13 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 # Let's assume your captured signal is stored in a variable named `captured_signal`
 # And your sample rate is stored in a variable named `sample_rate`
 
 
 def plot_signal(captured_signal, sample_rate, threshold=None):
+    # matplotlib takes most of a second to import, so only load it to plot
+    import matplotlib.pyplot as plt
+
     # Generate a time axis based on the length of your signal and the sample rate
     time_axis = np.arange(len(captured_signal)) / sample_rate
 
@@ -0,0 +1,65 @@
+from tomlkit.toml_document import TOMLDocument
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.burst_prep import TX_FORMATS
+
+BACKENDS = ("uhd", "synthetic", "file")
+
+
+def open_radio(settings: TOMLDocument, backend: str = None):
+    """Sets up the radio backend chosen by `backend` in the [RADIO] settings.
+
+    The backends are only imported when they are picked so the synthetic and
+    file backends work on machines without UHD.
+
+    Arguments:
+        settings (TOMLDocument): The contents of config.toml.
+
+        backend (str): Overrides the backend set in config.toml.
+
+    Returns:
+        SDR, SyntheticSDR or FileSDR: An object with rx_data, rx_slot and tx_data
+        methods.
+    """
+    toml_radio: dict = settings.get("RADIO")
+    backend = backend or toml_radio.get("backend", "uhd")
+    sample_rate: float = toml_radio["sample_rate"]
+    center_freq: float = toml_radio["center_freq"]
+    tx_gain: int = toml_radio["tx_gain"]
+    rx_gain: int = toml_radio["rx_gain"]
+    tx_format: str = toml_radio.get("tx_format", "fc32")
+    if tx_format not in TX_FORMATS:
+        raise ValueError(
+            f"Unknown TX format '{tx_format}', expected one of {TX_FORMATS}"
+        )
+    if backend == "uhd":
+        from helper_functions.uhd_interface import SDR
+
+        return SDR(sample_rate, center_freq, tx_gain, rx_gain, tx_format=tx_format)
+    if backend == "synthetic":
+        from helper_functions.synthetic_sdr import SyntheticSDR
+
+        return SyntheticSDR(
+            sample_rate,
+            center_freq,
+            tx_gain,
+            rx_gain,
+            tx_format=tx_format,
+            **settings.get("SYNTHETIC", {}),
+        )
+    if backend == "file":
+        from helper_functions.file_sdr import FileSDR
+
+        return FileSDR(
+            sample_rate,
+            center_freq,
+            tx_gain,
+            rx_gain,
+            tx_format=tx_format,
+            **settings.get("PLAYBACK", {}),
+        )
+    raise ValueError(f"Unknown radio backend '{backend}', expected one of {BACKENDS}")
@@ -0,0 +1,122 @@
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+# Values held in the slot state array
+SLOT_FREE = 0
+SLOT_IN_USE = 1
+
+
+class SampleRing:
+    def __init__(self, n_slots: int, slot_size: int, name: str = None):
+        """A fixed pool of preallocated sample buffers in shared memory.
+
+        One process fills slots and another process releases them once it is
+        done with the samples, so no buffer is allocated or pickled per chunk.
+        Each slot has a state byte that only the producer sets and only the
+        consumer clears, which makes the pool safe without a lock.
+
+        Arguments:
+            n_slots (int): The number of buffers in the pool.
+
+            slot_size (int): The number of complex64 samples each buffer holds.
+
+            name (str): The name of an existing pool to attach to. If None a new
+                pool is created.
+        """
+        self.n_slots: int = n_slots
+        self.slot_size: int = slot_size
+        self._owner: bool = name is None
+        data_bytes: int = n_slots * slot_size * np.dtype(np.complex64).itemsize
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=data_bytes + n_slots)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Only the creating process should unlink the memory
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self.name: str = self._shm.name
+        self._samples: np.ndarray = np.ndarray(
+            (n_slots * slot_size,), dtype=np.complex64, buffer=self._shm.buf
+        )
+        self._states: np.ndarray = np.ndarray(
+            (n_slots,), dtype=np.uint8, buffer=self._shm.buf, offset=data_bytes
+        )
+        if self._owner:
+            self._states[:] = SLOT_FREE
+        self._cursor: int = 0
+
+    def __getstate__(self) -> dict:
+        return {"n_slots": self.n_slots, "slot_size": self.slot_size, "name": self.name}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["n_slots"], state["slot_size"], state["name"])
+
+    def acquire(self, count: int = 1) -> int:
+        """Claims the next free run of slots for the producer.
+
+        Arguments:
+            count (int): The number of neighbouring slots to claim. Records that
+                span several slots never wrap around the end of the pool.
+
+        Returns:
+            int: The index of the first claimed slot or -1 if there was no free
+            run of slots.
+        """
+        if count > self.n_slots:
+            return -1
+        for _ in range(self.n_slots):
+            slot: int = self._cursor
+            if slot + count > self.n_slots:
+                slot = 0
+            self._cursor = (slot + count) % self.n_slots
+            if not self._states[slot : slot + count].any():
+                self._states[slot : slot + count] = SLOT_IN_USE
+                return slot
+        return -1
+
+    def release(self, slot: int, count: int = 1) -> None:
+        """Hands slots back to the producer once the consumer is done with them.
+
+        Arguments:
+            slot (int): The index of the first slot to release.
+
+            count (int): The number of neighbouring slots to release.
+        """
+        self._states[slot : slot + count] = SLOT_FREE
+
+    def slots_for(self, length: int) -> int:
+        """Returns the number of slots needed to hold `length` samples."""
+        return max(-(-length // self.slot_size), 1)
+
+    def slot(self, slot: int, count: int = 1) -> np.ndarray:
+        """Returns the whole buffer of a run of slots.
+
+        Arguments:
+            slot (int): The index of the first slot.
+
+            count (int): The number of neighbouring slots.
+        """
+        start: int = slot * self.slot_size
+        return self._samples[start : start + count * self.slot_size]
+
+    def view(self, slot: int, length: int) -> np.ndarray:
+        """Returns the valid samples held from a slot onwards without copying them.
+
+        Arguments:
+            slot (int): The index of the first slot.
+
+            length (int): The number of valid samples.
+        """
+        start: int = slot * self.slot_size
+        return self._samples[start : start + length]
+
+    def in_use(self) -> int:
+        """Returns the number of slots that have not been released."""
+        return int(np.count_nonzero(self._states))
+
+    def close(self) -> None:
+        """Detaches from the shared memory and removes it if this process created it."""
+        self._samples = None
+        self._states = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,201 @@
+import multiprocessing as mp
+from time import sleep, time
+import numpy as np
+import os, sys
+import queue
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.sample_ring import SampleRing
+
+
+class SampleTransport:
+    def __init__(self, n_slots: int, slot_size: int, queue_size: int = None):
+        """Moves samples from one process to another without pickling them.
+
+        The samples stay in a SampleRing and only small (slot, length, sequence)
+        descriptors travel through a queue. The consumer must release every
+        record it receives once it is done with the samples.
+
+        Arguments:
+            n_slots (int): The number of slots in the ring.
+
+            slot_size (int): The number of samples each slot holds. Records
+                longer than a slot take up several neighbouring slots, and
+                none can be longer than the whole ring, `max_length`.
+
+            queue_size (int): The maximum number of descriptors that can be
+                waiting. Defaults to `n_slots`.
+        """
+        self.ring: SampleRing = SampleRing(n_slots, slot_size)
+        self.queue_size: int = queue_size or n_slots
+        self.descriptor_q: mp.Queue = mp.Queue(self.queue_size)
+        self.max_length: int = n_slots * slot_size
+        self._sequence: int = 0
+
+    # Producer side
+
+    def reserve(self, length: int) -> tuple:
+        """Claims room for a record of `length` samples.
+
+        Arguments:
+            length (int): The number of samples that will be written.
+
+        Returns:
+            tuple (int, np.ndarray): The first slot of the record, or -1 if
+            there was no room, and the buffer to write the samples into.
+        """
+        slot: int = self.ring.acquire(self.ring.slots_for(length))
+        if slot < 0:
+            return (slot, None)
+        return (slot, self.ring.view(slot, length))
+
+    def publish(self, slot: int, length: int) -> int:
+        """Hands a filled record to the consumer.
+
+        Arguments:
+            slot (int): The first slot of the record.
+
+            length (int): The number of valid samples in the record.
+
+        Returns:
+            int: The sequence number given to the record.
+        """
+        sequence: int = self._sequence
+        self._sequence += 1
+        self.descriptor_q.put((slot, length, sequence))
+        return sequence
+
+    def skip(self) -> int:
+        """Uses up a sequence number without publishing a record, so the
+        consumer can tell that a record was lost.
+
+        Returns:
+            int: The sequence number that was skipped.
+        """
+        sequence: int = self._sequence
+        self._sequence += 1
+        return sequence
+
+    def steal(self):
+        """Takes back the oldest record the consumer has not received yet.
+
+        The caller must release the record. Its sequence number is never
+        seen by the consumer.
+
+        Returns:
+            tuple (int, int, int): The (slot, length, sequence) descriptor of
+            the record, or None if nothing was waiting.
+        """
+        try:
+            descriptor = self.descriptor_q.get_nowait()
+        except queue.Empty:
+            return None
+        if type(descriptor) == str:
+            # Control messages are never taken back
+            self.descriptor_q.put(descriptor)
+            return None
+        return descriptor
+
+    def send(self, samples: np.ndarray, timeout: float = None) -> bool:
+        """Copies samples into the ring and publishes them as one record.
+
+        A record longer than the whole ring is refused rather than split, since
+        the consumer would take each piece for a record of its own.
+
+        Arguments:
+            samples (np.ndarray): The samples to send.
+
+            timeout (float): The number of seconds to wait for room in the ring.
+                Waits forever if None.
+
+        Returns:
+            bool: False if the samples could not be sent before the timeout.
+        """
+        samples = samples.ravel()
+        if samples.size > self.max_length:
+            raise ValueError(
+                f"A record of {samples.size} samples does not fit in a ring of "
+                f"{self.max_length}"
+            )
+        wait_until: float = None if timeout is None else time() + timeout
+        slot, buffer = self.reserve(samples.size)
+        while slot < 0:
+            if wait_until is not None and time() > wait_until:
+                return False
+            sleep(0.0005)
+            slot, buffer = self.reserve(samples.size)
+        buffer[:] = samples
+        self.publish(slot, samples.size)
+        return True
+
+    @property
+    def sequence(self) -> int:
+        """The sequence number the next record will be given."""
+        return self._sequence
+
+    def send_done(self) -> None:
+        """Tells the consumer that no more records are coming."""
+        self.descriptor_q.put("DONE")
+
+    def full(self) -> bool:
+        """Returns True if the consumer has fallen a whole queue behind."""
+        return self.descriptor_q.full()
+
+    def qsize(self) -> int:
+        """Returns the number of records waiting for the consumer."""
+        return self.descriptor_q.qsize()
+
+    # Consumer side
+
+    def recv(self, timeout: float = None):
+        """Waits for the next record.
+
+        Arguments:
+            timeout (float): The number of seconds to wait. Waits forever if None.
+
+        Returns:
+            tuple (int, int, int) or str: The (slot, length, sequence) descriptor
+            of the record, "DONE" once the producer is finished, or None if the
+            timeout ran out.
+        """
+        try:
+            return self.descriptor_q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def view(self, slot: int, length: int) -> np.ndarray:
+        """Returns the samples of a record without copying them.
+
+        Arguments:
+            slot (int): The first slot of the record.
+
+            length (int): The number of samples in the record.
+        """
+        return self.ring.view(slot, length)
+
+    def release(self, slot: int, length: int) -> None:
+        """Hands the slots of a record back to the producer.
+
+        Arguments:
+            slot (int): The first slot of the record.
+
+            length (int): The number of samples in the record.
+        """
+        self.ring.release(slot, self.ring.slots_for(length))
+
+    def drain(self) -> None:
+        """Throws away every waiting record."""
+        while True:
+            try:
+                descriptor = self.descriptor_q.get(timeout=0.1)
+            except queue.Empty:
+                break
+            if type(descriptor) == tuple:
+                self.release(descriptor[0], descriptor[1])
+
+    def close(self) -> None:
+        """Frees the shared memory of the ring."""
+        self.ring.close()
@@ -0,0 +1,177 @@
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.packet_layout import FEATURE_DTYPE
+
+# The share of a packet's power its occupied bandwidth holds
+OCCUPIED_POWER = 0.99
+# The smallest FFT a short packet is padded to
+MIN_FFT_SIZE = 64
+
+
+def next_power_of_two(length: int) -> int:
+    return 1 << max(int(length) - 1, 0).bit_length()
+
+
+class SpectralAnalyzer:
+    def __init__(self, fft_size: int = 1024, max_segments: int = 8):
+        """Measures the spectrum of packets a batch at a time.
+
+        A packet at least `fft_size` long is cut into Hann windowed segments of
+        `fft_size` samples that overlap by at least half, and their power
+        spectra are averaged (Welch's method). At most `max_segments` are taken,
+        spread evenly over the packet, so the work per packet does not grow
+        with its length. A shorter packet is windowed as a whole and
+        zero padded to the next power of two. The segments of every packet in
+        a batch that share an FFT size are stacked and transformed with one
+        call. Keeping to powers of two bounds the number of FFT sizes. The
+        frequency bins of each size and the window of each packet length are
+        kept for the next batch.
+
+        Nothing is removed at 0 Hz, since a packet on the frequency the radio
+        is tuned to is a carrier there. The DC offset of the radio is measured
+        like any other tone, so it only wins over packets weaker than it.
+
+        Arguments:
+            fft_size (int): The segment length of long packets, a power of two.
+                It sets the frequency resolution to sample_rate / fft_size.
+
+            max_segments (int): The most segments averaged for one packet.
+        """
+        if fft_size < MIN_FFT_SIZE or fft_size != next_power_of_two(fft_size):
+            raise ValueError(
+                f"fft_size must be a power of two of at least {MIN_FFT_SIZE}, "
+                f"not {fft_size}"
+            )
+        self.fft_size: int = fft_size
+        self.max_segments: int = max(max_segments, 1)
+        self._hop: int = fft_size // 2
+        # FFT size -> (window, frequency of each shifted bin in cycles/sample)
+        self._plans: dict = dict()
+        # Packet length -> the window of a short packet. Short packets are
+        # under fft_size long, so there are at most fft_size of them
+        self._windows: dict = dict()
+
+    def __plan(self, size: int) -> tuple:
+        plan: tuple = self._plans.get(size)
+        if plan is None:
+            window: np.ndarray = np.hanning(size).astype(np.float32)
+            freqs: np.ndarray = np.fft.fftshift(np.fft.fftfreq(size))
+            plan = self._plans[size] = (window, freqs)
+        return plan
+
+    def __long_spectra(self, packets: list) -> np.ndarray:
+        """Returns the averaged spectrum of each packet, one row each."""
+        size: int = self.fft_size
+        window, _ = self.__plan(size)
+        segments: list = list()
+        for packet in packets:
+            # The step between segments that fits max_segments of them in
+            spread: int = -(-(packet.size - size) // max(self.max_segments - 1, 1))
+            step: int = max(self._hop, spread)
+            view = np.lib.stride_tricks.sliding_window_view(packet, size)
+            segments.append(view[::step][: self.max_segments])
+        counts: np.ndarray = np.array([segment.shape[0] for segment in segments])
+        frames: np.ndarray = np.concatenate(segments)
+        frames *= window
+        spectra: np.ndarray = np.fft.fft(frames, axis=1)
+        power: np.ndarray = spectra.real**2 + spectra.imag**2
+        starts: np.ndarray = np.cumsum(counts) - counts
+        return np.add.reduceat(power, starts, axis=0) / counts[:, None]
+
+    def __short_spectra(self, packets: list, size: int) -> np.ndarray:
+        """Returns the spectrum of each packet padded to `size`, one row each."""
+        frames: np.ndarray = np.zeros((len(packets), size), dtype=np.complex64)
+        for row, packet in enumerate(packets):
+            window: np.ndarray = self._windows.get(packet.size)
+            if window is None:
+                window = np.hanning(packet.size).astype(np.float32)
+                self._windows[packet.size] = window
+            frames[row, : packet.size] = packet * window
+        spectra: np.ndarray = np.fft.fft(frames, axis=1)
+        return spectra.real**2 + spectra.imag**2
+
+    def __features(
+        self,
+        power: np.ndarray,
+        size: int,
+        sample_rates: np.ndarray,
+        center_freqs: np.ndarray,
+        out: np.ndarray,
+    ) -> None:
+        """Fills in the features of packets from their power spectra.
+
+        The noise per bin is taken as the median bin, which holds as long as
+        the packet takes up less than half the band. It is removed before the
+        occupied bandwidth is measured so wideband noise does not widen it.
+        """
+        _, freqs = self.__plan(size)
+        power = np.fft.fftshift(power, axes=1)
+        out["dominant_freq"] = center_freqs + freqs[power.argmax(axis=1)] * sample_rates
+        noise: np.ndarray = np.median(power, axis=1)
+        signal: np.ndarray = np.maximum(power - noise[:, None], 0)
+        cumulative: np.ndarray = np.cumsum(signal, axis=1)
+        total: np.ndarray = cumulative[:, -1]
+        tail: float = (1 - OCCUPIED_POWER) / 2
+        low: np.ndarray = (cumulative < (total * tail)[:, None]).sum(axis=1)
+        high: np.ndarray = (cumulative < (total * (1 - tail))[:, None]).sum(axis=1)
+        in_band: np.ndarray = np.minimum(high, size - 1) - low + 1
+        out["bandwidth"] = in_band * sample_rates / size
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["snr_db"] = 10 * np.log10(total * OCCUPIED_POWER / (noise * in_band))
+        # A packet with nothing above the noise has nothing to measure
+        silent: np.ndarray = total == 0
+        out[silent] = np.nan
+
+    def analyze(
+        self, packets: list, sample_rates: np.ndarray, center_freqs: np.ndarray
+    ) -> np.ndarray:
+        """Measures a batch of packets.
+
+        Arguments:
+            packets (list[np.ndarray]): 1D complex64 packets.
+
+            sample_rates (np.ndarray): The sample rate of each packet.
+
+            center_freqs (np.ndarray): The center frequency of each packet.
+
+        Returns:
+            np.ndarray: One FEATURE_DTYPE row per packet. Empty packets are
+            all NaN.
+        """
+        sample_rates = np.asarray(sample_rates, dtype=np.float64)
+        center_freqs = np.asarray(center_freqs, dtype=np.float64)
+        features: np.ndarray = np.full(len(packets), np.nan, dtype=FEATURE_DTYPE)
+        # Packets long enough to be cut into segments, and the shorter ones
+        # grouped by the size they are padded to
+        long_rows: list = list()
+        long_packets: list = list()
+        groups: dict = dict()
+        for row, packet in enumerate(packets):
+            if packet.size == 0:
+                continue
+            if packet.size >= self.fft_size:
+                long_rows.append(row)
+                long_packets.append(packet)
+                continue
+            size: int = max(next_power_of_two(packet.size), MIN_FFT_SIZE)
+            rows, short_packets = groups.setdefault(size, (list(), list()))
+            rows.append(row)
+            short_packets.append(packet)
+        batches: list = [
+            (rows, size, self.__short_spectra(short_packets, size))
+            for size, (rows, short_packets) in groups.items()
+        ]
+        if long_rows:
+            batches.append(
+                (long_rows, self.fft_size, self.__long_spectra(long_packets))
+            )
+        for rows, size, spectra in batches:
+            out: np.ndarray = np.empty(len(rows), dtype=FEATURE_DTYPE)
+            self.__features(spectra, size, sample_rates[rows], center_freqs[rows], out)
+            features[rows] = out
+        return features
@@ -0,0 +1,171 @@
+import numpy as np
+from time import perf_counter, sleep
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.sample_ring import SampleRing
+from helper_functions.tx_sink import TxSink, SinkTransmitter
+
+# The number of noise samples generated up front and reused for every chunk
+NOISE_TABLE_SIZE = 1 << 20
+
+
+class SyntheticSDR(SinkTransmitter):
+    """Stands in for the SDR by generating noise with bursts in it.
+
+    Provides the same rx_data, rx_slot and tx_data methods as SDR so the rest of
+    the pipeline can run without a USRP.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float,
+        center_freq: float,
+        tx_gain: int,
+        rx_gain: int,
+        packet_rate: float = 20.0,
+        packet_duration: float = 1e-3,
+        amplitude: float = 3.0,
+        noise_variance: float = 0.1,
+        chunk_size: int = 24960,
+        realtime: bool = True,
+        seed: int = 0,
+        tx_format: str = "fc32",
+    ):
+        """
+        Arguments:
+            sample_rate (float): The number of samples generated per second.
+
+            center_freq (float): Kept for parity with SDR.
+
+            packet_rate (float): The average number of bursts per second.
+
+            packet_duration (float): The length of each burst in seconds.
+
+            amplitude (float): The magnitude of the burst tone.
+
+            noise_variance (float): The variance of the complex gaussian noise.
+
+            chunk_size (int): The number of samples returned by each rx call.
+
+            realtime (bool): If True rx calls are paced to `sample_rate` and
+                falling behind is counted as an overflow like the USRP would.
+                Untimed sends also take as long as the samples take to
+                transmit.
+
+            tx_format (str): The format packets are converted to before they
+                are sent, as SDR's TX streamer takes.
+        """
+        self._sample_rate: float = sample_rate
+        self._center_freq: float = center_freq
+        self._tx_gain: int = tx_gain
+        self._rx_gain: int = rx_gain
+        self.packet_rate: float = packet_rate
+        self.packet_length: int = max(int(packet_duration * sample_rate), 1)
+        self.realtime: bool = realtime
+        self.rx_chunk_size: int = chunk_size
+        self.overflows: int = 0
+        self.tx_format: str = tx_format
+        self.tx_sink: TxSink = TxSink(sample_rate, realtime)
+        self._rng = np.random.default_rng(seed)
+        self._noise: np.ndarray = (
+            self._rng.normal(0, np.sqrt(noise_variance / 2), NOISE_TABLE_SIZE)
+            + 1j * self._rng.normal(0, np.sqrt(noise_variance / 2), NOISE_TABLE_SIZE)
+        ).astype(np.complex64)
+        # A tone a quarter of the sample rate away from the center frequency
+        self._burst: np.ndarray = (
+            amplitude * np.exp(0.5j * np.pi * np.arange(self.packet_length))
+        ).astype(np.complex64)
+        self._recv_buffer = np.empty(chunk_size, dtype=np.complex64)
+        self._position: int = 0
+        self._next_burst: int = self.__burst_gap()
+        self._start_time: float = None
+
+    def __burst_gap(self) -> int:
+        """Draws the number of samples until the next burst starts."""
+        if self.packet_rate <= 0:
+            return np.iinfo(np.int64).max
+        return int(self._rng.exponential(self._sample_rate / self.packet_rate))
+
+    def __pace(self) -> None:
+        """Waits until the next chunk would have been received by a real radio."""
+        if self._start_time is None:
+            self._start_time = perf_counter()
+        due: float = self._start_time + self._position / self._sample_rate
+        late: float = perf_counter() - due
+        if late > self.rx_chunk_size / self._sample_rate:
+            # The radio would have dropped the samples that were not read in time
+            self.overflows += 1
+            skipped: int = int(late * self._sample_rate)
+            self._position += skipped
+            while self._next_burst < self._position:
+                self._next_burst += self.packet_length + self.__burst_gap()
+            return
+        if late < 0:
+            sleep(-late)
+
+    def __fill(self, buffer: np.ndarray) -> int:
+        """Writes the next chunk of the stream into `buffer`."""
+        if self.realtime:
+            self.__pace()
+        size: int = buffer.size
+        # The noise table is read in a loop, so chunks may be longer than it
+        filled: int = 0
+        while filled < size:
+            start: int = (self._position + filled) % NOISE_TABLE_SIZE
+            count: int = min(size - filled, NOISE_TABLE_SIZE - start)
+            buffer[filled : filled + count] = self._noise[start : start + count]
+            filled += count
+        end: int = self._position + size
+        # Add every burst that overlaps this chunk
+        while self._next_burst < end:
+            burst_end: int = self._next_burst + self.packet_length
+            first: int = max(self._next_burst, self._position)
+            last: int = min(burst_end, end)
+            buffer[first - self._position : last - self._position] += self._burst[
+                first - self._next_burst : last - self._next_burst
+            ]
+            if burst_end > end:
+                break
+            self._next_burst = burst_end + self.__burst_gap()
+        self._position = end
+        return size
+
+    def rx_into(self, buffer: np.ndarray) -> int:
+        """Generates the next chunk of samples into a buffer.
+
+        Arguments:
+            buffer (np.ndarray): A 1D complex64 array with room for at least
+                rx_chunk_size samples.
+
+        Returns:
+            int: The number of samples written to the start of `buffer`.
+        """
+        return self.__fill(buffer[: self.rx_chunk_size])
+
+    def rx_data(self) -> np.ndarray:
+        """Generates the next chunk of samples.
+
+        Returns:
+            np.ndarray: A 1D copy of the samples.
+        """
+        num_rx: int = self.__fill(self._recv_buffer)
+        return self._recv_buffer[:num_rx].copy()
+
+    def rx_slot(self, ring: SampleRing) -> tuple:
+        """Generates the next chunk of samples straight into a free slot of a ring.
+
+        Arguments:
+            ring (SampleRing): The pool of buffers to write into.
+
+        Returns:
+            tuple (int, int): The slot that was written to, or -1 if no slot was
+            free, and the number of valid samples in the slot.
+        """
+        slot: int = ring.acquire()
+        if slot < 0:
+            return (slot, 0)
+        return (slot, self.__fill(ring.slot(slot)[: self.rx_chunk_size]))
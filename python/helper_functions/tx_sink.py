@@ -0,0 +1,205 @@
+import numpy as np
+from time import perf_counter, sleep
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.burst_prep import prepare_burst
+
+
+class TxSink:
+    def __init__(self, sample_rate: float, realtime: bool = True):
+        """Stands in for the transmit side of a USRP and records when each burst
+        would have gone out.
+
+        A burst with a time is sent at exactly that time by the device clock,
+        as a USRP does, unless it arrives after that time. Then it is dropped
+        and counted as late, as a USRP reports a time error. A burst without a
+        time goes out as soon as it is sent, and sending it takes as long as it
+        takes to transmit when `realtime` is set, as the UHD send call blocks
+        while the samples go out.
+
+        The device clock is the host's perf_counter. A timed burst is
+        recorded as going out at its time, as the radio would send it, so how
+        evenly timed bursts go out is true by construction. What is measured is
+        the lead, how long before its time each burst was handed over.
+
+        Arguments:
+            sample_rate (float): The rate the bursts are transmitted at.
+
+            realtime (bool): If True untimed sends take as long as the burst
+                does to transmit.
+        """
+        self.sample_rate: float = sample_rate
+        self.realtime: bool = realtime
+        self.samples_sent: int = 0
+        self.late: int = 0
+        self._late_reported: int = 0
+        # When each burst started going out by the device clock, NaN for the
+        # bursts that were late
+        self.emitted: list = list()
+        # The seconds from each timed send being handed over to its time,
+        # below zero for the ones that were late
+        self.leads: list = list()
+        # The (time, center_freq, tx_gain) of each retune
+        self.tunes: list = list()
+
+    def time_now(self) -> float:
+        return perf_counter()
+
+    def send(
+        self,
+        data: np.ndarray,
+        time_spec: float = None,
+        bursts: int = 1,
+        period: float = 0.0,
+    ) -> None:
+        """Transmits a buffer of one or more bursts.
+
+        Arguments:
+            data (np.ndarray): The samples of the buffer.
+
+            time_spec (float): When the buffer goes out by the device clock, or
+                None to send it straight away.
+
+            bursts (int): How many bursts the buffer holds.
+
+            period (float): The seconds from the start of one burst in the
+                buffer to the start of the next.
+        """
+        now: float = perf_counter()
+        offsets: np.ndarray = np.arange(bursts) * period
+        if time_spec is not None:
+            self.leads.append(time_spec - now)
+            if now > time_spec:
+                self.late += bursts
+                self.emitted.extend([float("nan")] * bursts)
+                return
+            self.emitted.extend(time_spec + offsets)
+        else:
+            self.emitted.extend(now + offsets)
+            if self.realtime:
+                sleep(data.size / self.sample_rate)
+        self.samples_sent += data.size
+
+    def tune(
+        self, center_freq: float = None, tx_gain: float = None, time_spec: float = None
+    ) -> None:
+        """Records a retune at `time_spec`, or now if None. A None frequency
+        or gain is left as it was."""
+        when: float = perf_counter() if time_spec is None else time_spec
+        self.tunes.append((when, center_freq, tx_gain))
+
+    def events(self) -> dict:
+        """Returns the number of bursts that were late since the last call, in
+        the form SDR.tx_events uses."""
+        late: int = self.late - self._late_reported
+        self._late_reported = self.late
+        return {"underflows": 0, "late": late}
+
+    def stats(self, interval: float) -> dict:
+        """Returns how evenly the bursts went out, see `timing_stats`, and the
+        smallest lead of the timed sends and its standard deviation, which is
+        the jitter of the host handing them over. Both are NaN without timed
+        sends."""
+        stats: dict = timing_stats(np.array(self.emitted), interval)
+        stats["late"] = self.late
+        leads: np.ndarray = np.array(self.leads)
+        stats["min_lead"] = float(leads.min()) if leads.size else float("nan")
+        stats["lead_jitter"] = float(leads.std()) if leads.size else float("nan")
+        return stats
+
+
+class SinkTransmitter:
+    """The transmit side of the SDR stand ins, which send to a TxSink.
+
+    The class using it sets `tx_sink` and `tx_format`.
+    """
+
+    tx_sink: TxSink
+    tx_format: str
+
+    @property
+    def samples_sent(self) -> int:
+        return self.tx_sink.samples_sent
+
+    def get_time_now(self) -> float:
+        """Returns the time on the stand in device clock in seconds."""
+        return self.tx_sink.time_now()
+
+    def tx_data(self, data: np.ndarray) -> None:
+        """Pretends to send data straight away, see TxSink. The packet is
+        converted to tx_format first, as SDR does.
+
+        Arguments:
+            data (np.ndarray): The packet to be transmitted.
+        """
+        self.tx_sink.send(prepare_burst(data, self.tx_format))
+
+    def tx_burst(
+        self,
+        data: np.ndarray,
+        time_spec: float = None,
+        bursts: int = 1,
+        period: float = 0.0,
+    ) -> None:
+        """Pretends to send a whole burst, see TxSink.
+
+        Arguments:
+            data (np.ndarray): The burst to be transmitted.
+
+            time_spec (float): When the burst goes out by get_time_now, or
+                None to send it straight away.
+
+            bursts, period: How many bursts a gapless buffer holds and the
+                seconds between their starts, so each is recorded.
+        """
+        self.tx_sink.send(data, time_spec, bursts, period)
+
+    def tune_tx(
+        self, center_freq: float = None, tx_gain: float = None, time_spec: float = None
+    ) -> None:
+        """Pretends to retune, see TxSink."""
+        self.tx_sink.tune(center_freq, tx_gain, time_spec)
+
+    def tx_events(self) -> dict:
+        """Returns the bursts that were late since the last call."""
+        return self.tx_sink.events()
+
+
+def timing_stats(emitted: np.ndarray, interval: float) -> dict:
+    """Measures how far the times bursts went out are from a fixed interval.
+
+    Arguments:
+        emitted (np.ndarray): When each burst went out, in seconds, NaN for
+            bursts that did not go out.
+
+        interval (float): The time that was asked for from the start of one
+            burst to the start of the next.
+
+    Returns:
+        dict: The number of bursts, the mean and standard deviation of the
+        intervals achieved, and the largest error from where each burst would
+        be on an exact schedule starting at the first, all in seconds. The
+        last grows with drift, the standard deviation is the jitter.
+    """
+    sent: np.ndarray = np.flatnonzero(~np.isnan(emitted))
+    stats: dict = {
+        "bursts": int(sent.size),
+        "mean_interval": float("nan"),
+        "jitter": float("nan"),
+        "max_error": float("nan"),
+    }
+    if sent.size < 2:
+        return stats
+    # Only bursts that went out one after the other count as an interval
+    intervals: np.ndarray = np.diff(emitted)
+    intervals = intervals[~np.isnan(intervals)]
+    schedule: np.ndarray = emitted[sent[0]] + interval * (sent - sent[0])
+    if intervals.size:
+        stats["mean_interval"] = float(intervals.mean())
+        stats["jitter"] = float(intervals.std())
+    stats["max_error"] = float(np.abs(emitted[sent] - schedule).max())
+    return stats
@@ -7,6 +7,8 @@ PYTHON_DIR = f"{FILE_DIR}/../"
 sys.path.insert(0, PYTHON_DIR)
 
 from helper_functions.plot_signal import plot_signal
+from helper_functions.sample_ring import SampleRing
+from helper_functions.burst_prep import prepare_burst, tx_dtype
 
 
 class SDR:
@@ -22,12 +24,15 @@ class SDR:
         tx_gain: int,
         rx_gain: int,
         usrp_device_name: str = None,
+        tx_format: str = "fc32",
     ):
         self._sample_rate: float = sample_rate
         self._center_freq: float = center_freq
         self._tx_gain: int = tx_gain
         self._rx_gain: int = rx_gain
         self._usrp_device_name: str = usrp_device_name
+        # The host format of TX samples, see burst_prep
+        self.tx_format: str = tx_format
         # RX
         self._rx_stream_cmd = uhd.types.StreamCMD(uhd.types.StreamMode.start_cont)
         self._rx_stream_cmd.stream_now = True
@@ -41,6 +46,17 @@ class SDR:
         self._tx2_meta_data.has_time_spec = False
         self._tx2_meta_data.start_of_burst = False
         self._tx2_meta_data.end_of_burst = True
+        self._tx_tail = np.zeros((1, 10), dtype=tx_dtype(tx_format))
+        # A whole burst in one send, at a set time when there is one
+        self._burst_meta_data = uhd.types.TXMetadata()
+        self._burst_meta_data.start_of_burst = True
+        self._burst_meta_data.end_of_burst = True
+        # The rest of a burst the first send did not take
+        self._burst_rest_meta_data = uhd.types.TXMetadata()
+        self._burst_rest_meta_data.has_time_spec = False
+        self._burst_rest_meta_data.start_of_burst = False
+        self._burst_rest_meta_data.end_of_burst = True
+        self._tx_async_meta_data = uhd.types.TXAsyncMetadata()
         # USRP
         if usrp_device_name is not None:
             self._usrp_device = uhd.usrp.MultiUSRP(
@@ -54,6 +70,10 @@ class SDR:
         # Setup RX and TX
         self.set_rx()
         self.set_tx()
+        # Reused by rx_data so a buffer is not allocated on every call
+        self.rx_chunk_size: int = self._rx_streamer.get_max_num_samps() * 10
+        self._recv_buffer = np.empty((1, self.rx_chunk_size), dtype=np.complex64)
+        self.overflows: int = 0
 
     def set_tx(self) -> None:
         """Sets up the USRP TX"""
@@ -70,7 +90,7 @@ class SDR:
                 print("waiting for usrp lo lock")
                 sleep(0.01)
             # setup stream and receive buffer
-            st_args = uhd.usrp.StreamArgs("fc32", "sc16")
+            st_args = uhd.usrp.StreamArgs(self.tx_format, "sc16")
             st_args.channels = [0]
             self._tx_streamer = self._usrp_device.get_tx_stream(st_args)
         except Exception as e:
@@ -103,21 +123,150 @@ class SDR:
     def tx_data(self, data: np.ndarray) -> None:
         """Sends data out over the USRP
 
+        The packet is converted to tx_format first. Use prepare_burst and
+        tx_burst to convert it once when it is sent more than once.
+
         Arguments:
             data (np.ndarray): The packet to be transmitted.
         """
+        data = prepare_burst(data, self.tx_format)
         self._tx_streamer.send(data, self._tx_meta_data)
-        self._tx_streamer.send(np.zeros(10, dtype=np.complex64), self._tx2_meta_data)
+        self._tx_streamer.send(self._tx_tail, self._tx2_meta_data)
 
-    def rx_data(self) -> np.ndarray:
-        """Receive data from the USRP"""
-        self._recv_buffer = np.zeros(
-            (1, self._rx_streamer.get_max_num_samps() * 10), dtype=np.complex64
+    def get_time_now(self) -> float:
+        """Returns the time on the USRP's clock in seconds."""
+        return self._usrp_device.get_time_now().get_real_secs()
+
+    def tx_burst(
+        self,
+        data: np.ndarray,
+        time_spec: float = None,
+        bursts: int = 1,
+        period: float = 0.0,
+        timeout: float = 1.0,
+    ) -> None:
+        """Sends a whole burst, at a set time on the USRP's clock if one is
+        given. The USRP holds the burst until then, so it goes out on the
+        sample it was due whenever the host sent it, as long as it arrived
+        first. One that arrives late is dropped and reported by tx_events.
+
+        Arguments:
+            data (np.ndarray): The burst as a (1, N) array in tx_format, from
+                prepare_burst, so it is not converted on every send.
+
+            time_spec (float): When the burst goes out by get_time_now, or
+                None to send it straight away.
+
+            bursts, period: How many bursts a gapless buffer holds and the
+                seconds between their starts. The USRP sends the buffer as it
+                is, so they are not used here. The stand in radios log each
+                burst with them.
+
+            timeout (float): The longest to wait for room in the USRP's buffers.
+        """
+        self._burst_meta_data.has_time_spec = time_spec is not None
+        if time_spec is not None:
+            self._burst_meta_data.time_spec = uhd.types.TimeSpec(time_spec)
+        size: int = data.shape[-1]
+        sent: int = self._tx_streamer.send(data, self._burst_meta_data, timeout)
+        while sent and sent < size:
+            more: int = self._tx_streamer.send(
+                data[..., sent:], self._burst_rest_meta_data, timeout
+            )
+            if not more:
+                break
+            sent += more
+        if sent < size:
+            print(f"tx timed out after {sent} of {size} samples")
+
+    def tune_tx(
+        self, center_freq: float = None, tx_gain: float = None, time_spec: float = None
+    ) -> None:
+        """Changes the TX frequency or gain, at a set time on the USRP's clock
+        if one is given so it lands between two timed bursts.
+
+        Arguments:
+            center_freq (float): The new center frequency, None to leave it.
+
+            tx_gain (float): The new gain, None to leave it.
+
+            time_spec (float): When the change is made by get_time_now, or
+                None to make it now.
+        """
+        if time_spec is not None:
+            self._usrp_device.set_command_time(uhd.types.TimeSpec(time_spec))
+        if center_freq is not None:
+            self._usrp_device.set_tx_freq(
+                uhd.libpyuhd.types.tune_request(center_freq), 0
+            )
+            self._center_freq = center_freq
+        if tx_gain is not None:
+            self._usrp_device.set_tx_gain(tx_gain, 0)
+            self._tx_gain = tx_gain
+        if time_spec is not None:
+            self._usrp_device.clear_command_time()
+
+    def tx_events(self) -> dict:
+        """Returns the underflows and late bursts the USRP has reported since
+        the last call."""
+        events: dict = {"underflows": 0, "late": 0}
+        codes = uhd.types.TXMetadataEventCode
+        while self._tx_streamer.recv_async_msg(self._tx_async_meta_data, 0.0):
+            code = self._tx_async_meta_data.event_code
+            if code in (codes.underflow, codes.underflow_in_packet):
+                events["underflows"] += 1
+            elif code == codes.time_error:
+                events["late"] += 1
+        return events
+
+    def rx_into(self, buffer: np.ndarray) -> int:
+        """Receive data from the USRP into a buffer.
+
+        Overflows reported by the USRP are counted in `overflows` rather than
+        printed, since they come in bursts when the host falls behind.
+
+        Arguments:
+            buffer (np.ndarray): A 1D complex64 array with room for at least
+                rx_chunk_size samples.
+
+        Returns:
+            int: The number of samples written to the start of `buffer`.
+        """
+        num_rx: int = self._rx_streamer.recv(
+            buffer[: self.rx_chunk_size].reshape(1, -1), self._rx_meta_data, 0.1
         )
-        self._rx_streamer.recv(self._recv_buffer, self._rx_meta_data, 0.1)
-        if self._rx_meta_data.error_code != uhd.types.RXMetadataErrorCode.none:
+        error_code = self._rx_meta_data.error_code
+        if error_code == uhd.types.RXMetadataErrorCode.overflow:
+            self.overflows += 1
+        elif error_code != uhd.types.RXMetadataErrorCode.none:
             print(f"error: {self._rx_meta_data.strerror()}")
-        return self._recv_buffer
+        return num_rx
+
+    def rx_data(self) -> np.ndarray:
+        """Receive data from the USRP
+
+        Returns:
+            np.ndarray: A 1D copy of the samples that were received.
+        """
+        num_rx: int = self.rx_into(self._recv_buffer[0])
+        return self._recv_buffer[0, :num_rx].copy()
+
+    def rx_slot(self, ring: SampleRing) -> tuple:
+        """Receive data from the USRP straight into the next free slot of a ring.
+
+        Arguments:
+            ring (SampleRing): The pool of buffers to receive into. Its slots
+                must hold at least rx_chunk_size samples.
+
+        Returns:
+            tuple (int, int):
+            - int: The slot the samples were written to or -1 if no slot was free.
+            - int: The number of valid samples in the slot.
+        """
+        slot: int = ring.acquire()
+        if slot < 0:
+            return (slot, 0)
+        return (slot, self.rx_into(ring.slot(slot)))
 
 
 if __name__ == "__main__":
@@ -128,14 +277,5 @@ if __name__ == "__main__":
     for _ in range(50):
         data = sdr.rx_data()
         signals.append(data)
-    big_signal = None
-    first = True
-    for signal in signals:
-        signal = signal.ravel()
-        if first:
-            big_signal = np.trim_zeros(signal)
-            first = False
-        else:
-            signal = np.trim_zeros(signal)
-            big_signal = np.concatenate((big_signal, signal))
+    big_signal = np.concatenate(signals)
     plot_signal(big_signal, 15000000.0, 0.6)
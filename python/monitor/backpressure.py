@@ -0,0 +1,352 @@
+from collections import deque
+from time import sleep, time
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.shared_transport import SampleTransport
+from monitor.metrics import (
+    CHUNKS_DROPPED,
+    CHUNKS_RECEIVED,
+    SAMPLES_RECEIVED,
+    STREAM_QUEUE_DEPTH,
+)
+from monitor.profiler import ENQUEUE, RX, span
+
+MODES = ("block", "drop-oldest", "drop-newest", "spill")
+
+
+class SpillBuffer:
+    def __init__(self, path: str, max_bytes: int):
+        """A first in first out queue of chunks kept in a file on disk.
+
+        The file is used as a ring, so it never grows past `max_bytes` however
+        long the queue goes without emptying.
+
+        Arguments:
+            path (str): The file the chunks are written to. It is removed on
+                close.
+
+            max_bytes (int): The most samples, in bytes, the file may hold.
+        """
+        self.path: str = path
+        self.max_bytes: int = max_bytes
+        self._file = open(path, "w+b")
+        self._lengths: deque = deque()
+        self._read_position: int = 0
+        self._write_position: int = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def chunks(self) -> int:
+        """Returns the number of chunks waiting, not counting dropped ones."""
+        return len(self._lengths) - self._lengths.count(0)
+
+    def write(self, samples: np.ndarray) -> bool:
+        """Adds a chunk to the end of the queue.
+
+        Returns:
+            bool: False if the chunk did not fit.
+        """
+        if self._write_position - self._read_position + samples.nbytes > self.max_bytes:
+            return False
+        data: memoryview = memoryview(samples.view(np.uint8).reshape(-1))
+        offset: int = self._write_position % self.max_bytes
+        split: int = min(len(data), self.max_bytes - offset)
+        self._file.seek(offset)
+        self._file.write(data[:split])
+        if split < len(data):
+            self._file.seek(0)
+            self._file.write(data[split:])
+        self._write_position += samples.nbytes
+        self._lengths.append(samples.size)
+        return True
+
+    def mark_gap(self) -> None:
+        """Records that a chunk was dropped after the ones already queued."""
+        self._lengths.append(0)
+
+    def next_is_gap(self) -> bool:
+        """Returns True if the front of the queue is a dropped chunk."""
+        return self._lengths[0] == 0
+
+    def read_into(self, buffer: np.ndarray) -> int:
+        """Moves the chunk at the front of the queue into `buffer`.
+
+        Returns:
+            int: The number of samples written to the start of `buffer`, 0 for
+            a dropped chunk.
+        """
+        length: int = self._lengths.popleft()
+        data: memoryview = memoryview(buffer[:length].view(np.uint8))
+        offset: int = self._read_position % self.max_bytes
+        split: int = min(len(data), self.max_bytes - offset)
+        self._file.seek(offset)
+        self._file.readinto(data[:split])
+        if split < len(data):
+            self._file.seek(0)
+            self._file.readinto(data[split:])
+        self._read_position += len(data)
+        if not self._lengths:
+            # Start over at the beginning of the file once it has been emptied
+            self._read_position = 0
+            self._write_position = 0
+        return length
+
+    def close(self) -> None:
+        self._file.close()
+        os.remove(self.path)
+
+
+class Backpressure:
+    def __init__(
+        self,
+        stream: SampleTransport,
+        sdr,
+        mode: str = "drop-oldest",
+        stats_interval: float = 10.0,
+        spill_path: str = None,
+        spill_max_bytes: int = 1 << 30,
+        tap: SampleTransport = None,
+        noise_floor=None,
+        metrics=None,
+        profiler=None,
+    ):
+        """Moves chunks from the radio into the stream and decides what happens
+        when packet_detect falls behind.
+
+        The radio is read on every call in every mode except block, so it never
+        overflows because the stream is full.
+
+        - block: waits for packet_detect to free a slot before reading the radio
+            again. Nothing is dropped here, but the radio may overflow.
+        - drop-oldest: takes back the oldest chunk packet_detect has not started
+            on and reuses its slot.
+        - drop-newest: reads the chunk into a scratch buffer and drops it.
+        - spill: writes chunks to a file on disk and feeds them to the stream
+            in order once there is room again. Chunks are dropped as in
+            drop-newest once the file holds `spill_max_bytes`.
+
+        Packet_detect closes any open packet when it sees a chunk was dropped.
+
+        Arguments:
+            stream (SampleTransport): The transport to packet_detect.
+
+            sdr (SDR, SyntheticSDR or FileSDR): The radio to read.
+
+            mode (str): One of MODES.
+
+            stats_interval (float): The number of seconds between stats lines.
+                0 turns them off.
+
+            spill_path (str): The file used in spill mode.
+
+            spill_max_bytes (int): The largest the spill file may grow.
+
+            tap (SampleTransport): If set, a copy of every chunk read from the
+                radio is sent here, whatever happens to it in the stream. A
+                chunk is skipped rather than waited for if the tap is full.
+
+            noise_floor (NoiseFloor): If set, the estimate packet_detect keeps
+                is included in the stats.
+
+            metrics (Metrics): If set, the chunks received and dropped, the
+                stream queue depth and when each chunk arrived are recorded.
+
+            profiler (Profiler): If set, reading the radio and handing chunks
+                to the stream are timed.
+        """
+        if mode not in MODES:
+            raise ValueError(
+                f"Unknown backpressure mode '{mode}', expected one of {MODES}"
+            )
+        self.stream: SampleTransport = stream
+        self.sdr = sdr
+        self.mode: str = mode
+        self.stats_interval: float = stats_interval
+        self.spill: SpillBuffer = None
+        if mode == "spill":
+            self.spill = SpillBuffer(spill_path, spill_max_bytes)
+        self.tap: SampleTransport = tap
+        self.noise_floor = noise_floor
+        self.metrics = metrics
+        self.profiler = profiler
+        self._scratch: np.ndarray = np.empty(sdr.rx_chunk_size, dtype=np.complex64)
+        self._last_report: float = time()
+        # Counters
+        self.chunks_received: int = 0
+        self.samples_received: int = 0
+        self.chunks_dropped: int = 0
+        self.samples_dropped: int = 0
+        self.chunks_spilled: int = 0
+        self.chunks_untapped: int = 0
+        self.blocked_seconds: float = 0.0
+        self.high_water: int = 0
+
+    def __acquire(self) -> int:
+        """Finds a free slot, or returns -1 if the mode says to do without."""
+        while True:
+            if not self.stream.full():
+                slot: int = self.stream.ring.acquire()
+                if slot >= 0:
+                    return slot
+            if self.mode == "block":
+                start_time: float = time()
+                sleep(0.0005)
+                self.blocked_seconds += time() - start_time
+            elif self.mode == "drop-oldest":
+                descriptor = self.stream.steal()
+                if descriptor is None:
+                    # packet_detect holds every slot, so there is nothing to steal
+                    return -1
+                slot, length, _ = descriptor
+                self.stream.release(slot, length)
+                self.chunks_dropped += 1
+                self.samples_dropped += length
+                if self.metrics is not None:
+                    self.metrics.add(CHUNKS_DROPPED)
+            else:
+                return -1
+
+    def __publish(self, slot: int, length: int) -> None:
+        with span(self.profiler, ENQUEUE):
+            sequence: int = self.stream.publish(slot, length)
+        waiting: int = self.stream.qsize()
+        if waiting > self.high_water:
+            self.high_water = waiting
+        if self.metrics is not None:
+            self.metrics.chunk_received(sequence)
+            self.metrics.set(STREAM_QUEUE_DEPTH, waiting)
+
+    def __unspill(self) -> None:
+        """Moves spilled chunks into the stream while there is room."""
+        while len(self.spill):
+            if self.spill.next_is_gap():
+                self.spill.read_into(self._scratch)
+                self.stream.skip()
+                continue
+            if self.stream.full():
+                return
+            slot: int = self.stream.ring.acquire()
+            if slot < 0:
+                return
+            self.__publish(slot, self.spill.read_into(self.stream.ring.slot(slot)))
+
+    def __drop(self, samples: int) -> None:
+        self.chunks_dropped += 1
+        self.samples_dropped += samples
+        if self.metrics is not None:
+            self.metrics.add(CHUNKS_DROPPED)
+        # The gap has to reach packet_detect after the chunks still on disk
+        if self.spill is not None and len(self.spill):
+            self.spill.mark_gap()
+        else:
+            self.stream.skip()
+
+    def __send_tap(self, samples: np.ndarray) -> None:
+        slot, buffer = self.tap.reserve(samples.size)
+        if slot < 0:
+            self.chunks_untapped += 1
+            self.tap.skip()
+            return
+        buffer[:] = samples
+        self.tap.publish(slot, samples.size)
+
+    def receive(self) -> int:
+        """Reads one chunk from the radio and hands it on.
+
+        Returns:
+            int: The number of samples read from the radio.
+        """
+        if self.spill is not None:
+            self.__unspill()
+        # Spilled chunks have to reach the stream before newer ones
+        slot: int = -1
+        if self.spill is None or not len(self.spill):
+            slot = self.__acquire()
+        if slot >= 0:
+            with span(self.profiler, RX):
+                num_rx: int = self.sdr.rx_into(self.stream.ring.slot(slot))
+            if num_rx and self.tap is not None:
+                self.__send_tap(self.stream.ring.view(slot, num_rx))
+            if num_rx:
+                self.__publish(slot, num_rx)
+            else:
+                self.stream.ring.release(slot)
+        else:
+            with span(self.profiler, RX):
+                num_rx: int = self.sdr.rx_into(self._scratch)
+            if num_rx and self.tap is not None:
+                self.__send_tap(self._scratch[:num_rx])
+            if num_rx:
+                if self.spill is not None and self.spill.write(self._scratch[:num_rx]):
+                    self.chunks_spilled += 1
+                else:
+                    self.__drop(num_rx)
+        if num_rx:
+            self.chunks_received += 1
+            self.samples_received += num_rx
+            if self.metrics is not None:
+                self.metrics.add(CHUNKS_RECEIVED)
+                self.metrics.add(SAMPLES_RECEIVED, num_rx)
+        if self.stats_interval and time() - self._last_report >= self.stats_interval:
+            self.report()
+        return num_rx
+
+    def stats(self) -> dict:
+        """Returns the counters."""
+        stats: dict = {
+            "chunks_received": self.chunks_received,
+            "samples_received": self.samples_received,
+            "chunks_dropped": self.chunks_dropped,
+            "samples_dropped": self.samples_dropped,
+            "chunks_spilled": self.chunks_spilled,
+            "chunks_waiting_on_disk": self.spill.chunks() if self.spill else 0,
+            "chunks_untapped": self.chunks_untapped,
+            "blocked_seconds": self.blocked_seconds,
+            "radio_overflows": getattr(self.sdr, "overflows", 0),
+            "queue_high_water": self.high_water,
+            "queue_size": self.stream.queue_size,
+        }
+        if self.noise_floor is not None:
+            stats.update(self.noise_floor.stats())
+        return stats
+
+    def report(self) -> None:
+        """Prints the counters on one line."""
+        self._last_report = time()
+        stats: dict = self.stats()
+        line: str = (
+            f"stream: {stats['chunks_received']} chunks received, "
+            f"{stats['chunks_dropped']} dropped ({stats['samples_dropped']} samples), "
+            f"{stats['radio_overflows']} radio overflows, "
+            f"queue high water {stats['queue_high_water']}/{stats['queue_size']}"
+        )
+        if self.tap is not None:
+            line += f", {stats['chunks_untapped']} not recorded"
+        if self.mode == "block":
+            line += f", blocked {stats['blocked_seconds']:.2f} s"
+        if self.mode == "spill":
+            line += (
+                f", {stats['chunks_spilled']} spilled, "
+                f"{stats['chunks_waiting_on_disk']} on disk"
+            )
+        if self.noise_floor is not None:
+            line += (
+                f", noise floor {stats['noise_floor_db']:.1f} dB, "
+                f"threshold {stats['threshold']:.3g}"
+            )
+        print(line)
+
+    def close(self) -> None:
+        """Removes the spill file. Chunks still in it are dropped."""
+        if self.spill is not None:
+            self.chunks_dropped += self.spill.chunks()
+            if self.metrics is not None:
+                self.metrics.add(CHUNKS_DROPPED, self.spill.chunks())
+            self.spill.close()
+            self.spill = None
@@ -0,0 +1,268 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bisect import bisect_left
+import multiprocessing as mp
+import threading as th
+from time import time
+import json, os, sys
+import signal
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+PREFIX = "freqy_"
+# Every value is written by a single process, so none of them need a lock
+COUNTERS = {
+    "samples_received": "Samples read from the radio.",
+    "chunks_received": "Chunks read from the radio.",
+    "chunks_dropped": "Chunks thrown away before detection.",
+    "chunks_processed": "Chunks run through the detector.",
+    "packets_detected": "Packets sent to the saver.",
+    "packets_saved": "Packets written to the HDF5 file.",
+    "bytes_written": "Bytes of samples written to the HDF5 file.",
+}
+GAUGES = {
+    "stream_queue_depth": "Chunks waiting for the detector.",
+    "packet_queue_depth": "Packets waiting for the saver.",
+    "noise_floor_db": "The noise floor estimate in adaptive threshold mode.",
+    "threshold": "The threshold the detector is using.",
+}
+HISTOGRAMS = {
+    "detect_chunk_seconds": "Time the detector spends on each chunk.",
+    "rx_to_disk_seconds": "Time from a packet's last chunk being received to it "
+    "being written.",
+}
+# Counters reported per second as well
+RATES = ("samples_received", "chunks_processed", "packets_saved", "bytes_written")
+QUANTILES = (0.5, 0.99)
+# Histogram bucket upper bounds, four per decade from 1 us to 100 s
+BUCKETS = [10 ** (exponent / 4) for exponent in range(-24, 9)]
+# The number of receive times remembered, by chunk and packet sequence number
+TIME_RING = 4096
+
+NAMES = list(COUNTERS) + list(GAUGES)
+INDEX = {name: i for i, name in enumerate(NAMES)}
+SAMPLES_RECEIVED = INDEX["samples_received"]
+CHUNKS_RECEIVED = INDEX["chunks_received"]
+CHUNKS_DROPPED = INDEX["chunks_dropped"]
+CHUNKS_PROCESSED = INDEX["chunks_processed"]
+PACKETS_DETECTED = INDEX["packets_detected"]
+PACKETS_SAVED = INDEX["packets_saved"]
+BYTES_WRITTEN = INDEX["bytes_written"]
+STREAM_QUEUE_DEPTH = INDEX["stream_queue_depth"]
+PACKET_QUEUE_DEPTH = INDEX["packet_queue_depth"]
+NOISE_FLOOR_DB = INDEX["noise_floor_db"]
+THRESHOLD = INDEX["threshold"]
+DETECT_CHUNK_SECONDS = 0
+RX_TO_DISK_SECONDS = 1
+# Each histogram is its bucket counts, one more for +Inf, then the sum and count
+HISTOGRAM_SIZE = len(BUCKETS) + 3
+
+
+class Metrics:
+    def __init__(self):
+        """Counters, gauges and histograms that the monitor's processes update
+        in shared memory, for a MetricsExporter to publish.
+
+        Updating a value is a write to shared memory with no lock or system
+        call, so it costs well under a microsecond.
+        """
+        self.values = mp.Array("d", len(NAMES), lock=False)
+        self.histograms = mp.Array("d", len(HISTOGRAMS) * HISTOGRAM_SIZE, lock=False)
+        # When each chunk was received, by stream sequence number, and when the
+        # chunk that finished each packet was received, by packet sequence number
+        self.chunk_times = mp.Array("d", TIME_RING, lock=False)
+        self.packet_times = mp.Array("d", TIME_RING, lock=False)
+
+    def add(self, index: int, amount: float = 1) -> None:
+        self.values[index] += amount
+
+    def set(self, index: int, value: float) -> None:
+        self.values[index] = value
+
+    def observe(self, histogram: int, value: float) -> None:
+        """Adds a value to a histogram."""
+        start: int = histogram * HISTOGRAM_SIZE
+        self.histograms[start + bisect_left(BUCKETS, value)] += 1
+        self.histograms[start + len(BUCKETS) + 1] += value
+        self.histograms[start + len(BUCKETS) + 2] += 1
+
+    def chunk_received(self, sequence: int) -> None:
+        self.chunk_times[sequence % TIME_RING] = time()
+
+    def chunk_time(self, sequence: int) -> float:
+        return self.chunk_times[sequence % TIME_RING]
+
+    def packet_sent(self, sequence: int, received: float) -> None:
+        """Records when the chunk that finished a packet was received, under
+        the sequence number of the record the packet was sent as."""
+        self.packet_times[sequence % TIME_RING] = received
+
+    def packet_time(self, sequence: int) -> float:
+        return self.packet_times[sequence % TIME_RING]
+
+    def snapshot(self) -> dict:
+        """Returns a copy of every value and histogram."""
+        histograms: dict = dict()
+        for i, name in enumerate(HISTOGRAMS):
+            start: int = i * HISTOGRAM_SIZE
+            counts: list = self.histograms[start : start + len(BUCKETS) + 1]
+            histograms[name] = {
+                "buckets": counts,
+                "sum": self.histograms[start + len(BUCKETS) + 1],
+                "count": self.histograms[start + len(BUCKETS) + 2],
+            }
+        return {
+            "values": dict(zip(NAMES, self.values[:])),
+            "histograms": histograms,
+        }
+
+
+def quantile(buckets: list, q: float) -> float:
+    """Returns the upper bound of the bucket the `q` quantile falls in, NaN if
+    nothing has been observed."""
+    total: float = sum(buckets)
+    if not total:
+        return float("nan")
+    seen: float = 0.0
+    for bound, count in zip(BUCKETS + [float("inf")], buckets):
+        seen += count
+        if seen >= q * total:
+            return bound
+    return float("inf")
+
+
+class MetricsExporter:
+    def __init__(
+        self,
+        metrics: Metrics,
+        host: str = "127.0.0.1",
+        port: int = 9464,
+        json_file: str = "",
+        interval: float = 5.0,
+    ):
+        """Publishes the monitor's metrics from a process of its own.
+
+        Arguments:
+            metrics (Metrics): The shared metrics.
+
+            host (str): The address the HTTP endpoint listens on.
+
+            port (int): The port /metrics is served on in the Prometheus text
+                format. 0 turns the endpoint off.
+
+            json_file (str): A file the metrics are written to as JSON every
+                `interval` seconds. Empty turns it off.
+
+            interval (float): The number of seconds rates are measured over.
+        """
+        self.metrics: Metrics = metrics
+        self.host: str = host
+        self.port: int = port
+        self.json_file: str = json_file
+        self.interval: float = interval
+        self.stopped = mp.Event()
+        self._last: tuple = None
+        self._rates: dict = {name: 0.0 for name in RATES}
+
+    def report(self) -> dict:
+        """Returns the metrics with the rates over the last interval and the
+        quantiles of each histogram."""
+        snapshot: dict = self.metrics.snapshot()
+        snapshot["rates"] = dict(self._rates)
+        snapshot["quantiles"] = {
+            name: {str(q): quantile(histogram["buckets"], q) for q in QUANTILES}
+            for name, histogram in snapshot["histograms"].items()
+        }
+        snapshot["time"] = time()
+        return snapshot
+
+    def prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text format."""
+        report: dict = self.report()
+        lines: list = list()
+        for name, help_text in COUNTERS.items():
+            lines.append(f"# HELP {PREFIX}{name}_total {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name}_total counter")
+            lines.append(f"{PREFIX}{name}_total {report['values'][name]:g}")
+        for name, help_text in GAUGES.items():
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            lines.append(f"{PREFIX}{name} {report['values'][name]:g}")
+        for name in RATES:
+            lines.append(
+                f"# HELP {PREFIX}{name}_per_second {COUNTERS[name]} Per second."
+            )
+            lines.append(f"# TYPE {PREFIX}{name}_per_second gauge")
+            lines.append(f"{PREFIX}{name}_per_second {report['rates'][name]:g}")
+        for name, help_text in HISTOGRAMS.items():
+            histogram: dict = report["histograms"][name]
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            cumulative: float = 0.0
+            for bound, count in zip(BUCKETS + [float("inf")], histogram["buckets"]):
+                cumulative += count
+                le: str = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{PREFIX}{name}_bucket{{le="{le}"}} {cumulative:g}')
+            lines.append(f"{PREFIX}{name}_sum {histogram['sum']:g}")
+            lines.append(f"{PREFIX}{name}_count {histogram['count']:g}")
+        return "\n".join(lines) + "\n"
+
+    def __update_rates(self) -> None:
+        now: float = time()
+        values: list = self.metrics.values[:]
+        if self._last is not None:
+            last_time, last_values = self._last
+            elapsed: float = max(now - last_time, 1e-9)
+            for name in RATES:
+                change: float = values[INDEX[name]] - last_values[INDEX[name]]
+                self._rates[name] = change / elapsed
+        self._last = (now, values)
+
+    def __write_json(self) -> None:
+        temp_file: str = f"{self.json_file}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(temp_file, self.json_file)
+
+    def __serve(self) -> ThreadingHTTPServer:
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body: bytes = exporter.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((self.host, self.port), Handler)
+        th.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"metrics served on http://{self.host}:{self.port}/metrics")
+        return server
+
+    def start(self) -> None:
+        # The monitor shuts the exporter down through `stopped`
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        server: ThreadingHTTPServer = self.__serve() if self.port else None
+        self.__update_rates()
+        while not self.stopped.wait(self.interval):
+            self.__update_rates()
+            if self.json_file:
+                self.__write_json()
+        self.__update_rates()
+        if self.json_file:
+            self.__write_json()
+        if server is not None:
+            server.shutdown()
+        print("EXITED METRICS")
+
+    def stop(self) -> None:
+        self.stopped.set()
@@ -13,29 +13,41 @@ FILE_DIR = os.path.dirname(os.path.realpath(__file__))
 PYTHON_DIR = f"{FILE_DIR}/../"
 sys.path.insert(0, PYTHON_DIR)
 TOML_FILE = f'{PYTHON_DIR}/config.toml'
+# The number of samples in each slot of the packet transport
+PACKET_SLOT_SIZE = 16384
 
-from helper_functions.uhd_interface import SDR
+from helper_functions.radio import open_radio
 from helper_functions.hdf5_handler import HDF5Handler
+from helper_functions.shared_transport import SampleTransport
+from helper_functions.spectral import SpectralAnalyzer
 from monitor.packet_saver import PacketSaver
 from monitor.packet_detect import PacketDetect
+from monitor.noise_floor import NoiseFloor, THRESHOLD_MODES
+from monitor.backpressure import Backpressure
+from monitor.raw_recorder import RawRecorder
+from monitor.metrics import Metrics, MetricsExporter
+from monitor.profiler import Profiler
 from helper_functions.plot_signal import plot_signal
 
 
 class Monitor:
     # TODO: Add parameter to add a signal to the queue to stop the process
-    def __init__(self):
+    def __init__(self, profile: str = None):
         """Monitors the airwaves for a target frequency
 
         Arguments:
-            sdr (SDR): A SDR class to interface with the SDR.
-
-            stream_q (mp.Queue): A shared queue to feed packet_detect signals.
+            profile (str): If set, one of PROFILE_MODES. Each process is
+                profiled with its report written to the <file_name>-profile
+                directory in captured_signals, and a summary of where each
+                stage spent its time is printed at exit.
         """
         self.hdf5: HDF5Handler = HDF5Handler()
         self.settings: TOMLDocument = TOMLFile(TOML_FILE).read()
         # TOML settings
         self.toml_radio: dict = self.settings.get("RADIO")
         self.toml_monitor: dict = self.settings.get("MONITOR")
+        self.toml_recorder: dict = self.settings.get("RECORDER")
+        self.toml_metrics: dict = self.settings.get("METRICS")
         # RADIO
         self.center_freq: float = self.toml_radio["center_freq"]
         self.sample_rate: float = self.toml_radio["sample_rate"]
@@ -51,27 +63,85 @@ class Monitor:
         self.queue_size: int = self.toml_monitor["queue_size"]
         self.file_name: int = self.toml_monitor["file_name"]
         self.max_loops: int = self.toml_monitor["max_loops"]
+        self.packet_buffer_size: int = self.toml_monitor["packet_buffer_size"]
+        self.save_batch_size: int = self.toml_monitor["save_batch_size"]
+        self.save_flush_seconds: float = self.toml_monitor["save_flush_seconds"]
+        self.detect_workers: int = self.toml_monitor["detect_workers"]
+        self.backpressure_mode: str = self.toml_monitor["backpressure"]
+        self.stats_interval: float = self.toml_monitor["stats_interval"]
+        self.spill_max_bytes: int = self.toml_monitor["spill_max_bytes"]
+        self.threshold_mode: str = self.toml_monitor["threshold_mode"]
+        self.threshold_margin_db: float = self.toml_monitor["threshold_margin_db"]
+        self.noise_window_seconds: float = self.toml_monitor["noise_window_seconds"]
+        self.noise_percentile: float = self.toml_monitor["noise_percentile"]
+        self.decimation: int = self.toml_monitor["decimation"]
+        self.max_packet_length: int = self.toml_monitor["max_packet_length"]
+        self.spectral_features: bool = self.toml_monitor["spectral_features"]
+        self.spectral_fft_size: int = self.toml_monitor["spectral_fft_size"]
+        # RECORDER
+        self.record: bool = self.toml_recorder["enabled"]
+        self.record_file_name: str = self.toml_recorder["file_name"]
+        self.record_buffer_chunks: int = self.toml_recorder["buffer_chunks"]
+        self.preallocate_seconds: float = self.toml_recorder["preallocate_seconds"]
+        # METRICS
+        self.metrics_enabled: bool = self.toml_metrics["enabled"]
+        self.metrics_host: str = self.toml_metrics["host"]
+        self.metrics_port: int = self.toml_metrics["port"]
+        self.metrics_json_file: str = self.toml_metrics["json_file"]
+        self.metrics_interval: float = self.toml_metrics["interval"]
 
-        # Queues
-        self.stream_q = mp.Queue(self.queue_size)
-        self.packet_queue = mp.Queue(self.queue_size)
+        # Transports are created once the SDR reports its chunk size
+        self.stream: SampleTransport = None
+        self.packets: SampleTransport = None
+        self.backpressure: Backpressure = None
+        self.packet_detect_p: mp.Process = None
+        self.packet_saver_p: mp.Process = None
+        self.raw: SampleTransport = None
+        self.raw_recorder_p: mp.Process = None
+        self.noise_floor: NoiseFloor = None
+        self.metrics: Metrics = None
+        self.metrics_exporter: MetricsExporter = None
+        self.metrics_p: mp.Process = None
+        self.profile: str = profile
+        self.profiler: Profiler = None
         # Signal done
         self.keep_going: bool = True
 
-    def __empty_q(self) -> None:
-        while True:
-            try:
-                self.stream_q.get(timeout=0.1)
-            except queue.Empty:
-                break
-
     def __sigint_handler(self, sig_num, frame):
         self.keep_going = False
+        if self.packet_detect_p is None:
+            # Stopped while viewing a sample or before the pipeline started,
+            # so only what has been built so far needs closing
+            if self.backpressure is not None:
+                self.backpressure.close()
+            for transport in (self.stream, self.packets, self.raw):
+                if transport is not None:
+                    transport.close()
+            exit(0)
         sleep(.05)
-        self.__empty_q()
-        self.stream_q.put("DONE", timeout=.05)
-        self.packet_detect_p.kill()
-        self.packet_saver_p.kill()
+        self.stream.drain()
+        self.stream.send_done()
+        if self.raw_recorder_p:
+            self.raw.send_done()
+        self.backpressure.report()
+        self.backpressure.close()
+        # Gives packet_saver a chance to write the packets it is holding and
+        # the recorder a chance to finish its file
+        processes: list = [self.packet_detect_p, self.packet_saver_p]
+        if self.raw_recorder_p:
+            processes.append(self.raw_recorder_p)
+        for process in processes:
+            if process.pid is None:
+                continue
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+        self.__stop_metrics()
+        self.__report_profile()
+        self.stream.close()
+        self.packets.close()
+        if self.raw_recorder_p:
+            self.raw.close()
         exit(0)
 
     def launch(self) -> None:
@@ -79,60 +149,167 @@ class Monitor:
         if self.view_sample:
             self.view_signals()
             exit(0)
+        self.sdr = open_radio(self.settings)
+        print("SDR finished setup")
+        # Every queued chunk, the chunks being processed and the chunk being
+        # received each need a slot
+        self.stream = SampleTransport(
+            self.queue_size + self.detect_workers + 1,
+            self.sdr.rx_chunk_size,
+            self.queue_size,
+        )
+        if self.record:
+            self.raw = SampleTransport(self.record_buffer_chunks, self.sdr.rx_chunk_size)
+            raw_recorder = RawRecorder(
+                self.record_file_name,
+                self.raw,
+                self.center_freq,
+                self.sample_rate,
+                self.preallocate_seconds,
+            )
+            self.raw_recorder_p = mp.Process(target=raw_recorder.start)
+        if self.threshold_mode not in THRESHOLD_MODES:
+            raise ValueError(
+                f"Unknown threshold_mode '{self.threshold_mode}', expected one of "
+                f"{THRESHOLD_MODES}"
+            )
+        if self.threshold_mode == "adaptive":
+            self.noise_floor = NoiseFloor(
+                self.sample_rate,
+                self.threshold_margin_db,
+                self.noise_window_seconds,
+                self.noise_percentile,
+                threshold=self.threshold,
+            )
+        if self.metrics_enabled:
+            self.metrics = Metrics()
+            json_file: str = ""
+            if self.metrics_json_file:
+                json_file = f"{PYTHON_DIR}/captured_signals/{self.metrics_json_file}"
+            self.metrics_exporter = MetricsExporter(
+                self.metrics,
+                self.metrics_host,
+                self.metrics_port,
+                json_file,
+                self.metrics_interval,
+            )
+            self.metrics_p = mp.Process(target=self.metrics_exporter.start)
+        if self.profile:
+            self.profiler = Profiler(
+                f"{PYTHON_DIR}/captured_signals/{self.file_name}-profile", self.profile
+            )
+        self.backpressure = Backpressure(
+            self.stream,
+            self.sdr,
+            self.backpressure_mode,
+            self.stats_interval,
+            f"{PYTHON_DIR}/captured_signals/{self.file_name}.spill",
+            self.spill_max_bytes,
+            self.raw,
+            self.noise_floor,
+            self.metrics,
+            self.profiler,
+        )
+        analyzer: SpectralAnalyzer = None
+        if self.spectral_features:
+            analyzer = SpectralAnalyzer(int(self.spectral_fft_size))
+        self.packets = SampleTransport(
+            max(-(-self.packet_buffer_size // PACKET_SLOT_SIZE), 1), PACKET_SLOT_SIZE
+        )
+        # A packet is one record, so none may be longer than the packet buffer
+        if self.max_packet_length > self.packets.max_length:
+            raise ValueError(
+                f"max_packet_length is {self.max_packet_length} samples, but "
+                f"packet_buffer_size only holds {self.packets.max_length}"
+            )
+        max_packet_length: int = self.max_packet_length or self.packets.max_length
         packet_detect = PacketDetect(
-            self.stream_q,
+            self.stream,
             self.threshold,
             self.cutoff,
-            self.packet_queue,
+            self.packets,
             self.packet_slack,
+            self.detect_workers,
+            self.noise_floor,
+            self.decimation,
+            max_packet_length,
+            self.metrics,
+            self.profiler,
         )
         packet_saver = PacketSaver(
             self.file_name,
-            self.packet_queue,
+            self.packets,
             self.hdf5,
             self.center_freq,
             self.sample_rate,
             self.threshold,
+            self.save_batch_size,
+            self.save_flush_seconds,
+            self.noise_floor,
+            self.metrics,
+            self.profiler,
+            analyzer,
         )
         self.packet_detect_p = mp.Process(target=packet_detect.start_packet_detect)
         self.packet_saver_p = mp.Process(target=packet_saver.start)
         self.packet_detect_p.start()
         self.packet_saver_p.start()
+        if self.raw_recorder_p:
+            self.raw_recorder_p.start()
+        if self.metrics_p:
+            self.metrics_p.start()
+        if self.profiler is not None:
+            self.profiler.attach("streamer")
         self.__stream_rx_data()
+        self.packet_detect_p.join()
+        self.packet_saver_p.join()
+        self.__stop_metrics()
+        self.__report_profile()
+        self.stream.close()
+        self.packets.close()
+        if self.raw_recorder_p:
+            self.raw_recorder_p.join()
+            self.raw.close()
+
+    def __stop_metrics(self) -> None:
+        """Has the exporter publish the final values and exit."""
+        if not self.metrics_p:
+            return
+        self.metrics_exporter.stop()
+        self.metrics_p.join(timeout=5)
+        if self.metrics_p.is_alive():
+            self.metrics_p.kill()
+
+    def __report_profile(self) -> None:
+        """Finishes the streamer's profile and prints where every process
+        spent its time."""
+        if self.profiler is None:
+            return
+        self.profiler.finish()
+        print(self.profiler.summary())
 
     def view_signals(self) -> None:
-        self.sdr = SDR(self.sample_rate, self.center_freq, self.tx_gain, self.rx_gain)
+        self.sdr = open_radio(self.settings)
         signals = list()
         for _ in range(self.samples_to_collect):
             data = self.sdr.rx_data()
             signals.append(data)
         # Put the signal together
-        big_signal = np.zeros(10)
-        for signal in signals:
-            signal = signal.ravel()
-            signal = np.trim_zeros(signal)
-            if big_signal.all():
-                big_signal = signal
-            else:
-                big_signal = np.concatenate((big_signal, signal))
+        big_signal = np.concatenate(signals)
         plot_signal(big_signal, self.sample_rate, self.threshold)
 
     def __stream_rx_data(self) -> None:
         """Streams signals captured from the SDR"""
-        self.sdr = SDR(self.sample_rate, self.center_freq, self.tx_gain, self.rx_gain)
-        print("SDR finished setup")
         heartbeat = 0
         kill_count: int = 0
         while self.keep_going:
-            data = self.sdr.rx_data()
-            # Waits for queue to empty if it fills
-            if self.stream_q.full():
-                print("stream_q full")
-                while self.stream_q.qsize() != 0:
-                    sleep(0.001)
-                print("stream_q empty")
+            num_samps: int = self.backpressure.receive()
+            if num_samps == 0:
+                # File playback runs out of samples when it does not loop
+                if getattr(self.sdr, "finished", False):
+                    self.stream.send_done()
+                    break
                 continue
-            self.stream_q.put(data)
             heartbeat += 1
             # Displays a heartbeat
             if heartbeat > 5000:
@@ -142,7 +319,11 @@ class Monitor:
             if self.max_loops:
                 kill_count += 1
                 if kill_count > self.max_loops:
-                    self.stream_q.put("DONE")
+                    self.stream.send_done()
                     break
+        if self.raw_recorder_p:
+            self.raw.send_done()
+        self.backpressure.report()
+        self.backpressure.close()
         print("EXITED STREAMER")
 
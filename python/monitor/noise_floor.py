@@ -0,0 +1,112 @@
+import multiprocessing as mp
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+THRESHOLD_MODES = ("fixed", "adaptive")
+# The histogram covers powers from MIN_DB to MAX_DB in BIN_DB steps. Samples
+# outside the range land in the first or last bin.
+MIN_DB = -140.0
+MAX_DB = 40.0
+BIN_DB = 0.25
+# Indexes into the shared array other processes read the estimate from
+FLOOR_DB = 0
+THRESHOLD = 1
+
+
+class NoiseFloor:
+    def __init__(
+        self,
+        sample_rate: float,
+        margin_db: float = 15.0,
+        window_seconds: float = 1.0,
+        percentile: float = 50.0,
+        samples_per_chunk: int = 1024,
+        threshold: float = 2.0,
+    ):
+        """Keeps a running estimate of the noise floor and sets the detection
+        threshold a fixed number of dB above it.
+
+        The power of a sample, in dB, is counted in a histogram whose counts
+        decay so samples older than about `window_seconds` stop mattering. The
+        floor is the `percentile` of the histogram, so bursts that take up less
+        than the rest of the window barely move it. Only `samples_per_chunk`
+        evenly spaced samples of each chunk are counted, so memory and the
+        work per chunk stay the same at any sample rate.
+
+        Arguments:
+            sample_rate (float): The sample rate of the stream.
+
+            margin_db (float): How far above the noise floor, in dB, a sample
+                must be to be part of a packet.
+
+            window_seconds (float): How much of the stream the estimate
+                follows.
+
+            percentile (float): The percentile of sample power taken as the
+                noise floor.
+
+            samples_per_chunk (int): The most samples of a chunk that are
+                counted.
+
+            threshold (float): The threshold used until the first chunk has
+                been seen.
+        """
+        self.sample_rate: float = sample_rate
+        self.margin_db: float = margin_db
+        self.window_samples: float = max(window_seconds * sample_rate, 1.0)
+        self.percentile: float = percentile
+        self.samples_per_chunk: int = samples_per_chunk
+        self.histogram: np.ndarray = np.zeros(
+            int((MAX_DB - MIN_DB) / BIN_DB) + 1, dtype=np.float64
+        )
+        # Shared so the stream and saver processes can read the estimate
+        self.shared = mp.Array("d", [float("nan"), threshold], lock=False)
+
+    @property
+    def floor_db(self) -> float:
+        """The current noise floor in dB, NaN until the first update."""
+        return self.shared[FLOOR_DB]
+
+    @property
+    def threshold(self) -> float:
+        """The current threshold as a magnitude."""
+        return self.shared[THRESHOLD]
+
+    def update(self, signal: np.ndarray) -> float:
+        """Adds a chunk of samples to the estimate.
+
+        Arguments:
+            signal (np.ndarray): The next chunk of IQ samples in the stream.
+
+        Returns:
+            float: The new threshold.
+        """
+        signal = signal.ravel()
+        if not signal.size:
+            return self.threshold
+        stride: int = max(signal.size // self.samples_per_chunk, 1)
+        picked: np.ndarray = signal[::stride]
+        power: np.ndarray = picked.real * picked.real + picked.imag * picked.imag
+        power_db: np.ndarray = 10 * np.log10(np.maximum(power, 1e-30))
+        bins: np.ndarray = np.clip(
+            ((power_db - MIN_DB) / BIN_DB).astype(np.int64), 0, self.histogram.size - 1
+        )
+        self.histogram *= np.exp(-signal.size / self.window_samples)
+        # Each counted sample stands for the `stride` samples around it
+        counts: np.ndarray = np.bincount(bins, minlength=self.histogram.size)
+        self.histogram += counts * (signal.size / picked.size)
+        cumulative: np.ndarray = np.cumsum(self.histogram)
+        floor_bin: int = int(
+            np.searchsorted(cumulative, cumulative[-1] * self.percentile / 100)
+        )
+        floor_db: float = MIN_DB + (floor_bin + 0.5) * BIN_DB
+        self.shared[FLOOR_DB] = floor_db
+        self.shared[THRESHOLD] = 10 ** ((floor_db + self.margin_db) / 20)
+        return self.shared[THRESHOLD]
+
+    def stats(self) -> dict:
+        return {"noise_floor_db": self.floor_db, "threshold": self.threshold}
@@ -0,0 +1,142 @@
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+# The number of samples the buffer starts out able to hold
+INITIAL_SIZE = 1 << 16
+
+
+class PacketAssembler:
+    def __init__(self, initial_size: int = INITIAL_SIZE):
+        """Holds the samples of a stream that may still be part of a packet.
+
+        The samples are kept back to back in one buffer that doubles in size
+        when it fills, and samples that are no longer needed are dropped from
+        the front by moving a start marker. The kept samples are only moved
+        back to the start of the buffer when that frees at least half of it,
+        so keeping a packet that spans many chunks copies each sample a
+        constant number of times on average.
+
+        Arguments:
+            initial_size (int): The number of samples the buffer starts out
+                able to hold.
+        """
+        self._buffer: np.ndarray = None
+        self._initial_size: int = max(int(initial_size), 1)
+        self.clear()
+
+    def clear(self) -> None:
+        """Drops every kept sample. The buffer is kept for reuse."""
+        # The position in the buffer and the stream index of the first kept
+        # sample, and the number of samples kept
+        self._head: int = 0
+        self.start: int = 0
+        self.size: int = 0
+
+    @property
+    def end(self) -> int:
+        """The stream index just past the last kept sample."""
+        return self.start + self.size
+
+    def first_index(self, signal_start: int) -> int:
+        """Returns the earliest stream index that can be taken while the chunk
+        starting at `signal_start` is being processed."""
+        return self.start if self.size else signal_start
+
+    def __reserve(self, length: int, dtype: np.dtype) -> None:
+        """Makes room for `length` more samples after the kept ones."""
+        if self._buffer is None or self._buffer.dtype != dtype:
+            kept: np.ndarray = self.view()
+            self._buffer = np.empty(
+                max(self._initial_size, self.size + length), dtype=dtype
+            )
+            self._buffer[: self.size] = kept
+            self._head = 0
+            return
+        capacity: int = self._buffer.size
+        if self._head + self.size + length <= capacity:
+            return
+        if self.size + length <= capacity // 2:
+            # Moving the kept samples to the front frees at least half the buffer
+            self._buffer[: self.size] = self._buffer[self._head : self._head + self.size]
+        else:
+            while capacity < 2 * (self.size + length):
+                capacity *= 2
+            grown: np.ndarray = np.empty(capacity, dtype=self._buffer.dtype)
+            grown[: self.size] = self._buffer[self._head : self._head + self.size]
+            self._buffer = grown
+        self._head = 0
+
+    def view(self) -> np.ndarray:
+        """Returns the kept samples without copying them."""
+        if self._buffer is None:
+            return np.zeros(0, dtype=np.complex64)
+        return self._buffer[self._head : self._head + self.size]
+
+    def drop_before(self, index: int) -> None:
+        """Forgets the kept samples before stream index `index`."""
+        dropped: int = min(max(index - self.start, 0), self.size)
+        self._head += dropped
+        self.start += dropped
+        self.size -= dropped
+        if not self.size:
+            self._head = 0
+
+    def retain(self, signal: np.ndarray, signal_start: int, keep_from: int) -> None:
+        """Drops the samples before `keep_from` and keeps the rest of the chunk
+        that starts at stream index `signal_start`. The chunk may be reused
+        once this returns.
+
+        Arguments:
+            signal (np.ndarray): The chunk that was just processed.
+
+            signal_start (int): The stream index of the first sample in
+                `signal`. It must follow straight on from the kept samples.
+
+            keep_from (int): The earliest stream index that is still needed.
+        """
+        self.drop_before(keep_from)
+        keep: np.ndarray = signal[max(keep_from - signal_start, 0) :]
+        if not self.size:
+            self._head = 0
+            self.start = signal_start + signal.size - keep.size
+        if not keep.size:
+            return
+        self.__reserve(keep.size, keep.dtype)
+        position: int = self._head + self.size
+        self._buffer[position : position + keep.size] = keep
+        self.size += keep.size
+
+    def take(
+        self, start: int, end: int, signal: np.ndarray, signal_start: int
+    ) -> np.ndarray:
+        """Copies the samples between two stream indexes out of the kept samples
+        and the chunk that is being processed.
+
+        Arguments:
+            start, end (int): The stream indexes to copy between. They are
+                clipped to the samples that are available.
+
+            signal (np.ndarray): The chunk that is being processed.
+
+            signal_start (int): The stream index of the first sample in
+                `signal`.
+
+        Returns:
+            np.ndarray: A copy of the samples.
+        """
+        start = max(start, self.first_index(signal_start))
+        end = max(min(end, signal_start + signal.size), start)
+        kept_end: int = min(end, self.end) if self.size else start
+        from_signal: np.ndarray = signal[
+            max(start - signal_start, 0) : max(end - signal_start, 0)
+        ]
+        if kept_end <= start:
+            return from_signal.copy()
+        from_kept: np.ndarray = self.view()[start - self.start : kept_end - self.start]
+        if not from_signal.size:
+            return from_kept.copy()
+        return np.concatenate((from_kept, from_signal))
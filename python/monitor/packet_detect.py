@@ -1,224 +1,734 @@
 import numpy as np
 import multiprocessing as mp
-from numba import njit, jit
-from time import sleep, time
+from concurrent.futures import ThreadPoolExecutor
+from numba import njit
+from time import perf_counter, sleep, time
 import os, sys
+import signal
 
 FILE_DIR = os.path.dirname(os.path.realpath(__file__))
 PYTHON_DIR = f"{FILE_DIR}/../"
 sys.path.insert(0, PYTHON_DIR)
 
-from helper_functions.hdf5_handler import HDF5Handler
-from helper_functions.plot_signal import plot_signal
+from helper_functions.shared_transport import SampleTransport
+from monitor.noise_floor import NoiseFloor
+from monitor.packet_assembler import PacketAssembler
+from monitor.metrics import (
+    Metrics,
+    CHUNKS_PROCESSED,
+    DETECT_CHUNK_SECONDS,
+    NOISE_FLOOR_DB,
+    PACKETS_DETECTED,
+    THRESHOLD,
+)
+from monitor.profiler import DEQUEUE, DETECT, ENQUEUE, Profiler, span
 
+# Indexes into the detector state array that is carried between chunks
+IN_PACKET = 0
+BELOW_RUN = 1
+PACKET_START = 2
+LAST_ABOVE = 3
+STATE_SIZE = 4
 
-@njit(cache=True, fastmath=True)
-def process_signal(
+# The kernel is compiled for these sample types when this module is imported.
+# With cache=True numba saves the machine code next to this file and reloads it
+# on later imports for as long as this file and the numba version are
+# unchanged, so only the first run after an edit or upgrade pays for compiling.
+SAMPLE_TYPES = ("complex64", "complex128", "float32", "float64")
+KERNEL_SIGNATURES = [
+    f"int64({sample}[:], float64, int64, int64, int64, int64[::1], int64[:, ::1])"
+    for sample in SAMPLE_TYPES
+]
+
+
+def power_level(threshold: float) -> float:
+    """Returns the power a sample must exceed to be above `threshold`.
+
+    Comparing power with the squared threshold saves a square root per sample.
+    A negative threshold keeps its sign so every sample is still above it.
+    """
+    return threshold * abs(threshold)
+
+
+@njit(cache=True, fastmath=True, inline="always")
+def sample_power(sample):
+    return sample.real * sample.real + sample.imag * sample.imag
+
+
+@njit(KERNEL_SIGNATURES, cache=True, fastmath=True, nogil=True)
+def find_packet_bounds(
     signal: np.ndarray,
     threshold: float,
     cutoff: int,
-    packet: np.ndarray,
-    carryover: int,
-    packet_slack: float,
-    last_signal: np.ndarray,
-) -> tuple:
-    """Decides if the signal is part of a packet
+    decimation: int,
+    offset: int,
+    state: np.ndarray,
+    bounds: np.ndarray,
+) -> int:
+    """Walks a chunk of samples once and finds where packets start and end.
+
+    The detector state is read from and written back to `state` so a packet
+    can start in one chunk and end in a later one.
+
+    With a `decimation` above 1, only every `decimation`th sample is looked at
+    while there is no packet. Once one is above the threshold the samples
+    before it are walked back to where the packet started, and the packet is
+    followed sample by sample until it ends. Quiet stretches then cost
+    1/`decimation` of a full pass, but a packet that never stays above the
+    threshold for `decimation` samples in a row can be missed.
 
     Arguments:
-        signal (np.ndarray): The numpy array that carries the IQ packets of the
-            signal data.
+        signal (np.ndarray): A 1D array of IQ samples.
 
-        threshold (float): The minimum value that a signal must exceed to be
-            considered part of a packet.
+        threshold (float): The magnitude a sample must exceed to be considered
+            part of a packet.
 
-        cutoff (int): The number of IQ values that are allowed to be under the
-            threshold and still be considered part of a packet.
+        cutoff (int): The number of samples in a row that must be below the
+            threshold for a packet to be considered ended.
 
-        packet (np.ndarray): Holds the pieces of collected signals that  contain
-            the packet information.
+        decimation (int): How many samples apart the samples looked at are
+            while there is no packet. 1 looks at every sample.
 
-        carryover (int): If a packet is not finished being created then this
-        will contain the value of the number of index's that were below the
-        threshold when the signal ended (if any).
+        offset (int): The stream index of the first sample in `signal`.
 
-        packet_slack (int): The amount of indexes that will be added to the discoverd
-            packet to ensure the whole packet is captured.
+        state (np.ndarray): An int64 array of size STATE_SIZE holding the
+            in-packet flag, the below-threshold run length, the stream index
+            where the open packet started and the stream index of the last
+            sample that was above the threshold.
+
+        bounds (np.ndarray): An int64 array of shape (n, 2) that the closed
+            packets are written into as (start, end) stream indexes. It must
+            have at least `signal.size // (cutoff + 1) + 2` rows.
 
     Returns:
-        tuple (list[np.ndarray], bool, int, bool):
-        - list[np.ndarray]: A list containing all captured signals
-        - bool: Indicates if the last packet in the list was completely captured.
-        - int: Indicates how many indexes where below the threshold on the continuing packet
-        - bool: Indicates if the first two packets in the list need to be concatenated.
+        int: The number of rows written into `bounds`.
     """
-    # Skips if signal is None
-    if signal == None:
-        return (None, True, 0)
-    # Skips if the array is empty
-    if not signal.all():
-        return (None, True, 0)
-    last_signal = last_signal.ravel()
-    if last_signal.any():
-        last_signal = np.trim_zeros(last_signal)
-    # Ensures array is 1D
-    signal = signal.ravel()
-    signal: np.ndarray = np.trim_zeros(signal)
-    abs_signal: np.ndarray = np.absolute(signal)
-    # Check if the max value is above the threshold
-    max_value_in_signal = np.max(abs_signal)
-    if max_value_in_signal < threshold:
-        return (None, True, 0)
-    # Each value maps to a index in abs_signal where the value is above the
-    # threshold
-    threshold_list: np.ndarray = np.where(abs_signal > threshold)[0]
-    # Each value represents the difference between index i and i+1 in
-    # threshold_list.
-    threshold_diff: np.ndarray = np.diff(threshold_list)
-    # Each value represents the
-    cutoff_list: np.ndarray = np.where(threshold_diff > cutoff)[0]
+    level = threshold * abs(threshold)
+    in_packet = state[IN_PACKET]
+    below_run = state[BELOW_RUN]
+    packet_start = state[PACKET_START]
+    last_above = state[LAST_ABOVE]
+    count = 0
+    size = signal.size
+    i = 0
+    while i < size:
+        if not in_packet and decimation > 1:
+            # Look at the last sample of each stretch of `decimation`
+            j = min(i + decimation - 1, size - 1)
+            while not sample_power(signal[j]) > level:
+                if j == size - 1:
+                    j = size
+                    break
+                j = min(j + decimation, size - 1)
+            if j == size:
+                break
+            # The packet started at the first sample above the threshold that
+            # is not separated from this one by `cutoff` quiet samples
+            start = j
+            run = 0
+            k = j - 1
+            while k >= i and run < cutoff:
+                if sample_power(signal[k]) > level:
+                    start = k
+                    run = 0
+                else:
+                    run += 1
+                k -= 1
+            in_packet = 1
+            packet_start = offset + start
+            last_above = offset + start
+            below_run = 0
+            i = start + 1
+            continue
+        if sample_power(signal[i]) > level:
+            if not in_packet:
+                in_packet = 1
+                packet_start = offset + i
+            last_above = offset + i
+            below_run = 0
+        elif in_packet:
+            below_run += 1
+            if below_run >= cutoff:
+                bounds[count, 0] = packet_start
+                bounds[count, 1] = last_above + 1
+                count += 1
+                in_packet = 0
+                below_run = 0
+        i += 1
+    state[IN_PACKET] = in_packet
+    state[BELOW_RUN] = below_run
+    state[PACKET_START] = packet_start
+    state[LAST_ABOVE] = last_above
+    return count
 
-    all_packets: list = list()
-    new_carryover: int = signal.size - threshold_list[-1]
-    end_of_packet_reached: bool = False
-    # Checks if the current last packet does not carry over into the next signal
-    if new_carryover > cutoff:
-        end_of_packet_reached = True
-        new_carryover = 0
-
-    # If there is no packet and there is no cutoff found
-    if packet == None:
-        if cutoff_list.size == 0:
-            # print("A")
-            if last_signal.any():
-                signal = np.concatenate((last_signal, signal))
-            if threshold_list[-1] > packet_slack:
-                return (
-                    [signal[threshold_list[0] : threshold_list[-1] + packet_slack]],
-                    end_of_packet_reached,
-                    new_carryover,
-                )
-            else:
-                return (
-                    [signal[threshold_list[0] : threshold_list[-1]]],
-                    end_of_packet_reached,
-                    new_carryover,
-                )
-        for i in range(cutoff_list.size + 1):
-            cutoff_list_value: int = cutoff_list[i]
-            # Find the first packet
-            if i == 0:
-                # print("B") #! WORKING
-                all_packets.append(
-                    signal[
-                        threshold_list[0]
-                        - packet_slack : threshold_list[cutoff_list_value]
-                    ]
-                )
-            # Find the last packet
-            elif i == cutoff_list.size:
-                # print("C") #! WORKING
-                all_packets.append(
-                    signal[
-                        threshold_list[cutoff_list[-1]]
-                        - packet_slack : threshold_list[-1]
-                        + 1
-                    ]
-                )
-            # Find all other packets
-            else:
-                # print("D") #! WORKING
-                last_cutoff_list_value: int = cutoff_list[i - 1]
-                all_packets.append(
-                    signal[
-                        threshold_list[last_cutoff_list_value + 1]
-                        - packet_slack : threshold_list[cutoff_list_value]
-                    ]
-                )
-        return (all_packets, end_of_packet_reached, new_carryover)
+
+@njit(
+    [
+        f"void({sample}[:], float64[::1], int64[::1], int64, int64[::1], int64[::1], "
+        "int64[:, ::1], int64[:, ::1], int64[:, ::1])"
+        for sample in SAMPLE_TYPES
+    ],
+    cache=True,
+    fastmath=True,
+    nogil=True,
+)
+def sweep_packet_bounds(
+    signal: np.ndarray,
+    levels: np.ndarray,
+    cutoffs: np.ndarray,
+    offset: int,
+    level: np.ndarray,
+    last_above: np.ndarray,
+    starts: np.ndarray,
+    counts: np.ndarray,
+    durations: np.ndarray,
+) -> None:
+    """Runs the detector for every threshold and cutoff pair over a chunk of
+    samples, taking the power of each sample once.
+
+    With the thresholds sorted, a sample is above the first `level` of them,
+    so only the thresholds that the sample crosses since the last one need any
+    work. A packet ends once `cutoff` samples in a row are below the
+    threshold, so for one threshold every cutoff sees the same quiet gaps and
+    a gap closes the packets of all the cutoffs no longer than it. Packets are
+    closed when the gap ends, which counts the same packets as
+    `find_packet_bounds` once the stream is finished.
+
+    Arguments:
+        signal (np.ndarray): A 1D array of IQ samples.
+
+        levels (np.ndarray): The float64 thresholds as powers, see
+            `power_level`, sorted ascending.
+
+        cutoffs (np.ndarray): The int64 cutoffs, sorted ascending.
+
+        offset (int): The stream index of the first sample in `signal`.
+
+        level (np.ndarray): An int64 array of size 1 holding how many
+            thresholds the last sample was above.
+
+        last_above (np.ndarray): The stream index of the last sample above each
+            threshold, -1 if there has not been one.
+
+        starts (np.ndarray): The stream index where the open packet of each
+            threshold and cutoff pair started.
+
+        counts (np.ndarray): The packets closed by each pair are added here.
+
+        durations (np.ndarray): The samples in the packets closed by each pair
+            are added here.
+    """
+    num_cutoffs = cutoffs.size
+    current = level[0]
+    for i in range(signal.size):
+        power = sample_power(signal[i])
+        new = current
+        while new < levels.size and power > levels[new]:
+            new += 1
+        while new > 0 and not power > levels[new - 1]:
+            new -= 1
+        now = offset + i
+        # The thresholds the signal just dropped below
+        for t in range(new, current):
+            last_above[t] = now - 1
+        # The thresholds the signal just rose above
+        for t in range(current, new):
+            if last_above[t] < 0:
+                for c in range(num_cutoffs):
+                    starts[t, c] = now
+                continue
+            gap = now - last_above[t] - 1
+            c = 0
+            while c < num_cutoffs and cutoffs[c] <= gap:
+                counts[t, c] += 1
+                durations[t, c] += last_above[t] + 1 - starts[t, c]
+                starts[t, c] = now
+                c += 1
+        current = new
+    for t in range(current):
+        last_above[t] = offset + signal.size - 1
+    level[0] = current
+
+
+def detect_shard(
+    signal: np.ndarray, threshold: float, cutoff: int, offset: int, decimation: int = 1
+) -> tuple:
+    """Runs the kernel over one chunk as if no packet was open before it.
+
+    The kernel releases the GIL, so chunks can be handed to a pool of threads
+    and their results joined up afterwards with `stitch_shard`.
+
+    Returns:
+        tuple (np.ndarray, int, np.ndarray): The (start, end) rows of the
+        packets closed in the chunk, the number of samples before the first
+        one above the threshold and the detector state at the end of the chunk.
+    """
+    state: np.ndarray = np.zeros(STATE_SIZE, dtype=np.int64)
+    bounds = np.zeros((signal.size // (cutoff + 1) + 2, 2), dtype=np.int64)
+    count: int = find_packet_bounds(
+        signal, threshold, cutoff, decimation, offset, state, bounds
+    )
+    # The first sample above the threshold is where the first packet starts
+    leading: int = signal.size
+    if count:
+        leading = bounds[0, 0] - offset
+    elif state[IN_PACKET]:
+        leading = state[PACKET_START] - offset
+    return (bounds[:count], leading, state)
+
+
+def stitch_shard(state: np.ndarray, shard: tuple, cutoff: int, size: int) -> tuple:
+    """Joins the result of `detect_shard` onto the state left by the chunks
+    before it, giving exactly what running the chunks in order would have.
+
+    If no packet was open the chunk's own result stands. Otherwise the open
+    packet either ends within the chunk's leading quiet samples, continues
+    into the chunk's first packet, or lasts past the whole chunk.
+
+    Arguments:
+        state (np.ndarray): The detector state before the chunk.
+
+        shard (tuple): The result of `detect_shard` for the chunk.
+
+        cutoff (int): The cutoff the chunk was detected with.
+
+        size (int): The number of samples in the chunk.
+
+    Returns:
+        tuple (np.ndarray, np.ndarray): The packets closed by the chunk and the
+        detector state after it.
+    """
+    bounds, leading, end_state = shard
+    if not state[IN_PACKET]:
+        return (bounds, end_state)
+    # A cutoff of 0 still needs one quiet sample to end a packet
+    if leading >= max(cutoff, 1) - state[BELOW_RUN]:
+        closed = np.array([[state[PACKET_START], state[LAST_ABOVE] + 1]], np.int64)
+        return (np.concatenate((closed, bounds)), end_state)
+    if leading == size:
+        end_state = state.copy()
+        end_state[BELOW_RUN] += size
+        return (bounds, end_state)
+    if bounds.shape[0]:
+        bounds = bounds.copy()
+        bounds[0, 0] = state[PACKET_START]
     else:
-        if cutoff_list.size == 0 and end_of_packet_reached:
-            if last_signal.any():
-                signal = np.concatenate((last_signal, signal))
-            # print("E")
-            if threshold_list[-1] > packet_slack:
-                return (
-                    [signal[threshold_list[0] : threshold_list[-1] + packet_slack]],
-                    end_of_packet_reached,
-                    new_carryover,
+        end_state = end_state.copy()
+        end_state[PACKET_START] = state[PACKET_START]
+    return (bounds, end_state)
+
+
+class StreamingDetector:
+    def __init__(
+        self,
+        threshold: float,
+        cutoff: int,
+        packet_slack: int,
+        decimation: int = 1,
+        max_packet_length: int = 0,
+    ):
+        """Turns a stream of sample chunks into packets.
+
+        Only the samples that may still be part of a packet are kept between
+        chunks, in a PacketAssembler. Packets are sliced out once they have
+        closed and the `packet_slack` samples after them have arrived, or in
+        pieces of `max_packet_length` samples while they last. So where the
+        chunks are cut never changes the packets.
+
+        Arguments:
+            threshold (float): The value that signifies when a signal should
+                start to considered a packet.
+
+            cutoff (int): The number of iq values that need to be below the
+                threshold for the signal to be considered ended.
+
+            packet_slack (int): The amount of indexes that will be added to the
+                beginning and ending of a discovered packet.
+
+            decimation (int): How many samples apart the samples looked at are
+                while there is no packet, see `find_packet_bounds`.
+
+            max_packet_length (int): The most samples a packet is held for.
+                A longer packet is returned in consecutive pieces of this many
+                samples, so a transmitter that never stops can not use up
+                memory. 0 holds packets of any length.
+        """
+        self.threshold: float = threshold
+        self.cutoff: int = cutoff
+        self.packet_slack: int = packet_slack
+        self.decimation: int = max(int(decimation), 1)
+        self.max_packet_length: int = max(int(max_packet_length), 0)
+        self._assembler: PacketAssembler = PacketAssembler()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets any open packet and starts counting samples from zero."""
+        self.state: np.ndarray = np.zeros(STATE_SIZE, dtype=np.int64)
+        self.samples_seen: int = 0
+        self._bounds: np.ndarray = np.zeros((0, 2), dtype=np.int64)
+        # The stream index of the first sample of each packet returned by the
+        # last call to process, process_many or flush
+        self.packet_starts: list = list()
+        # The samples that may still be needed by a packet
+        self._assembler.clear()
+        # The start of the open packet and where its next piece starts, once it
+        # has been split
+        self._split: tuple = None
+        # The (first, end) stream indexes of closed packets waiting for the
+        # rest of their trailing slack, oldest first
+        self._closed: list = list()
+
+    def __bounds_for(self, size: int) -> np.ndarray:
+        rows: int = size // (self.cutoff + 1) + 2
+        if self._bounds.shape[0] < rows:
+            self._bounds = np.zeros((rows, 2), dtype=np.int64)
+        return self._bounds
+
+    def __piece_start(self, signal_start: int) -> int:
+        """Returns the stream index the open packet's samples start from."""
+        if self._split is not None and self._split[0] == self.state[PACKET_START]:
+            return self._split[1]
+        return max(
+            self.state[PACKET_START] - self.packet_slack,
+            self._assembler.first_index(signal_start),
+        )
+
+    def __retain(self, signal: np.ndarray) -> None:
+        """Keeps the samples that can still be part of a packet and drops the
+        rest. The chunk itself may be reused once this returns."""
+        signal_start: int = self.samples_seen - signal.size
+        if self.state[IN_PACKET]:
+            keep_from: int = self.__piece_start(signal_start)
+        else:
+            keep_from: int = self.samples_seen - self.packet_slack
+            self._split = None
+        if self._closed:
+            keep_from = min(keep_from, self._closed[0][0])
+        self._assembler.retain(signal, signal_start, keep_from)
+
+    def process(self, signal: np.ndarray) -> list:
+        """Runs a chunk of samples through the detector.
+
+        Arguments:
+            signal (np.ndarray): The next chunk of IQ samples in the stream.
+
+        Returns:
+            list[np.ndarray]: The packets that were completed by this chunk.
+        """
+        signal = signal.ravel()
+        bounds: np.ndarray = self.__bounds_for(signal.size)
+        count: int = find_packet_bounds(
+            signal,
+            self.threshold,
+            self.cutoff,
+            self.decimation,
+            self.samples_seen,
+            self.state,
+            bounds,
+        )
+        return self.__emit(signal, bounds[:count])
+
+    def process_many(
+        self, signals: list, pool: ThreadPoolExecutor, thresholds: list = None
+    ) -> list:
+        """Runs several consecutive chunks through the detector at once.
+
+        The chunks are detected in parallel on `pool` and then stitched
+        together in order, so the packets are the same as calling `process`
+        on each chunk in turn.
+
+        Arguments:
+            signals (list[np.ndarray]): The next chunks of IQ samples in the
+                stream, in order.
+
+            pool (ThreadPoolExecutor): The threads to detect the chunks on.
+
+            thresholds (list[float]): The threshold of each chunk, as if it
+                were set before calling `process` on it. `threshold` is left
+                at the last. Every chunk uses `threshold` if None.
+
+        Returns:
+            list[np.ndarray]: The packets that were completed by these chunks.
+        """
+        signals = [signal.ravel() for signal in signals]
+        if thresholds is None:
+            thresholds = [self.threshold] * len(signals)
+        offsets: list = list()
+        offset: int = self.samples_seen
+        for signal in signals:
+            offsets.append(offset)
+            offset += signal.size
+        shards: list = list(
+            pool.map(
+                lambda job: detect_shard(
+                    job[0], job[2], self.cutoff, job[1], self.decimation
+                ),
+                zip(signals, offsets, thresholds),
+            )
+        )
+        all_packets: list = list()
+        starts: list = list()
+        for signal, shard, threshold in zip(signals, shards, thresholds):
+            self.threshold = threshold
+            if self.__missed_start(signal, shard):
+                bounds: np.ndarray = self.__bounds_for(signal.size)
+                count: int = find_packet_bounds(
+                    signal,
+                    self.threshold,
+                    self.cutoff,
+                    self.decimation,
+                    self.samples_seen,
+                    self.state,
+                    bounds,
                 )
+                bounds = bounds[:count]
             else:
-                if last_signal.any():
-                    signal = np.concatenate((last_signal, signal))
-                return (
-                    [signal[threshold_list[0] : threshold_list[-1] + packet_slack]],
-                    end_of_packet_reached,
-                    new_carryover,
+                bounds, self.state = stitch_shard(
+                    self.state, shard, self.cutoff, signal.size
                 )
-        elif cutoff_list.size == 0 and not end_of_packet_reached:
-            # print("F") #! WORKING
-            joined_signal: np.ndarray = np.concatenate((packet, signal))
-            return ([joined_signal], end_of_packet_reached, new_carryover)
-        # Check if the carryover packet ended or if it continues into this signal
-        packet_finished: bool = False
-        if (threshold_list[0] + carryover) > cutoff:
-            # print("G")
-            all_packets.append(packet)
-            packet_finished = True
-        # Find all packets
-        for i in range(cutoff_list.size + 1):
-            if not cutoff_list.size > 0:
-                break
-            cutoff_list_value: int = cutoff_list[i]
-            # Find the first packet
-            if i == 0 and not packet_finished:
-                # print("H")
-                all_packets.append(
-                    np.concatenate(
-                        (packet, signal[: threshold_list[cutoff_list_value]])
-                    )
-                )
-            elif i == 0 and packet_finished:
-                # print("I")
-                all_packets.append(
-                    signal[threshold_list[0] : threshold_list[cutoff_list_value]]
-                )
-            # Find the last packet
-            elif i == cutoff_list.size:
-                # print("J")
-                all_packets.append(
-                    signal[
-                        threshold_list[cutoff_list[-1]]
-                        - packet_slack : threshold_list[-1]
-                        + 1
-                    ]
-                )
-            # Find all other packets
-            else:
-                # print("K")
-                last_cutoff_list_value: int = cutoff_list[i - 1]
-                all_packets.append(
-                    signal[
-                        threshold_list[last_cutoff_list_value + 1]
-                        - packet_slack : threshold_list[cutoff_list_value]
-                    ]
+            all_packets.extend(self.__emit(signal, bounds))
+            starts.extend(self.packet_starts)
+        self.packet_starts = starts
+        return all_packets
+
+    def __missed_start(self, signal: np.ndarray, shard: tuple) -> bool:
+        """Returns True if a decimated chunk skipped over samples that would
+        have kept the open packet going, so it has to be run again in order.
+
+        A chunk detected on its own does not know a packet is open, so while
+        decimated it can step over the end of that packet.
+        """
+        if self.decimation == 1 or not self.state[IN_PACKET]:
+            return False
+        reach: int = max(self.cutoff, 1) - self.state[BELOW_RUN]
+        head: np.ndarray = signal[: max(min(reach, signal.size), 0)]
+        above: np.ndarray = np.flatnonzero(
+            head.real * head.real + head.imag * head.imag > power_level(self.threshold)
+        )
+        return above.size > 0 and above[0] < shard[1]
+
+    def __emit(self, signal: np.ndarray, bounds: np.ndarray) -> list:
+        """Slices out the packets a chunk closed and keeps what is still needed."""
+        signal_start: int = self.samples_seen
+        self.samples_seen += signal.size
+        all_packets: list = list()
+        self.packet_starts = list()
+        for start, end in bounds:
+            first: int = max(
+                start - self.packet_slack, self._assembler.first_index(signal_start)
+            )
+            if self._split is not None and self._split[0] == start:
+                first = self._split[1]
+                self._split = None
+            self._closed.append((first, end + self.packet_slack))
+        # A packet's slack can run past the end of the chunk that closed it
+        while self._closed and self._closed[0][1] <= self.samples_seen:
+            first, end = self._closed.pop(0)
+            all_packets.extend(self.__pieces(first, end, signal, signal_start))
+        if self.max_packet_length and self.state[IN_PACKET] and not self._closed:
+            # Cuts the full pieces off the front of the open packet, up to the
+            # last sample that is sure to be part of it. They wait for the
+            # packets before it, so packets come out in order
+            first: int = self.__piece_start(signal_start)
+            known_end: int = min(
+                self.samples_seen, self.state[LAST_ABOVE] + 1 + self.packet_slack
+            )
+            full: int = max(known_end - first, 0) // self.max_packet_length
+            if full:
+                end: int = first + full * self.max_packet_length
+                all_packets.extend(self.__pieces(first, end, signal, signal_start))
+                self._split = (self.state[PACKET_START], end)
+        self.__retain(signal)
+        return all_packets
+
+    def __pieces(self, first: int, end: int, signal: np.ndarray, signal_start: int) -> list:
+        """Copies out the samples between two stream indexes, in pieces of at
+        most `max_packet_length` samples, and records where each starts."""
+        all_packets: list = list()
+        while first < end:
+            piece_end: int = end
+            if self.max_packet_length:
+                piece_end = min(end, first + self.max_packet_length)
+            packet: np.ndarray = self._assembler.take(
+                first, piece_end, signal, signal_start
+            )
+            if packet.size:
+                self.packet_starts.append(first)
+                all_packets.append(packet)
+            first = piece_end
+        return all_packets
+
+    def flush(self) -> list:
+        """Closes the open packet, if there is one, at the end of the stream.
+
+        Returns:
+            list[np.ndarray]: The packets still waiting for their slack and the
+            packet that was still open, cut off at the end of the stream.
+        """
+        all_packets: list = list()
+        self.packet_starts = list()
+        empty: np.ndarray = np.zeros(0, dtype=np.complex64)
+        for first, end in self._closed:
+            all_packets.extend(self.__pieces(first, end, empty, self.samples_seen))
+        if self.state[IN_PACKET]:
+            all_packets += self.__pieces(
+                self.__piece_start(self.samples_seen),
+                self.state[LAST_ABOVE] + 1 + self.packet_slack,
+                empty,
+                self.samples_seen,
+            )
+        starts: list = self.packet_starts
+        self.reset()
+        self.packet_starts = starts
+        return all_packets
+
+
+def detect_signal(
+    signal: np.ndarray,
+    threshold: float,
+    cutoff: int,
+    packet_slack: int,
+    workers: int = 1,
+    shard_size: int = 1 << 20,
+    decimation: int = 1,
+) -> list:
+    """Finds every packet in a whole recording.
+
+    Arguments:
+        signal (np.ndarray): The recorded IQ samples. A memmap works and is
+            only read a shard at a time.
+
+        threshold, cutoff, packet_slack, decimation: See StreamingDetector.
+
+        workers (int): The number of threads the shards are detected on.
+
+        shard_size (int): The number of samples each thread detects at a time.
+
+    Returns:
+        list[np.ndarray]: The packets in the order they were found.
+    """
+    detector = StreamingDetector(threshold, cutoff, packet_slack, decimation)
+    shards: list = [
+        signal[start : start + shard_size] for start in range(0, signal.size, shard_size)
+    ]
+    all_packets: list = list()
+    if workers <= 1:
+        for shard in shards:
+            all_packets.extend(detector.process(shard))
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            for start in range(0, len(shards), workers):
+                all_packets.extend(
+                    detector.process_many(shards[start : start + workers], pool)
                 )
-        return (all_packets, end_of_packet_reached, new_carryover)
+    all_packets.extend(detector.flush())
+    return all_packets
+
+
+class SweepDetector:
+    def __init__(self, thresholds: list, cutoffs: list):
+        """Counts the packets a grid of thresholds and cutoffs would find in a
+        stream, without keeping any samples.
+
+        Arguments:
+            thresholds (list[float]): The thresholds to try.
+
+            cutoffs (list[int]): The cutoffs to try.
+        """
+        self.thresholds: list = list(thresholds)
+        self.cutoffs: list = list(cutoffs)
+        # The kernel wants both sorted, results are put back in the given order
+        self._threshold_order = np.argsort(self.thresholds, kind="stable")
+        self._cutoff_order = np.argsort(self.cutoffs, kind="stable")
+        self._levels = np.array(
+            [power_level(threshold) for threshold in self.thresholds], np.float64
+        )[self._threshold_order]
+        self._cutoffs = np.asarray(self.cutoffs, np.int64)[self._cutoff_order]
+        shape: tuple = (len(self.thresholds), len(self.cutoffs))
+        self.level: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.last_above: np.ndarray = np.full(shape[0], -1, dtype=np.int64)
+        self.starts: np.ndarray = np.zeros(shape, dtype=np.int64)
+        self.counts: np.ndarray = np.zeros(shape, dtype=np.int64)
+        self.durations: np.ndarray = np.zeros(shape, dtype=np.int64)
+        self.samples_seen: int = 0
+
+    def process(self, signal: np.ndarray) -> None:
+        """Runs the next chunk of the stream through every pair."""
+        signal = signal.ravel()
+        sweep_packet_bounds(
+            signal,
+            self._levels,
+            self._cutoffs,
+            self.samples_seen,
+            self.level,
+            self.last_above,
+            self.starts,
+            self.counts,
+            self.durations,
+        )
+        self.samples_seen += signal.size
+
+    def results(self, sample_rate: float) -> dict:
+        """Closes the open packets and summarizes each pair.
+
+        Arguments:
+            sample_rate (float): The sample rate of the stream.
+
+        Returns:
+            dict[str, np.ndarray]: The packet counts, mean packet durations in
+            milliseconds and the percent of the stream spent in a packet, each
+            with a row per threshold and a column per cutoff in the order they
+            were given.
+        """
+        seen = self.last_above >= 0
+        counts = self.counts + seen[:, None]
+        durations = self.durations + np.where(
+            seen[:, None], self.last_above[:, None] + 1 - self.starts, 0
+        )
+        # Undo the sorting
+        rows = np.argsort(self._threshold_order)
+        columns = np.argsort(self._cutoff_order)
+        counts = counts[rows][:, columns]
+        durations = durations[rows][:, columns]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_ms = np.where(counts > 0, durations / counts / sample_rate * 1e3, 0.0)
+        return {
+            "packets": counts,
+            "mean duration (ms)": mean_ms,
+            "duty cycle (%)": durations / max(self.samples_seen, 1) * 100,
+        }
+
+
+def sweep_signal(
+    signal: np.ndarray, thresholds: list, cutoffs: list, sample_rate: float
+) -> dict:
+    """Summarizes the packets every threshold and cutoff pair finds in a whole
+    recording. See SweepDetector.results."""
+    detector = SweepDetector(thresholds, cutoffs)
+    detector.process(signal)
+    return detector.results(sample_rate)
 
 
 class PacketDetect:
     def __init__(
         self,
-        stream_q: mp.Queue,
+        stream: SampleTransport,
         threshold: float,
         cutoff: int,
-        packet_q: mp.Queue,
+        packets: SampleTransport,
         packet_slack: int,
+        workers: int = 1,
+        noise_floor: NoiseFloor = None,
+        decimation: int = 1,
+        max_packet_length: int = 0,
+        metrics: Metrics = None,
+        profiler: Profiler = None,
     ):
         """A class that handles detecting when a signal is part of a packet.
 
         Arguments:
-            stream_q (mp.Queue): A queue holding iq samples and the order in
-                which they were added.
+            stream (SampleTransport): Carries the iq samples received by the SDR
+                in the order in which they were received.
 
             threshold (float): The value that signifies when a signal should
                 start to considered a packet.
@@ -226,47 +736,120 @@ class PacketDetect:
             cutoff (int): The number of iq values that need to be below the
                 threshold for the signal to be considered ended.
 
-            packet_q (mp.Queue): A queue holding iq samples and a bool
-                identifying if they are part of a packet.
+            packets (SampleTransport): Carries each completed packet to the
+                PacketSaver.
 
             packet_slack (int): The amount of indexes that will be added to the
                 discovered packet to ensure the whole packet is captured.
+
+            workers (int): The number of threads chunks are detected on. When
+                more than one, up to this many waiting chunks are detected
+                together.
+
+            noise_floor (NoiseFloor): If set, the threshold follows this noise
+                floor estimate instead of staying at `threshold`.
+
+            decimation (int): How many samples apart the samples looked at are
+                while there is no packet, see `find_packet_bounds`.
+
+            max_packet_length (int): The most samples a packet is held for
+                before it is sent on in pieces, 0 for no limit.
+
+            metrics (Metrics): If set, the chunks processed, the time spent on
+                each, the threshold and the packets found are recorded.
+
+            profiler (Profiler): If set, this process is profiled and taking
+                chunks, detecting and sending packets are timed.
         """
-        self.stream_q: mp.Queue = stream_q
-        self.packet_q: mp.Queue = packet_q
+        self.stream: SampleTransport = stream
+        self.packets: SampleTransport = packets
         self.threshold: float = threshold
         self.cutoff: int = cutoff
         self.packet_slack: int = packet_slack
-        self.last_signal = np.zeros(10, dtype=np.complex64)
-        self.packet: np.ndarray = None
-        self.carryover: int = None
+        self.decimation: int = decimation
+        self.detector = StreamingDetector(
+            threshold, cutoff, packet_slack, decimation, max_packet_length
+        )
+        self.next_sequence: int = 0
+        self.workers: int = max(int(workers), 1)
+        self.pool: ThreadPoolExecutor = None
+        self.noise_floor: NoiseFloor = noise_floor
+        self.metrics: Metrics = metrics
+        self.profiler: Profiler = profiler
         self.run = True
 
     def __prime_packet_detect(self) -> None:
         print("Preparing packet_detect")
-        hdf5 = HDF5Handler()
-        primer_signals = list()
-        primer_signals.append(hdf5.get_signal("priming_signals", "signal0"))
-        primer_signals.append(hdf5.get_signal("priming_signals", "signal1"))
-        primer_signals.append(hdf5.get_signal("priming_signals", "signal2"))
-        primer_signals.append(hdf5.get_signal("priming_signals", "signal3"))
-        # Runs the jit function with dummy data to compile it before running
-        # real data through it
-        for signal in primer_signals:
-            signal_chunks = np.array_split(signal, 40)
-            for chunk in signal_chunks:
-                self.stream_q.put(chunk)
-        self.stream_q.put("DONE")
-        self.__find_packets(True)
-        # Clean out packet_q of dummy data
-        while True:
-            data = self.packet_q.get()
-            if type(data) == str:
-                if data == "DONE":
-                    break
+        # Runs a throwaway detector over a made up burst so the first real
+        # chunk does not pay for loading the kernel and filling buffers
+        primer = StreamingDetector(
+            self.threshold, self.cutoff, self.packet_slack, self.decimation
+        )
+        signal = np.zeros(4 * (self.cutoff + self.packet_slack) + 1000, np.complex64)
+        signal[1000 : 1000 + self.cutoff] = 2 * self.threshold + 1
+        for chunk in np.array_split(signal, 8):
+            primer.process(chunk)
+        primer.flush()
         print("packet_detect preped")
 
-    def __find_packets(self, priming: bool = False) -> None:
+    def __send_packets(self, all_packets: list) -> None:
+        with span(self.profiler, ENQUEUE):
+            self.__send(all_packets)
+
+    def __send(self, all_packets: list) -> None:
+        if self.metrics is None:
+            for packet in all_packets:
+                self.packets.send(packet)
+            return
+        # The packets were finished by the last chunk that was taken
+        received: float = self.metrics.chunk_time(self.next_sequence - 1)
+        for packet in all_packets:
+            self.metrics.packet_sent(self.packets.sequence, received)
+            self.packets.send(packet)
+            self.metrics.add(PACKETS_DETECTED)
+
+    def __next_batch(self) -> list:
+        """Waits for the next chunk and takes any others that are already
+        waiting, up to one per worker."""
+        with span(self.profiler, DEQUEUE):
+            return self.__take_batch()
+
+    def __take_batch(self) -> list:
+        batch: list = [self.stream.recv()]
+        while type(batch[-1]) != str and len(batch) < self.workers:
+            descriptor = self.stream.recv(timeout=0)
+            if descriptor is None:
+                break
+            batch.append(descriptor)
+        return batch
+
+    def __detect(self, signals: list) -> None:
+        if not signals:
+            return
+        start_time: float = perf_counter()
+        with span(self.profiler, DETECT):
+            # Each chunk is detected with the threshold of the floor up to it
+            thresholds: list = None
+            if self.noise_floor is not None:
+                thresholds = [self.noise_floor.update(signal) for signal in signals]
+                self.detector.threshold = thresholds[0]
+            if len(signals) == 1:
+                all_packets: list = self.detector.process(signals[0])
+            else:
+                all_packets: list = self.detector.process_many(
+                    signals, self.pool, thresholds
+                )
+        if self.metrics is not None:
+            seconds: float = (perf_counter() - start_time) / len(signals)
+            for _ in signals:
+                self.metrics.observe(DETECT_CHUNK_SECONDS, seconds)
+            self.metrics.add(CHUNKS_PROCESSED, len(signals))
+            self.metrics.set(THRESHOLD, self.detector.threshold)
+            if self.noise_floor is not None:
+                self.metrics.set(NOISE_FLOOR_DB, self.noise_floor.floor_db)
+        self.__send_packets(all_packets)
+
+    def __find_packets(self) -> None:
         """Decides when a signal is part of a packet."""
         count = 0
         while self.run:
@@ -276,43 +859,73 @@ class PacketDetect:
                 print("packet_detect still alive")
                 count = 0
             # Gets the siganl data
-            signal: np.ndarray = self.stream_q.get()
-            start_time = time()
-            # Breaks the loop
-            if type(signal) == str:
-                self.packet_q.put("DONE")
-                break
+            batch: list = self.__next_batch()
+            signals: list = list()
+            held: list = list()
+            for descriptor in batch:
+                # Breaks the loop
+                if type(descriptor) == str:
+                    self.run = False
+                    break
+                slot, length, sequence = descriptor
+                # A packet can not span chunks that never made it to the detector
+                if sequence != self.next_sequence:
+                    self.__detect(signals)
+                    signals = list()
+                    self.__send_packets(self.detector.flush())
+                self.next_sequence = sequence + 1
+                signals.append(self.stream.view(slot, length))
+                held.append((slot, length))
             # Porcesses the signal
-            all_packets, end_of_packet_reached, self.carryover = process_signal(
-                signal,
-                self.threshold,
-                self.cutoff,
-                self.packet,
-                self.carryover,
-                self.packet_slack,
-                self.last_signal,
-            )
-            self.last_signal = signal
-            if not all_packets:
-                continue
-            if len(all_packets) > 0 and end_of_packet_reached:
-                self.packet = None
-                self.carryover = 0
-                self.packet_q.put(all_packets)
-            elif len(all_packets) > 0 and not end_of_packet_reached:
-                self.packet = all_packets.pop()
-                self.packet_q.put(all_packets)
-            # print(f'TIME: {time() - start_time}')
+            self.__detect(signals)
+            for slot, length in held:
+                self.stream.release(slot, length)
+        self.__send_packets(self.detector.flush())
+        self.packets.send_done()
         print("EXITED PACKET_DETECT")
 
     def start_packet_detect(self) -> None:
-        # self.__prime_packet_detect()
+        # The monitor shuts packet_detect down through the stream
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.__prime_packet_detect()
+        if self.workers > 1:
+            self.pool = ThreadPoolExecutor(self.workers)
+        if self.profiler is not None:
+            self.profiler.attach("packet_detect")
         self.__find_packets()
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.profiler is not None:
+            self.profiler.finish()
 
 
 if __name__ == "__main__":
-    # q_1 = mp.Queue()
-    # q_2 = mp.Queue()
-    # packet_d = PacketDetect(q_1, 1.6, 500, q_2, 100.0, 1.5)
-    # packet_d.prime_packet_detect()
-    pass
+    # Measures how many samples per second the detector can keep up with. Run
+    # from the python/ directory with `python3 -m monitor.packet_detect`
+    sample_rate = 15000000.0
+    rng = np.random.default_rng(0)
+    signal = (
+        rng.normal(0, 0.3, int(sample_rate)) + 1j * rng.normal(0, 0.3, int(sample_rate))
+    ).astype(np.complex64)
+    for position in range(100000, signal.size - 20000, 500000):
+        signal[position : position + 15000] += 3.0
+    detector = StreamingDetector(2.0, 1000, 100)
+    detector.process(signal[:20000])
+    detector.reset()
+    start_time = time()
+    packets = list()
+    for chunk in np.array_split(signal, signal.size // 20000):
+        packets.extend(detector.process(chunk))
+    packets.extend(detector.flush())
+    elapsed = time() - start_time
+    print(f"{len(packets)} packets, {signal.size / elapsed / 1e6:.1f} MS/s")
+    # Detecting a recording in shards on several threads
+    recording = np.tile(signal, 8)
+    for workers in (1, 2, 4, 8):
+        start_time = time()
+        packets = detect_signal(recording, 2.0, 1000, 100, workers)
+        elapsed = time() - start_time
+        print(
+            f"{workers} workers: {len(packets)} packets, "
+            f"{recording.size / elapsed / 1e6:.1f} MS/s"
+        )
@@ -5,8 +5,10 @@ TODO: Ability to add metadata: *name *size *sample_rate *center_frequency
 """
 
 import multiprocessing as mp
+from time import time
 import numpy as np
 import os, sys
+import signal
 from datetime import date
 
 FILE_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -14,54 +16,140 @@ PYTHON_DIR = f"{FILE_DIR}/../"
 sys.path.insert(0, PYTHON_DIR)
 
 from helper_functions.hdf5_handler import HDF5Handler
+from helper_functions.hdf5_writer import HDF5Writer
+from helper_functions.shared_transport import SampleTransport
+from helper_functions.spectral import SpectralAnalyzer
+from monitor.noise_floor import NoiseFloor
+from monitor.metrics import (
+    Metrics,
+    BYTES_WRITTEN,
+    PACKET_QUEUE_DEPTH,
+    PACKETS_SAVED,
+    RX_TO_DISK_SECONDS,
+)
+from monitor.profiler import DEQUEUE, SAVE, Profiler, span
 
 
 class PacketSaver:
     def __init__(
         self,
         file_name: str,
-        packet_q: mp.Queue,
+        packets: SampleTransport,
         hdf5: HDF5Handler,
         center_frequency: float,
         sample_rate: float,
         threshold: float,
+        batch_size: int = 256,
+        flush_seconds: float = 1.0,
+        noise_floor: NoiseFloor = None,
+        metrics: Metrics = None,
+        profiler: Profiler = None,
+        analyzer: SpectralAnalyzer = None,
     ):
         """Saves off packets into HDF5 files.
 
         Arguments:
             file_name (str): The name of the HDF5 file to be saved.
 
-            packet_q (mp.Queue): A shared queue that holds the completed packets to be saved.
+            packets (SampleTransport): Carries the completed packets to be saved.
+
+            batch_size (int): The number of packets held before they are written.
+
+            flush_seconds (float): The longest time a packet is held before it
+                is written.
+
+            noise_floor (NoiseFloor): If set, packets are saved with the
+                threshold packet_detect is currently using.
+
+            metrics (Metrics): If set, the packets and bytes written, the
+                packet queue depth and how long each packet took to reach the
+                disk are recorded.
+
+            profiler (Profiler): If set, this process is profiled and taking
+                packets and writing them are timed.
+
+            analyzer (SpectralAnalyzer): If set, the dominant frequency,
+                occupied bandwidth and SNR of each batch of packets are
+                measured as it is written and stored in the index.
         """
         self.file_name = file_name
-        self.packet_q = packet_q
+        self.packets = packets
         self.hdf5 = hdf5
         self.center_frequency = center_frequency
         self.sample_rate = sample_rate
         self.threshold = threshold
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.noise_floor = noise_floor
+        self.metrics = metrics
+        self.profiler = profiler
+        self.analyzer = analyzer
+        # The receive time and size in bytes of each packet the writer is holding
+        self._held: list = list()
         self.dataset_count = 0
         self.run = True
 
     def start(self):
+        # The monitor shuts the saver down through the queue so held packets
+        # are written before it exits
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        writer = HDF5Writer(
+            self.file_name,
+            self.batch_size,
+            self.flush_seconds,
+            analyzer=self.analyzer,
+        )
+        if self.profiler is not None:
+            self.profiler.attach("packet_saver")
         while self.run:
-            all_packets = self.packet_q.get()
-            if type(all_packets) == str:
-                if all_packets == "DONE":
+            with span(self.profiler, DEQUEUE):
+                descriptor = self.packets.recv(timeout=self.flush_seconds)
+            if descriptor is None:
+                with span(self.profiler, SAVE):
+                    saved: int = writer.flush_if_due()
+                self.__report(saved)
+                continue
+            if type(descriptor) == str:
+                if descriptor == "DONE":
                     break
                 else:
                     continue
-            for packet in all_packets:
-                if packet.size < 5:
-                    continue
-                packet_length_in_time = packet.size / self.sample_rate
-                self.hdf5.save_signal(
-                    packet,
-                    packet.size,
-                    self.center_frequency,
-                    packet_length_in_time,
-                    self.threshold,
-                    self.sample_rate,
-                    self.file_name,
+            slot, length, sequence = descriptor
+            if length < 5:
+                self.packets.release(slot, length)
+                continue
+            packet = self.packets.view(slot, length)
+            if self.metrics is not None:
+                self.metrics.set(PACKET_QUEUE_DEPTH, self.packets.qsize())
+                self._held.append((self.metrics.packet_time(sequence), packet.nbytes))
+            threshold: float = self.threshold
+            if self.noise_floor is not None:
+                threshold = self.noise_floor.threshold
+            with span(self.profiler, SAVE):
+                saved: int = writer.write(
+                    packet, self.center_frequency, threshold, self.sample_rate
                 )
-                print("saved packet")
+            self.packets.release(slot, length)
+            self.dataset_count += 1
+            self.__report(saved)
+        with span(self.profiler, SAVE):
+            saved: int = writer.flush()
+            writer.close()
+        self.__report(saved)
+        if self.profiler is not None:
+            self.profiler.finish()
         print("EXITED PACKET_SAVER")
+
+    def __report(self, saved: int) -> None:
+        if saved:
+            print(f"saved {saved} packets")
+        if self.metrics is None or not saved:
+            return
+        # Everything the writer was holding has just been written
+        now: float = time()
+        for received, nbytes in self._held:
+            if received:
+                self.metrics.observe(RX_TO_DISK_SECONDS, now - received)
+            self.metrics.add(BYTES_WRITTEN, nbytes)
+        self.metrics.add(PACKETS_SAVED, len(self._held))
+        self._held = list()
@@ -0,0 +1,180 @@
+from collections import Counter
+from contextlib import nullcontext
+import multiprocessing as mp
+import threading as th
+from time import perf_counter
+import cProfile, pstats
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+# cprofile records every call, sample records the stack every SAMPLE_INTERVAL
+# seconds for a flamegraph
+PROFILE_MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+PROCESSES = ("streamer", "packet_detect", "packet_saver")
+STAGES = {
+    "rx": "Reading chunks from the radio.",
+    "enqueue": "Handing chunks or packets to the next process.",
+    "dequeue": "Waiting for and taking chunks or packets from the last process.",
+    "detect": "Finding packets in chunks, including the noise floor update.",
+    "save": "Writing packets to the HDF5 file.",
+}
+RX = 0
+ENQUEUE = 1
+DEQUEUE = 2
+DETECT = 3
+SAVE = 4
+# Each process has its start and end time, then the total seconds, count and
+# longest span of each stage
+ROW_SIZE = 2 + 3 * len(STAGES)
+# Reused when profiling is off so a span costs next to nothing
+NO_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ("profiler", "stage", "start")
+
+    def __init__(self, profiler, stage: int):
+        self.profiler = profiler
+        self.stage: int = stage
+
+    def __enter__(self):
+        self.start: float = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.stage, perf_counter() - self.start)
+        return False
+
+
+def span(profiler, stage: int):
+    """Returns a context manager that times `stage` on `profiler`, or one that
+    does nothing if `profiler` is None."""
+    if profiler is None:
+        return NO_SPAN
+    return Span(profiler, stage)
+
+
+class Profiler:
+    def __init__(self, directory: str, mode: str = "cprofile"):
+        """Times each stage of the monitor pipeline in every process and
+        profiles each process as a whole.
+
+        Span totals are kept in shared memory, written by the process they
+        belong to, so the monitor can print where each process spent its time
+        once they have all exited. Each process also writes a report to
+        `directory` when it finishes:
+        - cprofile: `<process>.prof` for pstats or snakeviz, and `<process>.txt`
+            with the functions that took the most time.
+        - sample: `<process>.folded`, the stacks seen every SAMPLE_INTERVAL
+            seconds in the collapsed format flamegraph.pl and speedscope read.
+
+        Only the main thread of each process is profiled.
+
+        Arguments:
+            directory (str): Where the reports are written.
+
+            mode (str): One of PROFILE_MODES.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(
+                f"Unknown profile mode '{mode}', expected one of {PROFILE_MODES}"
+            )
+        self.directory: str = directory
+        self.mode: str = mode
+        self.spans = mp.Array("d", len(PROCESSES) * ROW_SIZE, lock=False)
+        # Set in the process that calls attach
+        self._row: int = 0
+        self._process: str = None
+        self._profile: cProfile.Profile = None
+        self._stacks: Counter = None
+        self._sampling: th.Event = None
+        self._sampler: th.Thread = None
+
+    def attach(self, process: str) -> None:
+        """Starts profiling the calling process, which is one of PROCESSES."""
+        self._process = process
+        self._row = PROCESSES.index(process) * ROW_SIZE
+        self.spans[self._row] = perf_counter()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stacks = Counter()
+            self._sampling = th.Event()
+            self._sampler = th.Thread(
+                target=self.__sample, args=(th.get_ident(),), daemon=True
+            )
+            self._sampler.start()
+
+    def add(self, stage: int, seconds: float) -> None:
+        start: int = self._row + 2 + 3 * stage
+        self.spans[start] += seconds
+        self.spans[start + 1] += 1
+        if seconds > self.spans[start + 2]:
+            self.spans[start + 2] = seconds
+
+    def __sample(self, thread_id: int) -> None:
+        while not self._sampling.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(thread_id)
+            stack: list = list()
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                    f"{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def finish(self) -> None:
+        """Stops profiling the calling process and writes its report."""
+        if self._process is None:
+            return
+        self.spans[self._row + 1] = perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        path: str = f"{self.directory}/{self._process}"
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(f"{path}.prof")
+            with open(f"{path}.txt", "w") as f:
+                stats = pstats.Stats(self._profile, stream=f)
+                stats.sort_stats("cumulative").print_stats(40)
+        else:
+            self._sampling.set()
+            self._sampler.join()
+            with open(f"{path}.folded", "w") as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        self._process = None
+
+    def summary(self) -> str:
+        """Returns a table of where each process spent its time."""
+        lines: list = [f"profile reports in {os.path.realpath(self.directory)}"]
+        for i, process in enumerate(PROCESSES):
+            row: int = i * ROW_SIZE
+            wall: float = self.spans[row + 1] - self.spans[row]
+            if wall <= 0:
+                continue
+            lines.append(f"{process}: {wall:.2f} s")
+            lines.append(
+                f"  {'stage':<9}{'seconds':>9}{'wall':>8}{'spans':>9}"
+                f"{'mean':>11}{'max':>11}"
+            )
+            timed: float = 0.0
+            for stage, name in enumerate(STAGES):
+                start: int = row + 2 + 3 * stage
+                seconds, count, longest = self.spans[start : start + 3]
+                if not count:
+                    continue
+                timed += seconds
+                lines.append(
+                    f"  {name:<9}{seconds:>9.3f}{seconds / wall:>8.1%}{count:>9.0f}"
+                    f"{seconds / count * 1e3:>8.3f} ms{longest * 1e3:>8.3f} ms"
+                )
+            lines.append(f"  {'other':<9}{wall - timed:>9.3f}{1 - timed / wall:>8.1%}")
+        return "\n".join(lines)
@@ -0,0 +1,172 @@
+from datetime import datetime, timezone
+import numpy as np
+import json, os, sys
+import signal
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+RECORDINGS_DIR = f"{FILE_DIR}/../captured_signals/"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.shared_transport import SampleTransport
+
+SAMPLE_DTYPE = np.dtype(np.complex64)
+SIGMF_DATATYPE = "cf32_le"
+
+
+def recording_paths(file_name: str) -> tuple:
+    """Returns the (data, meta) paths of a recording in captured_signals."""
+    base: str = f"{RECORDINGS_DIR}{file_name}"
+    return (f"{base}.sigmf-data", f"{base}.sigmf-meta")
+
+
+def open_recording(file_name: str) -> tuple:
+    """Maps a raw recording into memory without reading it. Changes to the
+    samples are never written back to the file.
+
+    Arguments:
+        file_name (str): The name of the recording. (There is no need to include
+            the file extension)
+
+    Returns:
+        tuple (np.memmap, dict): The samples and the SigMF metadata.
+    """
+    data_path, meta_path = recording_paths(file_name)
+    with open(meta_path) as f:
+        meta: dict = json.load(f)
+    if meta["global"]["core:datatype"] != SIGMF_DATATYPE:
+        raise ValueError(f"{data_path} is not {SIGMF_DATATYPE}")
+    if os.path.getsize(data_path) == 0:
+        return (np.zeros(0, dtype=SAMPLE_DTYPE), meta)
+    # Copy on write keeps the file safe while giving numba a writable array
+    return (np.memmap(data_path, dtype=SAMPLE_DTYPE, mode="c"), meta)
+
+
+class RawRecorder:
+    def __init__(
+        self,
+        file_name: str,
+        chunks: SampleTransport,
+        center_frequency: float,
+        sample_rate: float,
+        preallocate_seconds: float = 60.0,
+    ):
+        """Writes every chunk the radio receives to a SigMF recording.
+
+        The samples go to a .sigmf-data file of complex64 samples that is
+        preallocated and memory mapped, so each chunk is one copy into the page
+        cache and the kernel writes it out in large sequential blocks. The file
+        grows by another `preallocate_seconds` whenever it fills and is cut to
+        the samples written when recording stops. The .sigmf-meta file next to
+        it records the sample rate, frequency and where chunks were lost.
+
+        Arguments:
+            file_name (str): The name of the recording. (There is no need to
+                include the file extension)
+
+            chunks (SampleTransport): Carries a copy of every received chunk.
+
+            center_frequency (float): The frequency the radio is tuned to.
+
+            sample_rate (float): The sample rate of the radio.
+
+            preallocate_seconds (float): How much room is made in the data file
+                at a time.
+        """
+        self.file_name: str = file_name
+        self.chunks: SampleTransport = chunks
+        self.center_frequency: float = center_frequency
+        self.sample_rate: float = sample_rate
+        self.grow_samples: int = max(int(preallocate_seconds * sample_rate), 1)
+        self.samples_written: int = 0
+        self.gaps: list = list()
+        self.run = True
+        self._map: np.memmap = None
+        self._capacity: int = 0
+
+    def __grow(self, needed: int) -> None:
+        """Makes the data file big enough to hold `needed` samples and maps it."""
+        capacity: int = self._capacity
+        while capacity < needed:
+            capacity += self.grow_samples
+        if self._map is not None:
+            self._map.flush()
+            del self._map
+        with open(self.data_path, "r+b") as f:
+            f.truncate(capacity * SAMPLE_DTYPE.itemsize)
+        self._map = np.memmap(self.data_path, dtype=SAMPLE_DTYPE, mode="r+")
+        self._capacity = capacity
+
+    def write(self, samples: np.ndarray) -> None:
+        end: int = self.samples_written + samples.size
+        if end > self._capacity:
+            self.__grow(end)
+        self._map[self.samples_written : end] = samples
+        self.samples_written = end
+
+    def write_meta(self) -> None:
+        annotations: list = [
+            {
+                "core:sample_start": sample,
+                "core:sample_count": 0,
+                "core:comment": f"{lost} chunks were lost before this sample",
+            }
+            for sample, lost in self.gaps
+        ]
+        meta: dict = {
+            "global": {
+                "core:datatype": SIGMF_DATATYPE,
+                "core:sample_rate": self.sample_rate,
+                "core:version": "1.0.0",
+                "core:num_channels": 1,
+                "core:recorder": "Freqy-Replay",
+            },
+            "captures": [
+                {
+                    "core:sample_start": 0,
+                    "core:frequency": self.center_frequency,
+                    "core:datetime": self.started,
+                }
+            ],
+            "annotations": annotations,
+        }
+        with open(self.meta_path, "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def close(self) -> None:
+        """Cuts the data file to the samples written and writes the metadata."""
+        if self._map is not None:
+            self._map.flush()
+            del self._map
+            self._map = None
+        with open(self.data_path, "r+b") as f:
+            f.truncate(self.samples_written * SAMPLE_DTYPE.itemsize)
+        self.write_meta()
+
+    def start(self) -> None:
+        # The monitor shuts the recorder down through the transport
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.data_path, self.meta_path = recording_paths(self.file_name)
+        self.started: str = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        open(self.data_path, "wb").close()
+        self.write_meta()
+        self.__grow(self.grow_samples)
+        next_sequence: int = 0
+        while self.run:
+            descriptor = self.chunks.recv()
+            if type(descriptor) == str:
+                if descriptor == "DONE":
+                    break
+                continue
+            slot, length, sequence = descriptor
+            if sequence != next_sequence:
+                self.gaps.append((self.samples_written, sequence - next_sequence))
+            next_sequence = sequence + 1
+            self.write(self.chunks.view(slot, length))
+            self.chunks.release(slot, length)
+        self.close()
+        print(
+            f"recorded {self.samples_written / self.sample_rate:.1f} s to "
+            f"{self.file_name}.sigmf-data, {len(self.gaps)} gaps"
+        )
+        print("EXITED RAW_RECORDER")
@@ -0,0 +1,250 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from time import perf_counter, time
+import numpy as np
+import os, re, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.hdf5_handler import open_signal_file
+from helper_functions.hdf5_writer import HDF5Writer
+from helper_functions.spectral import SpectralAnalyzer
+from helper_functions.packet_layout import is_packed
+from monitor.packet_detect import StreamingDetector, SweepDetector
+from monitor.raw_recorder import open_recording, recording_paths
+
+# The number of samples read from a capture at a time
+BLOCK_SIZE = 1 << 22
+
+
+class CaptureSource:
+    def __init__(self, source: str):
+        """A capture that can be read block by block.
+
+        Arguments:
+            source (str): A raw recording, given as its name or its .sigmf-data
+                or .sigmf-meta file, or an HDF5 file in captured_signals. An
+                HDF5 file may be followed by :signalN to read one packet,
+                otherwise every packet in it is read back to back. Those
+                packets must share a sample rate and center frequency.
+        """
+        self.name: str = source
+        self._file = None
+        for extension in (".sigmf-data", ".sigmf-meta"):
+            if source.endswith(extension):
+                source = source[: -len(extension)]
+        if os.path.isfile(recording_paths(source)[1]):
+            self.__open_recording(source)
+        else:
+            self.__open_hdf5(source)
+
+    def __open_recording(self, name: str) -> None:
+        self.samples, meta = open_recording(name)
+        capture: dict = meta["captures"][0]
+        self.sample_rate: float = meta["global"]["core:sample_rate"]
+        self.center_freq: float = capture.get("core:frequency", 0.0)
+        started: str = capture.get("core:datetime")
+        self.start_time: float = (
+            datetime.fromisoformat(started.replace("Z", "+00:00")).timestamp()
+            if started
+            else time()
+        )
+
+    def __open_hdf5(self, source: str) -> None:
+        file_name, _, dataset = source.partition(":")
+        self._file = open_signal_file(file_name)
+        if is_packed(self._file):
+            index = self._file["index"]
+            if not index.shape[0]:
+                raise ValueError(f"{file_name} holds no packets")
+            if dataset:
+                row = index[int(dataset[len("signal") :])]
+                end: int = row["offset"] + row["length"]
+                self.samples = self._file["samples"][row["offset"] : end]
+            else:
+                rows: np.ndarray = index[:]
+                self.__check_settings(
+                    file_name, rows["sample_rate"], rows["center_freq"]
+                )
+                row = rows[0]
+                self.samples = self._file["samples"]
+            self.sample_rate: float = row["sample_rate"]
+            self.center_freq: float = row["center_freq"]
+            self.start_time: float = row["timestamp"]
+        else:
+            if dataset:
+                datasets: list = [self._file[dataset]]
+            else:
+                names: list = [
+                    key for key in self._file.keys() if re.fullmatch(r"signal\d+", key)
+                ]
+                if not names:
+                    raise ValueError(f"{file_name} holds no packets")
+                names.sort(key=lambda name: int(name[len("signal") :]))
+                datasets = [self._file[name] for name in names]
+                self.__check_settings(
+                    file_name,
+                    [data.attrs["sample_rate"] for data in datasets],
+                    [data.attrs["center_frequency"] for data in datasets],
+                )
+            self.samples = np.concatenate([data[:].ravel() for data in datasets])
+            self.sample_rate: float = datasets[0].attrs["sample_rate"]
+            self.center_freq: float = datasets[0].attrs["center_frequency"]
+            self.start_time: float = time()
+
+    def __check_settings(
+        self, file_name: str, sample_rates: list, center_freqs: list
+    ) -> None:
+        """Raises ValueError if the packets of a file were not all captured
+        with the same settings, as they can not be read as one capture then."""
+        if len(np.unique(sample_rates)) > 1 or len(np.unique(center_freqs)) > 1:
+            raise ValueError(
+                f"The packets in {file_name} were captured at different sample "
+                f"rates or center frequencies, read them one at a time with "
+                f"{file_name}:signalN"
+            )
+
+    @property
+    def size(self) -> int:
+        return self.samples.shape[-1]
+
+    def blocks(self, block_size: int = BLOCK_SIZE):
+        """Yields the samples of the capture in order, `block_size` at a time.
+
+        Memory mapped recordings are not copied, HDF5 datasets are read one
+        block at a time.
+        """
+        for start in range(0, self.size, block_size):
+            yield np.asarray(self.samples[start : start + block_size]).ravel()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def redetect(
+    source: str,
+    threshold: float,
+    cutoff: int,
+    packet_slack: int,
+    output: str,
+    workers: int = 1,
+    block_size: int = BLOCK_SIZE,
+    decimation: int = 1,
+    max_packet_length: int = 0,
+) -> int:
+    """Runs the detector over a capture as fast as it can be read and saves the
+    packets it finds.
+
+    Arguments:
+        source (str): The capture to read, see CaptureSource.
+
+        threshold, cutoff, packet_slack: The detector settings to try.
+
+        output (str): The name of the HDF5 file the packets are saved to.
+
+        workers (int): The number of threads blocks are detected on.
+
+        block_size (int): The number of samples read at a time.
+
+        decimation, max_packet_length (int): See StreamingDetector.
+
+    Returns:
+        int: The number of packets found.
+    """
+    capture = CaptureSource(source)
+    detector = StreamingDetector(
+        threshold, cutoff, packet_slack, decimation, max_packet_length
+    )
+    writer = HDF5Writer(output, analyzer=SpectralAnalyzer())
+    pool: ThreadPoolExecutor = ThreadPoolExecutor(workers) if workers > 1 else None
+    # Split blocks so each worker gets one
+    shard_size: int = max(block_size // max(workers, 1), 1)
+    start_time: float = perf_counter()
+
+    def save(packets: list) -> None:
+        for packet, start in zip(packets, detector.packet_starts):
+            writer.write(
+                packet,
+                capture.center_freq,
+                threshold,
+                capture.sample_rate,
+                capture.start_time + start / capture.sample_rate,
+            )
+
+    try:
+        for block in capture.blocks(block_size):
+            if pool is None:
+                save(detector.process(block))
+            else:
+                shards: list = [
+                    block[start : start + shard_size]
+                    for start in range(0, block.size, shard_size)
+                ]
+                save(detector.process_many(shards, pool))
+        save(detector.flush())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        writer.close()
+        capture.close()
+    elapsed: float = perf_counter() - start_time
+    print(
+        f"{writer.saved} packets saved to {output}.hdf5, "
+        f"{capture.size / elapsed / 1e6:.1f} MS/s, "
+        f"{capture.size / capture.sample_rate / elapsed:.1f}x real time"
+    )
+    return writer.saved
+
+
+def sweep(
+    source: str,
+    thresholds: list,
+    cutoffs: list,
+    block_size: int = BLOCK_SIZE,
+) -> dict:
+    """Summarizes the packets every threshold and cutoff pair finds in one pass
+    over a capture.
+
+    Arguments:
+        source (str): The capture to read, see CaptureSource.
+
+        thresholds (list[float]): The thresholds to try.
+
+        cutoffs (list[int]): The cutoffs to try.
+
+        block_size (int): The number of samples read at a time.
+
+    Returns:
+        dict[str, np.ndarray]: The tables from SweepDetector.results, one row
+        per threshold and one column per cutoff.
+    """
+    capture = CaptureSource(source)
+    detector = SweepDetector(thresholds, cutoffs)
+    start_time: float = perf_counter()
+    try:
+        for block in capture.blocks(block_size):
+            detector.process(block)
+    finally:
+        capture.close()
+    elapsed: float = perf_counter() - start_time
+    tables: dict = detector.results(capture.sample_rate)
+    print_sweep(thresholds, cutoffs, tables)
+    print(
+        f"{len(thresholds) * len(cutoffs)} settings over "
+        f"{capture.size / capture.sample_rate:.2f} s of samples in {elapsed:.2f} s"
+    )
+    return tables
+
+
+def print_sweep(thresholds: list, cutoffs: list, tables: dict) -> None:
+    """Prints one grid per table with a row per threshold and a column per cutoff."""
+    for title, table in tables.items():
+        print(f"{title} (rows: threshold, columns: cutoff)")
+        print(f"{'':>10}" + "".join(f"{cutoff:>12}" for cutoff in cutoffs))
+        for threshold, row in zip(thresholds, table):
+            print(f"{threshold:>10g}" + "".join(f"{value:>12g}" for value in row))
+        print()
@@ -14,12 +14,8 @@ if os.path.isdir(f"{_HOME}/uhd/install/lib/python3.8/site-packages"):
     UHD = f"{_HOME}/uhd/install/lib/python3.8/site-packages"
     sys.path.insert(0, UHD)
 
-from helper_functions.uhd_interface import SDR
 from helper_functions.hdf5_handler import HDF5Handler
 
-from monitor.monitor import Monitor
-from attack.attack import Attack
-
 
 class FreqyReplay:
     streaming_q: mp.Queue = mp.Queue()
@@ -33,8 +29,6 @@ class FreqyReplay:
         Arguments:
             mode (str): Defines if the radio will be in Attack or Monitor mode.
         """
-        self._monitor = Monitor()
-        self._attack = Attack()
         # Get TOML key value pairs
         self.toml_filter: dict = self.settings.get("FILTER")
         # FILTER
@@ -42,19 +36,27 @@ class FreqyReplay:
         self.seconds: str = self.toml_filter["seconds"]
         self.center_freq_filter: int = self.toml_filter["center_freq"]
         self.sample_rate_filter: float = self.toml_filter["sample_rate"]
+        # FINGERPRINT
+        self.radius: float = self.settings.get("FINGERPRINT")["radius"]
 
     def attack(self):
         """Starts a replay attack."""
-        self._attack.replay()
+        # The radio modes are imported when they are used so the file commands
+        # start without loading numba
+        from attack.attack import Attack
+
+        Attack().replay()
 
-    def monitor(self):
+    def monitor(self, profile: str = None):
         """Starts monitoring airwaves."""
-        self._monitor.launch()
+        from monitor.monitor import Monitor
+
+        Monitor(profile).launch()
 
     def display_all_files(self):
         self.hdf5.display_all_files()
 
-    def view_file_meta_data(self, file_name: str):
+    def view_file_meta_data(self, file_name: str, query: str = None):
         if self.center_freq_filter:
             center_freq = self.center_freq_filter
         else:
@@ -72,12 +74,59 @@ class FreqyReplay:
         else:
             bytes_size = None
         self.hdf5.display_metadata(
-            file_name, bytes_size, seconds, center_freq, sample_rate
+            file_name, bytes_size, seconds, center_freq, sample_rate, query
         )
 
     def plot_signal(self, file_name: str, dataset: str):
         self.hdf5.plot_signal(file_name, dataset)
 
+    def convert_file(self, file_name: str):
+        self.hdf5.convert_file(file_name)
+
+    def rebuild_catalog(self):
+        self.hdf5.rebuild_catalog()
+
+    def display_similar(self, file_name: str, dataset: str):
+        self.hdf5.display_similar(file_name, dataset, self.radius)
+
+    def display_clusters(self, file_name: str):
+        self.hdf5.display_clusters(file_name, self.radius)
+
+    def dedup_file(self, file_name: str):
+        self.hdf5.dedup_file(file_name, self.radius)
+
+    def redetect(self, source: str, args: argparse.Namespace):
+        """Runs the detector over a saved capture with new settings."""
+        from monitor.redetect import redetect, sweep
+
+        toml_monitor: dict = self.settings.get("MONITOR")
+        thresholds: str = args.threshold or str(toml_monitor["threshold"])
+        thresholds: list = [float(value) for value in thresholds.split(",")]
+        cutoffs: str = args.cutoff or str(toml_monitor["cutoff"])
+        cutoffs: list = [int(value) for value in cutoffs.split(",")]
+        if args.sweep:
+            sweep(source, thresholds, cutoffs)
+            return
+        if len(thresholds) > 1 or len(cutoffs) > 1:
+            raise ValueError("Pass --sweep to try several thresholds or cutoffs")
+        packet_slack: int = (
+            toml_monitor["packet_slack"] if args.slack is None else args.slack
+        )
+        output: str = args.output or f"{source.split('.')[0].split(':')[0]}-redetect"
+        decimation: int = (
+            toml_monitor["decimation"] if args.decimation is None else args.decimation
+        )
+        redetect(
+            source,
+            thresholds[0],
+            cutoffs[0],
+            packet_slack,
+            output,
+            args.workers,
+            decimation=decimation,
+            max_packet_length=toml_monitor["max_packet_length"],
+        )
+
 
 if __name__ == "__main__":
     # freqy_replay = FreqyReplay()
@@ -103,6 +152,13 @@ if __name__ == "__main__":
         default=None,
         help="View the meta data for a specific signal file.",
     )
+    parser.add_argument(
+        "-q",
+        "--query",
+        default=None,
+        help="Only show packets matching a query when used with -m, e.g. "
+        "'duration between 1ms and 5ms and center_freq == 915MHz'.",
+    )
     parser.add_argument(
         "-p",
         "--plot-signal",
@@ -110,19 +166,127 @@ if __name__ == "__main__":
         help="Plots a saved packet.",
         nargs=2
     )
+    parser.add_argument(
+        "-c",
+        "--convert",
+        default=None,
+        help="Converts a signal file from the signal{N} layout to the packed layout.",
+    )
+    parser.add_argument(
+        "-s",
+        "--similar",
+        default=None,
+        help="Lists the packets in a file similar to one of them, e.g. -s file.hdf5 "
+        "signal42.",
+        nargs=2,
+    )
+    parser.add_argument(
+        "--clusters",
+        default=None,
+        help="Groups the packets of a file into clusters of copies.",
+    )
+    parser.add_argument(
+        "--dedup",
+        default=None,
+        help="Writes a copy of a file with one packet from each cluster of copies "
+        "to <file>-dedup.hdf5.",
+    )
+    parser.add_argument(
+        "--rebuild-catalog",
+        default=None,
+        help="Rebuilds the catalog of signal files from scratch.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-r",
+        "--redetect",
+        default=None,
+        help="Runs the detector over a raw recording or an HDF5 file (file.hdf5 or "
+        "file.hdf5:signalN) and saves the packets it finds.",
+    )
+    parser.add_argument(
+        "--threshold",
+        default=None,
+        help="The threshold used with -r. Defaults to the one in config.toml. A "
+        "comma separated list with --sweep.",
+    )
+    parser.add_argument(
+        "--cutoff",
+        default=None,
+        help="The cutoff used with -r. Defaults to the one in config.toml. A "
+        "comma separated list with --sweep.",
+    )
+    parser.add_argument(
+        "--slack",
+        default=None,
+        type=int,
+        help="The packet_slack used with -r. Defaults to the one in config.toml.",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="The HDF5 file -r saves packets to. Defaults to <source>-redetect.",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="The number of threads -r detects on.",
+    )
+    parser.add_argument(
+        "--decimation",
+        default=None,
+        type=int,
+        help="The decimation used with -r. Defaults to the one in config.toml.",
+    )
+    parser.add_argument(
+        "--sweep",
+        default=None,
+        help="With -r, counts the packets found by every --threshold and --cutoff "
+        "pair instead of saving them.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        nargs="?",
+        const="cprofile",
+        choices=["cprofile", "sample"],
+        help="With m, times each pipeline stage and profiles every process. "
+        "cprofile (the default) writes pstats files, sample writes stacks for a "
+        "flamegraph.",
+    )
     # TODO: Add feature to delete signals that are less than the passed parameters
     args = parser.parse_args()
 
     if args.mode == "a":
         FreqyReplay().attack()
     elif args.mode == "m":
-        FreqyReplay().monitor()
+        FreqyReplay().monitor(args.profile)
+
+    if args.rebuild_catalog:
+        FreqyReplay().rebuild_catalog()
 
     if args.view_files:
         FreqyReplay().display_all_files()
 
     if args.meta_data:
-        FreqyReplay().view_file_meta_data(args.meta_data)
+        FreqyReplay().view_file_meta_data(args.meta_data, args.query)
 
     if args.plot_signal:
         FreqyReplay().plot_signal(args.plot_signal[0], args.plot_signal[1])
+
+    if args.convert:
+        FreqyReplay().convert_file(args.convert)
+
+    if args.redetect:
+        FreqyReplay().redetect(args.redetect, args)
+
+    if args.similar:
+        FreqyReplay().display_similar(args.similar[0], args.similar[1])
+
+    if args.clusters:
+        FreqyReplay().display_clusters(args.clusters)
+
+    if args.dedup:
+        FreqyReplay().dedup_file(args.dedup)
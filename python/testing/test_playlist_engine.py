@@ -0,0 +1,76 @@
+"""
+Tests that a playlist retunes back to the radio's settings for entries that do
+not set their own. Run with `python3 testing/test_playlist_engine.py`.
+"""
+
+import os, sys
+import numpy as np
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.hdf5_handler import HDF5Handler, signal_path
+from helper_functions.hdf5_writer import HDF5Writer
+from helper_functions.synthetic_sdr import SyntheticSDR
+from attack.burst_cache import BurstCache
+from attack.tx_engine import PlaylistEngine
+
+FILE_NAME = "test-playlist-engine"
+SAMPLE_RATE = 1e6
+CENTER_FREQ = 915e6
+TX_GAIN = 70
+
+
+def entry(dataset: str, center_freq: float = None, tx_gain: float = None) -> dict:
+    return {
+        "file": FILE_NAME,
+        "datasets": [dataset],
+        "repeat": 1,
+        "gap": 0.001,
+        "center_freq": center_freq,
+        "tx_gain": tx_gain,
+    }
+
+
+def test_entries_without_settings_retune_back():
+    with HDF5Writer(FILE_NAME, catalog=False) as writer:
+        for _ in range(3):
+            writer.write(np.ones(100, np.complex64), CENTER_FREQ, 1.0, SAMPLE_RATE)
+    try:
+        playlist: list = [
+            entry("signal0"),
+            entry("signal1", tx_gain=60),
+            entry("signal2", center_freq=2.41e9, tx_gain=60),
+        ]
+        sdr = SyntheticSDR(
+            SAMPLE_RATE, CENTER_FREQ, TX_GAIN, 74, packet_rate=0, realtime=False
+        )
+        cache = BurstCache(HDF5Handler(), 1 << 20, sdr.tx_format)
+        engine = PlaylistEngine(
+            sdr,
+            playlist,
+            cache,
+            SAMPLE_RATE,
+            repeat=2,
+            center_freq=CENTER_FREQ,
+            tx_gain=TX_GAIN,
+        )
+        engine.start()
+        engine.join()
+        tunes: list = [(freq, gain) for _, freq, gain in sdr.tx_sink.tunes]
+        assert tunes == [
+            (None, 60),
+            (2.41e9, None),
+            (CENTER_FREQ, TX_GAIN),
+            (None, 60),
+            (2.41e9, None),
+        ], tunes
+        assert engine.bursts_sent == 6
+    finally:
+        os.remove(signal_path(FILE_NAME))
+
+
+if __name__ == "__main__":
+    test_entries_without_settings_retune_back()
+    print("passed")
@@ -0,0 +1,44 @@
+"""
+Tests that the spill file stays within max_bytes when the queue never empties.
+Run with `python3 testing/test_spill_buffer.py`.
+"""
+
+import os, sys, tempfile
+import numpy as np
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from monitor.backpressure import SpillBuffer
+
+
+def test_spill_file_stays_within_max_bytes():
+    rng = np.random.default_rng(0)
+    max_bytes: int = 10_000
+    path: str = os.path.join(tempfile.mkdtemp(), "spill")
+    spill = SpillBuffer(path, max_bytes)
+    written: list = list()
+    buffer: np.ndarray = np.empty(1000, np.complex64)
+    try:
+        for _ in range(5000):
+            # Keep a few chunks queued so the queue is never drained
+            while len(spill) < 3:
+                length: int = int(rng.integers(1, 400))
+                chunk: np.ndarray = (
+                    rng.standard_normal(length) + 1j * rng.standard_normal(length)
+                ).astype(np.complex64)
+                if spill.write(chunk):
+                    written.append(chunk)
+            length = spill.read_into(buffer)
+            expected: np.ndarray = written.pop(0)
+            assert length == expected.size
+            assert np.array_equal(buffer[:length], expected)
+            assert os.path.getsize(path) <= max_bytes
+    finally:
+        spill.close()
+
+
+if __name__ == "__main__":
+    test_spill_file_stays_within_max_bytes()
+    print("passed")
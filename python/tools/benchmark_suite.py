@@ -0,0 +1,473 @@
+"""
+Measures the detector, the transport between the monitor's processes and the
+HDF5 storage on reproducible synthetic captures, and saves the results as JSON
+so runs from different commits can be compared.
+
+- `detect` runs StreamingDetector over each capture a chunk at a time, as
+  packet_detect does, and reports samples per second.
+- `pipeline` feeds each capture through a SampleTransport to a PacketDetect
+  process, with the packets it finds drained from a second transport by
+  another process, and reports samples per second from end to end.
+- `save` writes packets with HDF5Handler.save_signal, which opens the file for
+  every packet, and with HDF5Writer, which batches them.
+- `features` measures packets with SpectralAnalyzer in batches the size
+  PacketSaver writes, and reports packets per second and the largest error in
+  the dominant frequencies it finds.
+- `metadata` times display_metadata against files of growing size, first with
+  the catalog stale and then with it fresh.
+
+Each capture is noise with a power of 1 and a set number of packets of a set
+length and SNR placed at random, so the duty cycle is the packets times their
+length over the length of the capture. The same seed gives the same samples.
+
+Run from the python/ directory with `python3 tools/benchmark_suite.py`. The
+results are written to benchmark_results/<date>-<commit>.json unless `--output`
+is given, and `--compare <file>` prints the change from an earlier run and
+exits with 1 if anything got slower by more than `--tolerance` percent.
+"""
+
+from contextlib import redirect_stdout
+from datetime import datetime
+from time import perf_counter, sleep
+import multiprocessing as mp
+import numpy as np
+import argparse, json, platform, subprocess
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+SIGNALS_DIR = f"{FILE_DIR}/../captured_signals/"
+RESULTS_DIR = f"{FILE_DIR}/../benchmark_results/"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.hdf5_handler import HDF5Handler
+from helper_functions.hdf5_writer import HDF5Writer
+from helper_functions.shared_transport import SampleTransport
+from helper_functions.spectral import SpectralAnalyzer
+from monitor.monitor import PACKET_SLOT_SIZE
+from monitor.packet_detect import PacketDetect, StreamingDetector
+
+SAMPLE_RATE = 15000000.0
+CHUNK_SIZE = 24960
+QUEUE_SIZE = 170
+SEED = 0
+# In units of the noise magnitude
+THRESHOLD = 4.0
+CUTOFF = 1000
+PACKET_SLACK = 100
+RUNS = 3
+# Each capture is a second long at SAMPLE_RATE
+CAPTURES = {
+    "quiet": {"packets": 20, "packet_length": 1500, "snr_db": 20.0},
+    "busy": {"packets": 1000, "packet_length": 1500, "snr_db": 20.0},
+    "long packets": {"packets": 10, "packet_length": 750000, "snr_db": 20.0},
+    "low snr": {"packets": 200, "packet_length": 1500, "snr_db": 14.0},
+}
+PIPELINE_CAPTURES = ["quiet", "busy"]
+SAVE_PACKETS = {"save_signal": 200, "HDF5Writer": 5000}
+SAVE_PACKET_LENGTH = 1500
+# The number and length of the packets measured by each features case, and the
+# frequency of their tone as a share of the sample rate, None for random. The
+# carrier is on the center frequency, as a packet is when the radio is tuned to it
+FEATURE_PACKETS = {
+    "short": (4000, 1500, None),
+    "long": (1000, 15000, None),
+    "carrier": (1000, 5000, 0.0),
+}
+FEATURE_BATCH = 256
+METADATA_PACKETS = [1000, 10000, 100000]
+METADATA_PACKET_LENGTH = 100
+# --quick shrinks these so the whole suite takes a few seconds
+QUICK_SECONDS = 0.2
+QUICK_METADATA_PACKETS = [1000, 10000]
+FILE_NAME = "benchmark_suite"
+
+
+def make_capture(
+    seconds: float, packets: int, packet_length: int, snr_db: float, seed: int = SEED
+) -> tuple:
+    """Makes noise with a power of 1 with packets added at random positions
+    that do not overlap.
+
+    Arguments:
+        seconds (float): The length of the capture at SAMPLE_RATE.
+
+        packets (int): The number of packets.
+
+        packet_length (int): The number of samples in each packet.
+
+        snr_db (float): The power of each packet over the noise.
+
+        seed (int): Seeds the noise, the packet positions and their samples.
+
+    Returns:
+        tuple (np.ndarray, np.ndarray): The capture and the first sample of
+        each packet.
+    """
+    rng = np.random.default_rng(seed)
+    size: int = int(seconds * SAMPLE_RATE)
+    signal: np.ndarray = (
+        rng.normal(0, np.sqrt(0.5), size) + 1j * rng.normal(0, np.sqrt(0.5), size)
+    ).astype(np.complex64)
+    # Each packet gets an equal share of the capture and a random place in it,
+    # leaving room for the detector to see it end
+    share: int = size // max(packets, 1)
+    room: int = share - packet_length - CUTOFF - 2 * PACKET_SLACK
+    if packets and room < 0:
+        raise ValueError(f"{packets} packets of {packet_length} samples do not fit")
+    starts: np.ndarray = np.arange(packets) * share + rng.integers(0, room + 1, packets)
+    amplitude: float = 10 ** (snr_db / 20)
+    for start in starts:
+        phase: np.ndarray = rng.uniform(0, 2 * np.pi, packet_length)
+        packet: np.ndarray = amplitude * np.exp(1j * phase)
+        signal[start : start + packet_length] += packet.astype(np.complex64)
+    return (signal, starts)
+
+
+def duty_cycle(packets: int, packet_length: int, size: int) -> float:
+    return packets * packet_length / size
+
+
+def bench_detect(signal: np.ndarray) -> tuple:
+    """Returns the best samples per second over RUNS and the packets found."""
+    best: float = float("inf")
+    found: int = 0
+    detector = StreamingDetector(THRESHOLD, CUTOFF, PACKET_SLACK)
+    # Loads the kernel before timing it
+    detector.process(signal[:CHUNK_SIZE])
+    for _ in range(RUNS):
+        detector.reset()
+        found = 0
+        start_time: float = perf_counter()
+        for start in range(0, signal.size, CHUNK_SIZE):
+            found += len(detector.process(signal[start : start + CHUNK_SIZE]))
+        found += len(detector.flush())
+        best = min(best, perf_counter() - start_time)
+    return (signal.size / best, found)
+
+
+def drain_packets(packets: SampleTransport, results: mp.Queue) -> None:
+    found: int = 0
+    while True:
+        descriptor = packets.recv()
+        if type(descriptor) == str:
+            break
+        slot, length, _ = descriptor
+        packets.release(slot, length)
+        found += 1
+    results.put((found, perf_counter()))
+
+
+def feed(stream: SampleTransport, chunk: np.ndarray) -> None:
+    """Waits for room in the stream and publishes a chunk."""
+    while True:
+        slot, buffer = (-1, None) if stream.full() else stream.reserve(chunk.size)
+        if slot >= 0:
+            break
+        sleep(0)
+    buffer[:] = chunk
+    stream.publish(slot, chunk.size)
+
+
+def bench_pipeline(signal: np.ndarray) -> tuple:
+    """Returns the samples per second from the first chunk being published to
+    the last packet being drained, and the packets found."""
+    stream = SampleTransport(QUEUE_SIZE + 2, CHUNK_SIZE, QUEUE_SIZE)
+    packets = SampleTransport(4000000 // PACKET_SLOT_SIZE, PACKET_SLOT_SIZE)
+    results: mp.Queue = mp.Queue()
+    packet_detect = PacketDetect(stream, THRESHOLD, CUTOFF, packets, PACKET_SLACK)
+    detect_p = mp.Process(target=packet_detect.start_packet_detect)
+    drain_p = mp.Process(target=drain_packets, args=(packets, results))
+    detect_p.start()
+    drain_p.start()
+    # Waits for packet_detect to finish preparing before timing it
+    feed(stream, np.zeros(CHUNK_SIZE, np.complex64))
+    while stream.qsize():
+        sleep(0.01)
+    start_time: float = perf_counter()
+    for start in range(0, signal.size, CHUNK_SIZE):
+        feed(stream, signal[start : start + CHUNK_SIZE])
+    stream.send_done()
+    found, end_time = results.get()
+    detect_p.join()
+    drain_p.join()
+    stream.close()
+    packets.close()
+    return (signal.size / (end_time - start_time), found)
+
+
+def remove_file(handler: HDF5Handler, file_name: str) -> None:
+    path: str = f"{SIGNALS_DIR}{file_name}.hdf5"
+    if os.path.isfile(path):
+        os.remove(path)
+    handler.catalog.forget(f"{file_name}.hdf5")
+
+
+def bench_save(handler: HDF5Handler, method: str, count: int) -> float:
+    """Returns the packets saved per second."""
+    rng = np.random.default_rng(SEED)
+    packet: np.ndarray = (
+        rng.normal(0, 1, SAVE_PACKET_LENGTH) + 1j * rng.normal(0, 1, SAVE_PACKET_LENGTH)
+    ).astype(np.complex64)
+    remove_file(handler, FILE_NAME)
+    start_time: float = perf_counter()
+    if method == "save_signal":
+        for _ in range(count):
+            handler.save_signal(packet, 2.4e9, THRESHOLD, SAMPLE_RATE, FILE_NAME)
+    else:
+        with HDF5Writer(FILE_NAME) as writer:
+            for _ in range(count):
+                writer.write(packet, 2.4e9, THRESHOLD, SAMPLE_RATE)
+    elapsed: float = perf_counter() - start_time
+    remove_file(handler, FILE_NAME)
+    return count / elapsed
+
+
+def bench_features(count: int, packet_length: int, tone: float = None) -> tuple:
+    """Returns the packets measured per second and the largest error in their
+    dominant frequency in Hz. Each packet is a tone 20 dB over noise with a
+    power of 1, at `tone` times the sample rate from the center frequency or at
+    a random one if None."""
+    rng = np.random.default_rng(SEED)
+    samples: np.ndarray = np.arange(packet_length)
+    tones: np.ndarray = (
+        rng.uniform(-0.5, 0.5, FEATURE_BATCH)
+        if tone is None
+        else np.full(FEATURE_BATCH, tone)
+    )
+    packets: list = [
+        (
+            10 * np.exp(2j * np.pi * tones[row] * samples)
+            + rng.normal(0, np.sqrt(0.5), packet_length)
+            + 1j * rng.normal(0, np.sqrt(0.5), packet_length)
+        ).astype(np.complex64)
+        for row in range(FEATURE_BATCH)
+    ]
+    rates: np.ndarray = np.full(FEATURE_BATCH, SAMPLE_RATE)
+    freqs: np.ndarray = np.full(FEATURE_BATCH, 2.4e9)
+    analyzer = SpectralAnalyzer()
+    batches: int = max(count // FEATURE_BATCH, 1)
+    start_time: float = perf_counter()
+    for _ in range(batches):
+        features: np.ndarray = analyzer.analyze(packets, rates, freqs)
+    speed: float = batches * FEATURE_BATCH / (perf_counter() - start_time)
+    # The tones a bin apart from -0.5 wrap around to 0.5
+    error: np.ndarray = (features["dominant_freq"] - freqs) / SAMPLE_RATE - tones
+    error = (error + 0.5) % 1.0 - 0.5
+    return (speed, float(np.abs(error).max() * SAMPLE_RATE))
+
+
+def bench_metadata(handler: HDF5Handler, count: int) -> tuple:
+    """Returns the seconds display_metadata takes on a file of `count` packets
+    with the catalog stale and with it fresh, and the size of the file."""
+    file_name: str = f"{FILE_NAME}-{count}"
+    remove_file(handler, file_name)
+    packet: np.ndarray = np.ones(METADATA_PACKET_LENGTH, np.complex64)
+    with HDF5Writer(file_name, batch_size=4096, catalog=False) as writer:
+        for _ in range(count):
+            writer.write(packet, 2.4e9, THRESHOLD, SAMPLE_RATE)
+    file_bytes: int = os.path.getsize(f"{SIGNALS_DIR}{file_name}.hdf5")
+    times: list = list()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for _ in range(2):
+            start_time: float = perf_counter()
+            handler.display_metadata(f"{file_name}.hdf5")
+            times.append(perf_counter() - start_time)
+    remove_file(handler, file_name)
+    return (times[0], times[1], file_bytes)
+
+
+def git_commit() -> tuple:
+    """Returns the commit checked out and whether the tree has changes."""
+    try:
+        commit: str = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PYTHON_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status: str = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=PYTHON_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return (commit, bool(status.strip()))
+    except (OSError, subprocess.CalledProcessError):
+        return ("unknown", False)
+
+
+def machine() -> dict:
+    import h5py
+    import numba
+
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "h5py": h5py.__version__,
+    }
+
+
+def compare(results: list, baseline_file: str, tolerance: float) -> bool:
+    """Prints the change from an earlier run.
+
+    Returns:
+        bool: True if nothing got slower by more than `tolerance` percent.
+    """
+    with open(baseline_file) as f:
+        baseline: dict = json.load(f)
+    before: dict = {
+        (r["benchmark"], r["case"], r["metric"]): r for r in baseline["results"]
+    }
+    print(f"\nchange from {baseline['commit']} ({baseline['date']})")
+    passed: bool = True
+    for result in results:
+        old: dict = before.get((result["benchmark"], result["case"], result["metric"]))
+        if old is None or not old["value"] or result["higher_is_better"] is None:
+            continue
+        change: float = (result["value"] - old["value"]) / old["value"] * 100
+        if result["higher_is_better"] is False:
+            change = -change
+        flag: str = ""
+        if change < -tolerance:
+            flag = "  slower"
+            passed = False
+        print(
+            f"  {result['benchmark']:<9}{result['case']:<16}{result['metric']:<22}"
+            f"{change:>+8.1f}%{flag}"
+        )
+    return passed
+
+
+def record(
+    results: list,
+    benchmark: str,
+    case: str,
+    metric: str,
+    value: float,
+    unit: str,
+    higher_is_better=None,
+) -> None:
+    """Adds a result and prints it. `higher_is_better` is None for values
+    that are not compared between runs."""
+    results.append(
+        {
+            "benchmark": benchmark,
+            "case": case,
+            "metric": metric,
+            "value": value,
+            "unit": unit,
+            "higher_is_better": higher_is_better,
+        }
+    )
+    print(f"  {benchmark:<9}{case:<16}{metric:<22}{value:>14.4g} {unit}")
+
+
+def run(quick: bool) -> list:
+    results: list = list()
+    seconds: float = QUICK_SECONDS if quick else 1.0
+    handler = HDF5Handler()
+    for name, capture in CAPTURES.items():
+        packets: int = max(int(capture["packets"] * seconds), 1)
+        signal, _ = make_capture(
+            seconds, packets, capture["packet_length"], capture["snr_db"]
+        )
+        record(results, "capture", name, "packets", packets, "")
+        record(
+            results,
+            "capture",
+            name,
+            "duty cycle",
+            duty_cycle(packets, capture["packet_length"], signal.size),
+            "",
+        )
+        speed, found = bench_detect(signal)
+        record(results, "detect", name, "samples per second", speed, "S/s", True)
+        record(results, "detect", name, "packets found", found, "")
+        if name in PIPELINE_CAPTURES:
+            speed, found = bench_pipeline(signal)
+            record(results, "pipeline", name, "samples per second", speed, "S/s", True)
+            record(results, "pipeline", name, "packets found", found, "")
+    for method, count in SAVE_PACKETS.items():
+        count = max(int(count * seconds), 10)
+        speed: float = bench_save(handler, method, count)
+        record(results, "save", method, "packets per second", speed, "packets/s", True)
+    for case, (count, packet_length, tone) in FEATURE_PACKETS.items():
+        count = max(int(count * seconds), FEATURE_BATCH)
+        speed, error = bench_features(count, packet_length, tone)
+        record(
+            results, "features", case, "packets per second", speed, "packets/s", True
+        )
+        record(results, "features", case, "max frequency error", error, "Hz")
+    for count in QUICK_METADATA_PACKETS if quick else METADATA_PACKETS:
+        stale, fresh, file_bytes = bench_metadata(handler, count)
+        case: str = f"{count} packets"
+        record(results, "metadata", case, "file size", file_bytes, "bytes")
+        record(results, "metadata", case, "seconds, catalog stale", stale, "s", False)
+        record(results, "metadata", case, "seconds, catalog fresh", fresh, "s", False)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="The JSON file the results are written to. Defaults to "
+        "benchmark_results/<date>-<commit>.json.",
+    )
+    parser.add_argument(
+        "--compare",
+        default=None,
+        help="An earlier results file to compare against.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        default=20.0,
+        type=float,
+        help="How many percent slower than --compare counts as a regression.",
+    )
+    parser.add_argument(
+        "--quick",
+        default=None,
+        help="Runs on smaller captures and files.",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    date: str = datetime.now().isoformat(timespec="seconds")
+    print(f"benchmarking {commit}{' with changes' if dirty else ''}")
+    results: list = run(args.quick)
+    report: dict = {
+        "commit": commit,
+        "dirty": dirty,
+        "date": date,
+        "quick": bool(args.quick),
+        "machine": machine(),
+        "settings": {
+            "sample_rate": SAMPLE_RATE,
+            "chunk_size": CHUNK_SIZE,
+            "threshold": THRESHOLD,
+            "cutoff": CUTOFF,
+            "packet_slack": PACKET_SLACK,
+            "seed": SEED,
+            "captures": CAPTURES,
+        },
+        "results": results,
+    }
+    output: str = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = f"{RESULTS_DIR}{date.replace(':', '')}-{commit}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {os.path.realpath(output)}")
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        exit(1)
@@ -64,7 +64,7 @@ for i in range(len(packet_durations)):
 
     # Save the noisy_signal
     # hdf5 = HDF5Handler()
-    # hdf5.save_signal(noisy_signal, noisy_signal.size, frequency, 999.9, 1.5, sample_rate, "priming_signals")
+    # hdf5.save_signal(noisy_signal, frequency, 1.5, sample_rate, "priming_signals")
 
     # Plot the noisy signal with the packets
     plt.figure(figsize=(15, 5))
@@ -0,0 +1,127 @@
+"""
+Compares the ways packet_detect can decide which samples are above the
+threshold, across traffic from silent to busy.
+
+- `np.absolute` takes the magnitude of every sample with numpy, as
+  process_signal used to, without finding any packets.
+- `abs kernel` is the detector loop comparing the magnitude of each sample.
+- `power, decimation K` is find_packet_bounds, which compares the power of each
+  sample with the squared threshold and, with K above 1, only looks at every
+  Kth sample until a packet starts.
+
+Run from the python/ directory with `python3 tools/envelope_benchmark.py`.
+"""
+
+from time import perf_counter
+from numba import njit
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from monitor.packet_detect import STATE_SIZE, find_packet_bounds
+
+SAMPLE_RATE = 15000000.0
+CHUNK_SIZE = 24960
+THRESHOLD = 2.0
+CUTOFF = 1000
+BURST_LENGTH = 15000  # 1 ms at SAMPLE_RATE
+DUTY_CYCLES = [0.0, 0.001, 0.01, 0.1, 0.5]
+DECIMATIONS = [1, 8, 32]
+RUNS = 3
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def abs_bounds(signal, threshold, cutoff, offset, state, bounds):
+    """The detector loop as it was before it compared power."""
+    in_packet = state[0]
+    below_run = state[1]
+    packet_start = state[2]
+    last_above = state[3]
+    count = 0
+    for i in range(signal.size):
+        if abs(signal[i]) > threshold:
+            if not in_packet:
+                in_packet = 1
+                packet_start = offset + i
+            last_above = offset + i
+            below_run = 0
+        elif in_packet:
+            below_run += 1
+            if below_run >= cutoff:
+                bounds[count, 0] = packet_start
+                bounds[count, 1] = last_above + 1
+                count += 1
+                in_packet = 0
+                below_run = 0
+    state[0] = in_packet
+    state[1] = below_run
+    state[2] = packet_start
+    state[3] = last_above
+    return count
+
+
+def absolute_only(chunk, offset, state, bounds) -> int:
+    np.absolute(chunk) > THRESHOLD
+    return 0
+
+
+def make_signal(duty_cycle: float, rng: np.random.Generator) -> np.ndarray:
+    """Makes one second of noise with evenly spaced 1 ms bursts in it."""
+    size: int = int(SAMPLE_RATE)
+    signal: np.ndarray = (
+        rng.normal(0, 0.3, size) + 1j * rng.normal(0, 0.3, size)
+    ).astype(np.complex64)
+    bursts: int = int(round(duty_cycle * size / BURST_LENGTH))
+    for position in np.linspace(0, size - BURST_LENGTH, bursts, dtype=np.int64):
+        signal[position : position + BURST_LENGTH] += 3.0
+    return signal
+
+
+def time_runs(detect, signal: np.ndarray) -> tuple:
+    """Runs `detect` over the signal a chunk at a time RUNS times and returns
+    the best speed in MS/s and the packets it found."""
+    best: float = float("inf")
+    packets: int = 0
+    for _ in range(RUNS):
+        state: np.ndarray = np.zeros(STATE_SIZE, dtype=np.int64)
+        bounds: np.ndarray = np.zeros((CHUNK_SIZE // (CUTOFF + 1) + 2, 2), np.int64)
+        packets = 0
+        start_time: float = perf_counter()
+        for offset in range(0, signal.size, CHUNK_SIZE):
+            packets += detect(signal[offset : offset + CHUNK_SIZE], offset, state, bounds)
+        packets += int(state[0])
+        best = min(best, perf_counter() - start_time)
+    return (signal.size / best / 1e6, packets)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    methods: dict = {
+        "np.absolute": absolute_only,
+        "abs kernel": lambda chunk, offset, state, bounds: abs_bounds(
+            chunk, THRESHOLD, CUTOFF, offset, state, bounds
+        ),
+    }
+    for decimation in DECIMATIONS:
+        methods[f"power, decimation {decimation}"] = (
+            lambda chunk, offset, state, bounds, decimation=decimation: (
+                find_packet_bounds(
+                    chunk, THRESHOLD, CUTOFF, decimation, offset, state, bounds
+                )
+            )
+        )
+    # Compiles the kernels before timing them
+    warm_up: np.ndarray = make_signal(0.01, rng)[:CHUNK_SIZE]
+    for detect in methods.values():
+        detect(warm_up, 0, np.zeros(STATE_SIZE, np.int64), np.zeros((30, 2), np.int64))
+    print(f"{'duty cycle':>10}  {'method':<22}{'MS/s':>9}{'packets':>9}")
+    for duty_cycle in DUTY_CYCLES:
+        signal: np.ndarray = make_signal(duty_cycle, rng)
+        for name, detect in methods.items():
+            speed, packets = time_runs(detect, signal)
+            packets_column: str = "" if name == "np.absolute" else str(packets)
+            print(f"{duty_cycle:>10.1%}  {name:<22}{speed:>9.1f}{packets_column:>9}")
+        print()
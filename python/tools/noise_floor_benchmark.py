@@ -0,0 +1,138 @@
+"""
+Compares the fixed threshold with the adaptive noise floor threshold as the
+receive gain changes.
+
+The traffic is the bursts from tools/dummy_signal.py, at the [SYNTHETIC]
+amplitude and noise variance, scaled up and down to stand in for a gain or
+antenna change. Each run reports the bursts found and missed, the packets
+found where there was no burst, the noise floor estimate and how long each
+estimate update took.
+
+Run from the python/ directory with `python3 tools/noise_floor_benchmark.py`.
+"""
+
+from time import perf_counter
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from monitor.noise_floor import NoiseFloor
+from monitor.packet_detect import StreamingDetector
+
+SAMPLE_RATE = 15000000.0
+CHUNK_SIZE = 24960
+AMPLITUDE = 3.0
+NOISE_VARIANCE = 0.1
+THRESHOLD = 2.0
+CUTOFF = 1000
+MARGIN_DB = 15.0
+GAINS_DB = [-20, -10, 0, 10, 20]
+# The packet lengths and positions used by tools/dummy_signal.py, one second
+# of signal each
+PACKET_DURATIONS = [1e-4, 1e-3, 1e-2, 1e-1]
+PACKET_POSITIONS = [
+    [0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+    [0.1, 0.2, 0.3, 0.4, 0.5],
+    [0.1, 0.3, 0.5, 0.7],
+    [0.1, 0.4, 0.7],
+]
+
+
+def make_traffic(rng: np.random.Generator) -> tuple:
+    """Returns the noise for one second, and the (start, end) of every burst
+    across all the seconds of traffic."""
+    size: int = int(SAMPLE_RATE)
+    noise: np.ndarray = (
+        rng.normal(0, np.sqrt(NOISE_VARIANCE / 2), size)
+        + 1j * rng.normal(0, np.sqrt(NOISE_VARIANCE / 2), size)
+    ).astype(np.complex64)
+    bursts: list = list()
+    for second, (duration, positions) in enumerate(
+        zip(PACKET_DURATIONS, PACKET_POSITIONS)
+    ):
+        for position in positions:
+            start: int = second * size + int(position * size)
+            bursts.append((start, start + int(duration * SAMPLE_RATE)))
+    return (noise, bursts)
+
+
+def seconds_of_traffic(noise: np.ndarray, bursts: list, gain: float):
+    """Yields each second of traffic with its bursts added and the gain applied."""
+    for second in range(len(PACKET_DURATIONS)):
+        signal: np.ndarray = noise.copy()
+        for start, end in bursts:
+            start -= second * noise.size
+            end -= second * noise.size
+            if 0 <= start < noise.size:
+                signal[start:end] += AMPLITUDE
+        signal *= gain
+        yield signal
+
+
+def score(found: list, bursts: list) -> tuple:
+    """Returns the number of bursts found on their own, missed and packets that
+    were not a burst. A packet covering several bursts finds none of them."""
+    hit: set = set()
+    false_packets: int = 0
+    for start, end in found:
+        overlaps: list = [
+            i
+            for i, (burst_start, burst_end) in enumerate(bursts)
+            if start < burst_end and end > burst_start
+        ]
+        if len(overlaps) == 1:
+            hit.update(overlaps)
+        if not overlaps:
+            false_packets += 1
+    return (len(hit), len(bursts) - len(hit), false_packets)
+
+
+def run(noise: np.ndarray, bursts: list, gain_db: float, adaptive: bool) -> str:
+    detector = StreamingDetector(THRESHOLD, CUTOFF, 0)
+    noise_floor = NoiseFloor(SAMPLE_RATE, MARGIN_DB, threshold=THRESHOLD)
+    found: list = list()
+    update_seconds: float = 0.0
+    updates: int = 0
+    for signal in seconds_of_traffic(noise, bursts, 10 ** (gain_db / 20)):
+        for start in range(0, signal.size, CHUNK_SIZE):
+            chunk: np.ndarray = signal[start : start + CHUNK_SIZE]
+            if adaptive:
+                start_time: float = perf_counter()
+                detector.threshold = noise_floor.update(chunk)
+                update_seconds += perf_counter() - start_time
+                updates += 1
+            packets: list = detector.process(chunk)
+            found.extend(
+                (first, first + packet.size)
+                for first, packet in zip(detector.packet_starts, packets)
+            )
+    packets = detector.flush()
+    found.extend(
+        (first, first + packet.size)
+        for first, packet in zip(detector.packet_starts, packets)
+    )
+    # Thousands of false packets all overlap nothing, so only score a sample
+    hits, missed, false_packets = score(found[:10000], bursts)
+    false_packets += max(len(found) - 10000, 0)
+    line: str = f"{gain_db:>+6} dB  {'adaptive' if adaptive else 'fixed':<9}"
+    line += f"{len(found):>8}{hits:>6}{missed:>8}{false_packets:>8}"
+    if adaptive:
+        line += (
+            f"{noise_floor.floor_db:>10.1f} dB{noise_floor.threshold:>10.3g}"
+            f"{update_seconds / updates * 1e6:>9.1f} us"
+        )
+    return line
+
+
+if __name__ == "__main__":
+    noise, bursts = make_traffic(np.random.default_rng(0))
+    print(
+        f"{'gain':>9}  {'mode':<9}{'packets':>8}{'found':>6}{'missed':>8}{'false':>8}"
+        f"{'floor':>13}{'threshold':>10}{'update':>12}"
+    )
+    for gain_db in GAINS_DB:
+        for adaptive in (False, True):
+            print(run(noise, bursts, gain_db, adaptive))
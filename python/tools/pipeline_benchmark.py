@@ -0,0 +1,60 @@
+"""
+Runs the monitor pipeline against the synthetic radio at several sample rates
+and reports how much of the stream was lost.
+
+Run from the python/ directory with `python3 tools/pipeline_benchmark.py`.
+"""
+
+from time import perf_counter
+import h5py
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+SIGNALS_DIR = f"{FILE_DIR}/../captured_signals/"
+sys.path.insert(0, PYTHON_DIR)
+
+from monitor.monitor import Monitor
+
+FILE_NAME = "pipeline_benchmark"
+DURATION = 5.0  # Seconds of air time each run lasts
+SAMPLE_RATES = [10e6, 25e6, 50e6, 100e6]
+
+
+def count_packets(file_name: str) -> int:
+    path: str = f"{SIGNALS_DIR}{file_name}.hdf5"
+    if not os.path.isfile(path):
+        return 0
+    with h5py.File(path, "r") as f:
+        return f["index"].shape[0]
+
+
+def run(sample_rate: float) -> None:
+    path: str = f"{SIGNALS_DIR}{FILE_NAME}.hdf5"
+    if os.path.isfile(path):
+        os.remove(path)
+    monitor = Monitor()
+    monitor.settings["RADIO"]["backend"] = "synthetic"
+    monitor.settings["RADIO"]["sample_rate"] = sample_rate
+    monitor.settings["SYNTHETIC"]["realtime"] = True
+    monitor.sample_rate = sample_rate
+    monitor.view_sample = False
+    monitor.file_name = FILE_NAME
+    chunk_size: int = monitor.settings["SYNTHETIC"]["chunk_size"]
+    monitor.max_loops = int(DURATION * sample_rate / chunk_size)
+    start_time: float = perf_counter()
+    monitor.launch()
+    elapsed: float = perf_counter() - start_time
+    expected: float = monitor.settings["SYNTHETIC"]["packet_rate"] * DURATION
+    print(
+        f"{sample_rate / 1e6:>8g} MS/s{elapsed:>10.2f} s{monitor.sdr.overflows:>11}"
+        f"{count_packets(FILE_NAME):>9} / ~{expected:g}"
+    )
+    if os.path.isfile(path):
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    print(f"{'rate':>13}{'wall':>12}{'overflows':>11}{'packets saved':>18}")
+    for sample_rate in SAMPLE_RATES:
+        run(sample_rate)
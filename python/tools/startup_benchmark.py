@@ -0,0 +1,87 @@
+"""
+Measures how long each replay.py command takes to start from a fresh
+interpreter, and which heavy libraries it loads.
+
+Run from the python/ directory with `python3 tools/startup_benchmark.py`.
+"""
+
+from time import perf_counter
+import numpy as np
+import subprocess
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+SIGNALS_DIR = f"{FILE_DIR}/../captured_signals/"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.hdf5_writer import HDF5Writer
+
+FILE_NAME = "startup_benchmark"
+RUNS = 5
+HEAVY_MODULES = ("numba", "h5py", "matplotlib", "uhd")
+# Runs replay.py as __main__ and reports which heavy modules it imported
+RUNNER = """
+import runpy, sys
+sys.argv = ["replay.py"] + sys.argv[1:]
+try:
+    runpy.run_path("replay.py", run_name="__main__")
+except SystemExit:
+    pass
+print(" ".join(m for m in {modules} if m in sys.modules), file=sys.stderr)
+"""
+COMMANDS = {
+    "--help": ["--help"],
+    "n -v": ["n", "-v"],
+    "n -m": ["n", "-m", f"{FILE_NAME}.hdf5"],
+    "n -m -q": ["n", "-m", f"{FILE_NAME}.hdf5", "-q", "duration > 1ms"],
+}
+# Imports that the radio modes need before their first sample
+IMPORTS = {
+    "monitor mode imports": "import monitor.monitor",
+    "detector kernel": "import monitor.packet_detect",
+}
+
+
+def time_command(args: list) -> tuple:
+    """Runs a command RUNS times and returns the median time and loaded modules."""
+    times: list = list()
+    loaded: str = ""
+    for _ in range(RUNS):
+        start_time: float = perf_counter()
+        result = subprocess.run(
+            args, cwd=PYTHON_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        times.append(perf_counter() - start_time)
+        lines: list = result.stderr.decode().strip().splitlines()
+        loaded = lines[-1] if lines else ""
+    return (float(np.median(times)), loaded)
+
+
+def make_capture() -> None:
+    with HDF5Writer(FILE_NAME) as writer:
+        for i in range(1000):
+            writer.write(np.ones(100 + i, np.complex64), 915e6, 0.5, 1e6)
+
+
+if __name__ == "__main__":
+    path: str = f"{SIGNALS_DIR}{FILE_NAME}.hdf5"
+    if os.path.isfile(path):
+        os.remove(path)
+    make_capture()
+    runner: str = RUNNER.format(modules=HEAVY_MODULES)
+    print(f"{'command':<24}{'median':>10}  loaded")
+    try:
+        for name, argv in COMMANDS.items():
+            seconds, loaded = time_command([sys.executable, "-c", runner, *argv])
+            print(f"{name:<24}{seconds:>9.3f}s  {loaded}")
+        for name, code in IMPORTS.items():
+            check: str = (
+                f"{code}\nimport sys\n"
+                f"print(' '.join(m for m in {HEAVY_MODULES} if m in sys.modules), "
+                "file=sys.stderr)"
+            )
+            seconds, loaded = time_command([sys.executable, "-c", check])
+            print(f"{name:<24}{seconds:>9.3f}s  {loaded}")
+    finally:
+        os.remove(path)
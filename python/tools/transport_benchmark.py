@@ -0,0 +1,135 @@
+"""
+Compares the throughput of mp.Queue with SampleTransport when moving IQ chunks
+from one process to another.
+
+Run from the python/ directory with `python3 tools/transport_benchmark.py`.
+"""
+
+import multiprocessing as mp
+from time import perf_counter, sleep
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from helper_functions.shared_transport import SampleTransport
+
+CHUNK_SIZE = 24960  # About what a B200 returns from one recv call
+QUEUE_SIZE = 170
+DURATION = 3.0  # Seconds each run lasts
+SAMPLE_RATES = [1e6, 15e6, 50e6, None]  # None runs as fast as possible
+
+
+def synthetic_chunk() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.normal(0, 0.3, CHUNK_SIZE) + 1j * rng.normal(0, 0.3, CHUNK_SIZE)).astype(
+        np.complex64
+    )
+
+
+def pace(chunk_count: int, start: float, sample_rate: float) -> None:
+    """Sleeps until the chunk would have been received at `sample_rate`."""
+    if sample_rate is None:
+        return
+    due: float = start + chunk_count * CHUNK_SIZE / sample_rate
+    while perf_counter() < due:
+        sleep(0)
+
+
+def queue_producer(q: mp.Queue, sample_rate: float, results: mp.Queue) -> None:
+    chunk: np.ndarray = synthetic_chunk()
+    sent = dropped = 0
+    start: float = perf_counter()
+    while perf_counter() - start < DURATION:
+        pace(sent + dropped, start, sample_rate)
+        # rx_data used to hand back a fresh buffer every call
+        data: np.ndarray = chunk.copy()
+        if q.full():
+            dropped += sample_rate is not None
+            continue
+        q.put(data)
+        sent += 1
+    q.put("DONE")
+    results.put(("dropped", dropped))
+
+
+def queue_consumer(q: mp.Queue, results: mp.Queue) -> None:
+    samples: int = 0
+    start: float = perf_counter()
+    while True:
+        data = q.get()
+        if type(data) == str:
+            break
+        samples += data.size
+    results.put(("received", samples, perf_counter() - start))
+
+
+def transport_producer(
+    transport: SampleTransport, sample_rate: float, results: mp.Queue
+) -> None:
+    chunk: np.ndarray = synthetic_chunk()
+    sent = dropped = 0
+    start: float = perf_counter()
+    while perf_counter() - start < DURATION:
+        pace(sent + dropped, start, sample_rate)
+        slot, buffer = (-1, None) if transport.full() else transport.reserve(CHUNK_SIZE)
+        if slot < 0:
+            dropped += sample_rate is not None
+            continue
+        # Stands in for the SDR writing into the slot
+        buffer[:] = chunk
+        transport.publish(slot, CHUNK_SIZE)
+        sent += 1
+    transport.send_done()
+    results.put(("dropped", dropped))
+
+
+def transport_consumer(transport: SampleTransport, results: mp.Queue) -> None:
+    samples: int = 0
+    start: float = perf_counter()
+    while True:
+        descriptor = transport.recv()
+        if type(descriptor) == str:
+            break
+        slot, length, _ = descriptor
+        samples += transport.view(slot, length).size
+        transport.release(slot, length)
+    results.put(("received", samples, perf_counter() - start))
+
+
+def run(name: str, sample_rate: float) -> None:
+    results: mp.Queue = mp.Queue()
+    if name == "mp.Queue":
+        q = mp.Queue(QUEUE_SIZE)
+        producer = mp.Process(target=queue_producer, args=(q, sample_rate, results))
+        consumer = mp.Process(target=queue_consumer, args=(q, results))
+    else:
+        q = SampleTransport(QUEUE_SIZE + 2, CHUNK_SIZE, QUEUE_SIZE)
+        producer = mp.Process(target=transport_producer, args=(q, sample_rate, results))
+        consumer = mp.Process(target=transport_consumer, args=(q, results))
+    consumer.start()
+    producer.start()
+    producer.join()
+    consumer.join()
+    report: dict = dict()
+    for _ in range(2):
+        result = results.get()
+        report[result[0]] = result[1:]
+    if name != "mp.Queue":
+        q.close()
+    samples, elapsed = report["received"]
+    dropped: int = report["dropped"][0]
+    target: str = "max" if sample_rate is None else f"{sample_rate / 1e6:g} MS/s"
+    print(
+        f"{name:<16}{target:>10}{samples / elapsed / 1e6:>14.1f} MS/s"
+        f"{dropped:>10} chunks dropped"
+    )
+
+
+if __name__ == "__main__":
+    print(f"{'transport':<16}{'target':>10}{'delivered':>19}")
+    for sample_rate in SAMPLE_RATES:
+        for name in ["mp.Queue", "SampleTransport"]:
+            run(name, sample_rate)
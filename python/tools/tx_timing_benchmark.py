@@ -0,0 +1,78 @@
+"""
+Compares how evenly spaced replayed packets are when each send is followed by
+a sleep, as Attack.replay used to, and when TxEngine gives each one a time on
+the radio's clock.
+
+Both run against the synthetic radio, whose TxSink records when each burst
+would have gone out. An untimed send takes as long as the burst does to
+transmit, as the UHD send call does, so the sleep loop drifts by that and by
+however late the host wakes up, and its jitter is measured.
+
+The stand in radio puts a timed burst out at exactly its time, as a USRP does,
+so the engine's jitter and max error are zero by construction, not measured.
+What the host controls is how early each burst reaches the radio. The lead
+columns measure that: the smallest time from a burst being handed over to it
+being due, and the standard deviation of that time. A burst whose lead drops
+below zero is late and is counted in the last column.
+
+Run from the python/ directory with `python3 tools/tx_timing_benchmark.py`.
+"""
+
+from time import sleep
+import numpy as np
+import os, sys
+
+FILE_DIR = os.path.dirname(os.path.realpath(__file__))
+PYTHON_DIR = f"{FILE_DIR}/../"
+sys.path.insert(0, PYTHON_DIR)
+
+from attack.tx_engine import TxEngine
+from helper_functions.synthetic_sdr import SyntheticSDR
+
+SAMPLE_RATE = 15000000.0
+BURST_LENGTH = 1500  # 100 us at SAMPLE_RATE
+INTERVALS = [0.1, 0.01, 0.002, 0.0005]
+DURATION = 1.0  # Seconds each run lasts
+MAX_BURSTS = 2000
+
+
+def make_sdr() -> SyntheticSDR:
+    return SyntheticSDR(SAMPLE_RATE, 2.4e9, 70, 74, packet_rate=0)
+
+
+def sleep_loop(burst: np.ndarray, interval: float, bursts: int) -> dict:
+    """Sends the way Attack.replay used to, sleeping `interval` after each
+    send."""
+    sdr: SyntheticSDR = make_sdr()
+    for _ in range(bursts):
+        sdr.tx_data(burst)
+        sleep(interval)
+    return sdr.tx_sink.stats(interval)
+
+
+def engine(burst: np.ndarray, interval: float, bursts: int) -> dict:
+    sdr: SyntheticSDR = make_sdr()
+    tx_engine = TxEngine(sdr, burst, SAMPLE_RATE, interval, bursts)
+    tx_engine.start()
+    tx_engine.join()
+    return sdr.tx_sink.stats(interval)
+
+
+if __name__ == "__main__":
+    burst: np.ndarray = np.ones(BURST_LENGTH, dtype=np.complex64)
+    print(
+        f"{'interval':>10}  {'method':<11}{'bursts':>7}{'mean':>13}{'jitter':>13}"
+        f"{'max error':>13}{'min lead':>13}{'lead jitter':>13}{'late':>6}"
+    )
+    for interval in INTERVALS:
+        bursts: int = min(max(int(DURATION / interval), 10), MAX_BURSTS)
+        for name, method in (("sleep loop", sleep_loop), ("TxEngine", engine)):
+            stats: dict = method(burst, interval, bursts)
+            print(
+                f"{interval * 1e3:>7.1f} ms  {name:<11}{stats['bursts']:>7}"
+                f"{stats['mean_interval'] * 1e3:>10.4f} ms"
+                f"{stats['jitter'] * 1e6:>10.2f} us"
+                f"{stats['max_error'] * 1e3:>10.3f} ms"
+                f"{stats['min_lead'] * 1e3:>10.3f} ms"
+                f"{stats['lead_jitter'] * 1e6:>10.2f} us{stats['late']:>6}"
+            )